@@ -0,0 +1,65 @@
+from pydantic import BaseModel
+from typing import Optional, List, Literal
+
+# Response shapes requested from the model with structured outputs. Strict
+# mode needs every field required and no extra keys, so nothing has defaults.
+
+class EmailAnalysis(BaseModel):
+    sentiment: Literal["positive", "negative", "neutral"]
+    urgency_score: float  # 0.0 to 1.0
+    topics: List[str]
+    action_required: bool
+    suggested_actions: List[str]
+    key_entities: List[str]
+    deadline_mentioned: Optional[str]  # ISO datetime
+    meeting_request: bool
+    confidence_score: float
+
+    class Config:
+        extra = "forbid"
+
+class DraftResponse(BaseModel):
+    body_text: str
+    body_html: str
+    confidence: float
+    prompt_used: str
+
+    class Config:
+        extra = "forbid"
+
+class CalendarAnalysis(BaseModel):
+    optimal_time_score: float
+    productivity_impact: Literal["low", "medium", "high"]
+    meeting_type_classification: str
+    estimated_preparation_time: int
+    recommended_buffer_time: int
+    energy_level_match: Literal["high", "medium", "low"]
+    scheduling_suggestions: List[str]
+
+    class Config:
+        extra = "forbid"
+
+class AttendeeAvailability(BaseModel):
+    email: str
+    available: bool
+
+    class Config:
+        extra = "forbid"
+
+class SchedulingSuggestion(BaseModel):
+    suggested_datetime: str  # ISO datetime
+    duration_minutes: int
+    confidence_score: float
+    reasons: List[str]
+    # Strict schemas can't have free-form keys, so availability is a list
+    attendee_availability: List[AttendeeAvailability]
+    optimal_score: float
+
+    class Config:
+        extra = "forbid"
+
+class SchedulingSuggestions(BaseModel):
+    suggestions: List[SchedulingSuggestion]
+
+    class Config:
+        extra = "forbid"
@@ -162,6 +162,9 @@ class SendNotificationRequest(BaseModel):
     related_email_id: Optional[str] = None
     related_event_id: Optional[str] = None
 
+class SendNotificationBulkRequest(BaseModel):
+    items: List[SendNotificationRequest] = Field(min_length=1, max_length=1000)
+
 class NotificationResponse(BaseModel):
     id: str
     type: NotificationType
@@ -180,6 +183,7 @@ class NotificationListResponse(BaseModel):
     unread_count: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 class NotificationPreferencesResponse(BaseModel):
     id: str
@@ -162,6 +162,9 @@ class Invoice(BaseModel):
 class CreatePaymentIntentRequest(BaseModel):
     package_type: CreditPackage
     return_url: Optional[str] = None
+    # Generated once per checkout by the client and reused when retrying, so
+    # Stripe returns the original intent instead of creating another
+    client_nonce: str
 
 class PaymentIntentResponse(BaseModel):
     payment_intent_id: str
@@ -184,6 +187,7 @@ class PaymentHistoryResponse(BaseModel):
     total_count: int
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 class SubscriptionResponse(BaseModel):
     id: str
@@ -1,17 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import openai
+import uuid
 from decouple import config
 
 from models.email import Email, AIAnalysis, EmailPriority
 from models.calendar import CalendarEvent, AISchedulingAnalysis
 from models.guidelines import UserGuidelines, PriorityLevel
 from models.notifications import Notification, NotificationType, NotificationPriority
-from utils.auth import get_current_user_id
+from utils.auth import get_current_user_id, get_current_user
 from utils.database import ValidationUtils
-from services.ai_service import AIService
+from services.ai_service import AIService, BATCH_TIMEOUT_SECONDS
 from services.credit_service import CreditService
 
 router = APIRouter()
@@ -19,6 +21,11 @@ router = APIRouter()
 # Initialize OpenAI
 openai.api_key = config('OPENAI_API_KEY', default='placeholder-openai-api-key')
 
+# Emails still marked processing after their deadline were interrupted (e.g. by
+# a restart) and are put back to pending by recover_stuck_emails
+ONLINE_PROCESSING_TIMEOUT = timedelta(minutes=10)
+BATCH_PROCESSING_TIMEOUT = timedelta(seconds=BATCH_TIMEOUT_SECONDS) + ONLINE_PROCESSING_TIMEOUT
+
 @router.post("/analyze-email")
 async def analyze_email(
     email_id: str,
@@ -52,7 +59,10 @@ async def analyze_email(
     # Update processing status
     await database.emails.update_one(
         {"id": email_id},
-        {"$set": {"processing_status": "processing"}}
+        {"$set": {
+            "processing_status": "processing",
+            "processing_deadline": datetime.utcnow() + ONLINE_PROCESSING_TIMEOUT
+        }}
     )
     
     try:
@@ -135,7 +145,8 @@ async def generate_email_draft(
     length: str = "medium",
     custom_instructions: Optional[str] = None,
     request: Request = None,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Generate AI-powered email draft response"""
     database: AsyncIOMotorDatabase = request.app.database
@@ -159,7 +170,6 @@ async def generate_email_draft(
     try:
         # Get user guidelines and communication style
         guidelines = await database.user_guidelines.find_one({"user_id": current_user_id})
-        user_profile = await database.users.find_one({"id": current_user_id})
         
         # Initialize AI service
         ai_service = AIService()
@@ -168,7 +178,7 @@ async def generate_email_draft(
         draft_content = await ai_service.generate_email_draft(
             original_email=email,
             user_guidelines=guidelines,
-            user_profile=user_profile,
+            user_profile=user,
             tone=tone,
             length=length,
             custom_instructions=custom_instructions
@@ -212,6 +222,80 @@ async def generate_email_draft(
             detail=f"Failed to generate draft: {str(e)}"
         )
 
+@router.post("/generate-draft/stream")
+async def stream_email_draft(
+    email_id: str,
+    tone: str = "professional",
+    length: str = "medium",
+    custom_instructions: Optional[str] = None,
+    request: Request = None,
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Stream an AI-generated draft's text as it is written, then save the draft"""
+    database: AsyncIOMotorDatabase = request.app.database
+    
+    # Get original email
+    email = await database.emails.find_one({"id": email_id, "user_id": current_user_id})
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Email not found"
+        )
+    
+    # Check credits
+    credit_service = CreditService(database)
+    if not await credit_service.has_sufficient_credits(current_user_id, "draft_generation"):
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail="Insufficient credits for draft generation"
+        )
+    
+    guidelines = await database.user_guidelines.find_one({"user_id": current_user_id})
+    draft_id = str(uuid.uuid4())
+    
+    async def draft_body():
+        from models.email import EmailDraft, EmailRecipient
+        
+        ai_service = AIService()
+        draft_content = None
+        async for item in ai_service.stream_email_draft(
+            original_email=email,
+            user_guidelines=guidelines,
+            user_profile=user,
+            tone=tone,
+            length=length,
+            custom_instructions=custom_instructions
+        ):
+            if isinstance(item, dict):
+                draft_content = item
+            else:
+                yield item
+        
+        # Save the finished draft under the id sent in the response headers
+        draft = EmailDraft(
+            id=draft_id,
+            user_id=current_user_id,
+            original_email_id=email_id,
+            to=[EmailRecipient(email=email["sender"]["email"], name=email["sender"].get("name"))],
+            subject=f"Re: {email['subject']}",
+            body_text=draft_content["body_text"],
+            body_html=draft_content["body_html"],
+            is_reply=True,
+            provider=email["provider"],
+            generated_by_ai=True,
+            ai_confidence=draft_content["confidence"],
+            generation_prompt=draft_content.get("prompt_used")
+        )
+        await database.email_drafts.insert_one(draft.dict())
+        await credit_service.deduct_credits(current_user_id, "draft_generation")
+    
+    return StreamingResponse(
+        draft_body(),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Draft-Id": draft_id}
+    )
+
 @router.post("/analyze-calendar-event")
 async def analyze_calendar_event(
     event_id: str,
@@ -359,7 +443,8 @@ async def process_inbox_batch(
     force_reprocess: bool = False,
     limit: int = 50,
     request: Request = None,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Process a batch of emails in user's inbox with AI"""
     database: AsyncIOMotorDatabase = request.app.database
@@ -378,7 +463,6 @@ async def process_inbox_batch(
     credit_service = CreditService(database)
     total_credits_needed = len(emails)
     
-    user = await database.users.find_one({"id": current_user_id})
     remaining_credits = user.get("credits", {}).get("remaining_credits", 0)
     
     if remaining_credits < total_credits_needed:
@@ -401,6 +485,50 @@ async def process_inbox_batch(
         "estimated_credits": total_credits_needed
     }
 
+@router.post("/reanalyze-inbox")
+async def reanalyze_inbox(
+    limit: int = 500,
+    request: Request = None,
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Queue a bulk re-analysis of the user's emails through the Batch API
+    
+    Results can take up to the batch timeout, so the job runs on the task
+    worker rather than in this process.
+    """
+    database: AsyncIOMotorDatabase = request.app.database
+    
+    arq_pool = getattr(request.app, "arq_pool", None)
+    if not arq_pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Task queue unavailable"
+        )
+    
+    emails = await database.emails.find(
+        {"user_id": current_user_id, "processing_status": {"$ne": "processing"}},
+        {"_id": 0, "id": 1}
+    ).limit(limit).to_list(None)
+    
+    if not emails:
+        return {"message": "No emails to process", "processed_count": 0}
+    
+    remaining_credits = user.get("credits", {}).get("remaining_credits", 0)
+    if remaining_credits < len(emails):
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"Insufficient credits. Need {len(emails)}, have {remaining_credits}"
+        )
+    
+    await arq_pool.enqueue_job("reanalyze_emails", current_user_id, [email["id"] for email in emails])
+    
+    return {
+        "message": f"Queued {len(emails)} emails for re-analysis",
+        "processing_count": len(emails),
+        "estimated_credits": len(emails)
+    }
+
 @router.get("/processing-status")
 async def get_processing_status(
     request: Request,
@@ -471,38 +599,49 @@ async def send_urgent_email_notification(
 async def process_emails_batch(
     database: AsyncIOMotorDatabase,
     user_id: str,
-    email_ids: List[str]
+    email_ids: List[str],
+    use_batch_api: bool = False
 ):
     """Background task to process a batch of emails"""
     try:
         ai_service = AIService()
         credit_service = CreditService(database)
         
-        # Get user guidelines
+        # Get user guidelines and the emails to process
         guidelines = await database.user_guidelines.find_one({"user_id": user_id})
+        emails = await database.emails.find({"id": {"$in": email_ids}}).to_list(None)
+        if not emails:
+            return
+        
+        # Update processing status
+        timeout = BATCH_PROCESSING_TIMEOUT if use_batch_api else ONLINE_PROCESSING_TIMEOUT
+        await database.emails.update_many(
+            {"id": {"$in": [email["id"] for email in emails]}},
+            {"$set": {
+                "processing_status": "processing",
+                "processing_deadline": datetime.utcnow() + timeout
+            }}
+        )
+        
+        # Analyze all emails concurrently, or as one Batch API job
+        analysis_results = await ai_service.analyze_emails_bulk(
+            {
+                email["id"]: {
+                    "subject": email["subject"],
+                    "body_text": email.get("body_text", ""),
+                    "sender_email": email["sender"]["email"],
+                    "sender_name": email["sender"].get("name"),
+                    "user_guidelines": guidelines
+                }
+                for email in emails
+            },
+            use_batch=use_batch_api
+        )
         
-        for email_id in email_ids:
+        for email in emails:
+            email_id = email["id"]
+            analysis_result = analysis_results[email_id]
             try:
-                # Get email
-                email = await database.emails.find_one({"id": email_id})
-                if not email:
-                    continue
-                
-                # Update processing status
-                await database.emails.update_one(
-                    {"id": email_id},
-                    {"$set": {"processing_status": "processing"}}
-                )
-                
-                # Analyze email
-                analysis_result = await ai_service.analyze_email_content(
-                    subject=email["subject"],
-                    body_text=email.get("body_text", ""),
-                    sender_email=email["sender"]["email"],
-                    sender_name=email["sender"].get("name"),
-                    user_guidelines=guidelines
-                )
-                
                 # Determine priority
                 priority = EmailPriority.NORMAL
                 urgency_score = analysis_result.get("urgency_score", 0.5)
@@ -538,6 +677,28 @@ async def process_emails_batch(
                 
     except Exception as e:
         print(f"Failed to process email batch: {e}")
+        # Don't leave the rest of the batch marked as processing
+        await database.emails.update_many(
+            {"id": {"$in": email_ids}, "processing_status": "processing"},
+            {"$set": {"processing_status": "failed"}}
+        )
+
+async def recover_stuck_emails(database: AsyncIOMotorDatabase) -> int:
+    """Put emails whose processing was interrupted back to pending"""
+    result = await database.emails.update_many(
+        {
+            "processing_status": "processing",
+            # Emails marked before deadlines were recorded have none
+            "$or": [
+                {"processing_deadline": {"$lt": datetime.utcnow()}},
+                {"processing_deadline": {"$exists": False}}
+            ]
+        },
+        {"$set": {"processing_status": "pending"}}
+    )
+    if result.modified_count:
+        print(f"Reset {result.modified_count} stuck emails to pending")
+    return result.modified_count
 
 @router.post("/train-model")
 async def train_personalization_model(
@@ -3,7 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 
-from utils.auth import get_current_user_id
+from utils.auth import get_current_user_id, get_current_user
 from utils.database import ValidationUtils
 
 router = APIRouter()
@@ -420,21 +420,14 @@ async def get_ai_performance_metrics(
 async def get_productivity_score(
     request: Request,
     days: int = Query(30, ge=1, le=365),
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Calculate and return user's productivity score"""
     database: AsyncIOMotorDatabase = request.app.database
     
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Get user activity stats
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     activity = user.get("activity", {})
     
     # Calculate component scores (0-100)
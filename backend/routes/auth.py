@@ -17,6 +17,7 @@ from utils.auth import (
     validate_password_strength, generate_oauth_state, security
 )
 from utils.database import ValidationUtils
+from utils.cache import invalidate_user_cache, invalidate_user_views
 
 router = APIRouter()
 
@@ -106,6 +107,7 @@ async def login(user_credentials: UserLoginRequest, request: Request):
         {"_id": user_data["_id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    await invalidate_user_views(user_data["id"])
     
     # Create access token
     access_token = create_access_token(data={"sub": user_data["id"], "email": user_data["email"]})
@@ -240,6 +242,7 @@ async def verify_email(token: str, request: Request):
             "$unset": {"verification_token": ""}
         }
     )
+    await invalidate_user_views(user["id"])
     
     return {"message": "Email verified successfully"}
 
@@ -322,6 +325,8 @@ async def google_callback(code: str, state: str, request: Request):
                 }
             }
         )
+        invalidate_user_cache(user["id"])
+        await invalidate_user_views(user["id"])
     else:
         # Create new user from Google profile
         profile = UserProfile(
@@ -425,6 +430,8 @@ async def microsoft_callback(code: str, state: str, request: Request):
                 }
             }
         )
+        invalidate_user_cache(user["id"])
+        await invalidate_user_views(user["id"])
     else:
         # Create new user from Microsoft profile
         profile = UserProfile(
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 from models.calendar import (
     CalendarEvent, EventResponse, EventCreateRequest, EventUpdateRequest,
@@ -9,7 +9,7 @@ from models.calendar import (
     ConflictResolutionRequest, CalendarSyncStatus, EventStatus,
     SchedulingSuggestion, CalendarProvider
 )
-from utils.auth import get_current_user_id
+from utils.auth import get_current_user_id, get_current_user
 from utils.database import QueryBuilder, ValidationUtils
 from services.calendar_service import CalendarService
 from services.credit_service import CreditService
@@ -233,7 +233,7 @@ async def get_smart_scheduling_suggestions(
         # Get scheduling suggestions
         suggestions = await calendar_service.get_smart_scheduling_suggestions(
             user_id=current_user_id,
-            scheduling_request=scheduling_request
+            scheduling_request=scheduling_request.dict()
         )
         
         # Deduct credits
@@ -316,19 +316,12 @@ async def sync_calendar(
     request: Request,
     background_tasks: BackgroundTasks,
     provider: Optional[str] = None,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Sync calendar from external providers"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user's connections
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     connections = user.get("connections", {})
     
     # Determine which providers to sync
@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 from models.email import (
     Email, EmailResponse, EmailListResponse, EmailSearchRequest,
     EmailDraft, DraftResponse, DraftGenerationRequest,
     EmailPriority, EmailStatus, ProcessingStatus
 )
-from utils.auth import get_current_user_id
+from utils.auth import get_current_user_id, get_current_user
 from utils.database import QueryBuilder, ValidationUtils, PaginationHelper
 from services.email_service import EmailService
 from services.credit_service import CreditService
@@ -435,19 +435,12 @@ async def sync_emails(
     request: Request,
     background_tasks: BackgroundTasks,
     provider: Optional[str] = None,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Sync emails from external providers"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user's connections
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     connections = user.get("connections", {})
     
     # Determine which providers to sync
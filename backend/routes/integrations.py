@@ -3,8 +3,9 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from utils.auth import get_current_user_id
+from utils.auth import get_current_user_id, get_current_user
 from utils.database import ValidationUtils
+from utils.cache import invalidate_user_cache
 from services.google_service import GoogleService
 from services.microsoft_service import MicrosoftService
 from services.openai_service import OpenAIService
@@ -15,19 +16,12 @@ router = APIRouter()
 @router.get("/status")
 async def get_integration_status(
     request: Request,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Get status of all integrations for user"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user's connection status
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     connections = user.get("connections", {})
     
     # Check each integration status
@@ -74,14 +68,14 @@ async def sync_google_data(
     request: Request,
     background_tasks: BackgroundTasks,
     service_type: Optional[str] = None,  # "gmail", "calendar", or None for both
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Sync data from Google services"""
     database: AsyncIOMotorDatabase = request.app.database
     
     # Check if Google is connected
-    user = await database.users.find_one({"id": current_user_id})
-    if not user or not user.get("connections", {}).get("google_connected"):
+    if not user.get("connections", {}).get("google_connected"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Google account not connected"
@@ -114,14 +108,14 @@ async def sync_microsoft_data(
     request: Request,
     background_tasks: BackgroundTasks,
     service_type: Optional[str] = None,  # "outlook", "calendar", or None for both
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Sync data from Microsoft services"""
     database: AsyncIOMotorDatabase = request.app.database
     
     # Check if Microsoft is connected
-    user = await database.users.find_one({"id": current_user_id})
-    if not user or not user.get("connections", {}).get("microsoft_connected"):
+    if not user.get("connections", {}).get("microsoft_connected"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Microsoft account not connected"
@@ -177,19 +171,9 @@ async def test_openai_integration(
 @router.post("/twilio/test")
 async def test_twilio_integration(
     request: Request,
-    current_user_id: str = Depends(get_current_user_id)
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Test Twilio integration"""
-    database: AsyncIOMotorDatabase = request.app.database
-    
-    # Get user phone number
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     phone_number = user.get("profile", {}).get("phone_number")
     if not phone_number:
         raise HTTPException(
@@ -325,7 +309,8 @@ async def handle_microsoft_webhook(
 async def refresh_oauth_tokens(
     request: Request,
     provider: str,  # "google" or "microsoft"
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Refresh OAuth tokens for specified provider"""
     database: AsyncIOMotorDatabase = request.app.database
@@ -336,14 +321,6 @@ async def refresh_oauth_tokens(
             detail="Invalid provider"
         )
     
-    # Get user
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     connections = user.get("connections", {})
     
     try:
@@ -381,6 +358,7 @@ async def refresh_oauth_tokens(
                 }
             )
         
+        invalidate_user_cache(current_user_id)
         return {"message": f"{provider.title()} tokens refreshed successfully"}
         
     except Exception as e:
@@ -392,19 +370,9 @@ async def refresh_oauth_tokens(
 @router.get("/health-check")
 async def integration_health_check(
     request: Request,
-    current_user_id: str = Depends(get_current_user_id)
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Check health of all integrations"""
-    database: AsyncIOMotorDatabase = request.app.database
-    
-    # Get user
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     health_status = {}
     
     # Check Google integration
@@ -465,10 +433,10 @@ async def integration_health_check(
 async def setup_integration_webhooks(
     request: Request,
     provider: str,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Setup webhooks for real-time integration updates"""
-    database: AsyncIOMotorDatabase = request.app.database
     
     if provider not in ["google", "microsoft"]:
         raise HTTPException(
@@ -476,14 +444,6 @@ async def setup_integration_webhooks(
             detail="Invalid provider"
         )
     
-    # Get user
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     try:
         if provider == "google":
             google_service = GoogleService()
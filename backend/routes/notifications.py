@@ -1,33 +1,69 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
+from fastapi import status as http_status
+from fastapi.responses import ORJSONResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from datetime import datetime, timedelta
 from typing import Optional, List
+from decouple import config
+import asyncio
+import logging
 
 from models.notifications import (
     Notification, NotificationResponse, NotificationListResponse,
-    SendNotificationRequest, NotificationPreferencesResponse,
+    SendNotificationRequest, SendNotificationBulkRequest, NotificationPreferencesResponse,
     UpdateNotificationPreferencesRequest, NotificationStatsResponse,
     NotificationChannel, NotificationType, NotificationPriority,
     NotificationStatus, UserNotificationPreferences
 )
 from utils.auth import get_current_user_id
-from utils.database import QueryBuilder, ValidationUtils
-from services.notification_service import NotificationService
+from utils.database import QueryBuilder, ValidationUtils, PaginationHelper
+from services.notification_service import NotificationService, preferences_cache
 from services.twilio_service import TwilioService
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
+
+# Upper bound on notifications delivered at once per batch
+NOTIFICATION_CONCURRENCY = int(config('NOTIFICATION_CONCURRENCY', default=16))
+
+# Enum members and raw values, computed once for the stats pipeline
+CHANNEL_ENUMS = tuple(NotificationChannel)
+CHANNEL_VALUES = [channel.value for channel in CHANNEL_ENUMS]
+TYPE_ENUMS = tuple(NotificationType)
+TYPE_VALUES = [notification_type.value for notification_type in TYPE_ENUMS]
+
+# Fields needed to build a NotificationResponse; skips _id and delivery logs
+NOTIFICATION_RESPONSE_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "type": 1,
+    "priority": 1,
+    "content": 1,
+    "status": 1,
+    "preferred_channels": 1,
+    "scheduled_at": 1,
+    "created_at": 1,
+    "sent_at": 1,
+    "delivered_at": 1
+}
 
 @router.get("/", response_model=NotificationListResponse)
 async def get_notifications(
     request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
     status: Optional[NotificationStatus] = None,
     type: Optional[NotificationType] = None,
     unread_only: bool = False,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Get user's notifications with filtering and pagination"""
+    """Get user's notifications with filtering and pagination
+    
+    Pass the previous response's ``next_cursor`` as ``after`` to page by
+    keyset instead of offset; ``page`` is ignored when a cursor is given.
+    """
     database: AsyncIOMotorDatabase = request.app.database
     
     # Build query
@@ -40,34 +76,47 @@ async def get_notifications(
     if unread_only:
         query["read_at"] = {"$exists": False}
     
-    # Get total count
-    total_count = await database.notifications.count_documents(query)
-    unread_count = await database.notifications.count_documents({
-        "user_id": current_user_id,
-        "read_at": {"$exists": False}
-    })
-    
-    # Get paginated notifications
+    # Keyset pagination when a cursor is given, offset otherwise
+    page_query = query
     skip = (page - 1) * limit
-    notifications = await database.notifications.find(query)\
-        .sort("created_at", -1)\
-        .skip(skip)\
-        .limit(limit)\
-        .to_list(None)
-    
-    # Convert to response format
-    notification_responses = []
-    for notification in notifications:
-        notification_data = ValidationUtils.convert_objectid_to_str(notification)
-        notification_responses.append(NotificationResponse(**notification_data))
-    
-    return NotificationListResponse(
-        notifications=notification_responses,
-        total_count=total_count,
-        unread_count=unread_count,
-        page=page,
-        limit=limit
+    if after:
+        try:
+            page_query = PaginationHelper.build_keyset_query(query, after)
+        except ValueError:
+            raise HTTPException(
+                status_code=http_status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        skip = 0
+    
+    # Get counts and paginated notifications concurrently
+    total_count, unread_count, notifications = await asyncio.gather(
+        database.notifications.count_documents(query),
+        database.notifications.count_documents({
+            "user_id": current_user_id,
+            "read_at": {"$exists": False}
+        }),
+        database.notifications.find(page_query, NOTIFICATION_RESPONSE_PROJECTION)
+            .sort([("created_at", -1), ("id", -1)])
+            .skip(skip)
+            .limit(limit)
+            .to_list(limit)
     )
+    
+    next_cursor = None
+    if len(notifications) == limit:
+        last = notifications[-1]
+        next_cursor = PaginationHelper.encode_cursor(last["created_at"], last["id"])
+    
+    # Projected documents; response_model validates them once
+    return {
+        "notifications": notifications,
+        "total_count": total_count,
+        "unread_count": unread_count,
+        "page": page,
+        "limit": limit,
+        "next_cursor": next_cursor
+    }
 
 @router.post("/send", response_model=NotificationResponse)
 async def send_notification(
@@ -79,31 +128,91 @@ async def send_notification(
     """Send a notification to user"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    try:
-        # Initialize notification service
-        notification_service = NotificationService(database)
-        
-        # Send notification
-        notification = await notification_service.send_notification(
-            user_id=send_request.user_id or current_user_id,
-            notification_type=send_request.type,
-            title=send_request.title,
-            message=send_request.message,
-            channels=send_request.channels,
-            priority=send_request.priority,
-            scheduled_at=send_request.scheduled_at,
-            metadata=send_request.metadata,
-            related_email_id=send_request.related_email_id,
-            related_event_id=send_request.related_event_id
-        )
-        
-        return NotificationResponse(**notification.dict())
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send notification: {str(e)}"
-        )
+    # Initialize notification service
+    notification_service = NotificationService(database)
+    
+    # Send notification
+    notification = await notification_service.send_notification(
+        user_id=send_request.user_id or current_user_id,
+        notification_type=send_request.type,
+        title=send_request.title,
+        message=send_request.message,
+        channels=send_request.channels,
+        priority=send_request.priority,
+        scheduled_at=send_request.scheduled_at,
+        metadata=send_request.metadata,
+        related_email_id=send_request.related_email_id,
+        related_event_id=send_request.related_event_id,
+        deliver=False
+    )
+    
+    # Hand channel delivery to the task queue
+    if notification.scheduled_at <= datetime.utcnow():
+        await enqueue_notifications(request, background_tasks, [notification.id])
+    
+    return NotificationResponse(**notification.dict())
+
+@router.post("/send/bulk")
+async def send_notifications_bulk(
+    bulk_request: SendNotificationBulkRequest,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """Send many notifications with one database write"""
+    database: AsyncIOMotorDatabase = request.app.database
+    
+    # Initialize notification service
+    notification_service = NotificationService(database)
+    
+    # Store all notifications at once
+    results = await notification_service.send_notifications_bulk([
+        {
+            "user_id": item.user_id or current_user_id,
+            "notification_type": item.type,
+            "title": item.title,
+            "message": item.message,
+            "channels": item.channels,
+            "priority": item.priority,
+            "scheduled_at": item.scheduled_at,
+            "metadata": item.metadata,
+            "related_email_id": item.related_email_id,
+            "related_event_id": item.related_event_id
+        }
+        for item in bulk_request.items
+    ], concurrency=NOTIFICATION_CONCURRENCY)
+    
+    # Deliver everything that is due as a single queued batch
+    now = datetime.utcnow()
+    notifications = [result["notification"] for result in results if result["notification"]]
+    due_ids = [n.id for n in notifications if n.scheduled_at <= now]
+    if due_ids:
+        await enqueue_notifications(request, background_tasks, due_ids)
+    
+    # One entry per requested item, failed ones included
+    entries = []
+    for index, result in enumerate(results):
+        notification = result["notification"]
+        if notification is None:
+            entries.append({"index": index, "status": NotificationStatus.FAILED, "error": result["error"]})
+            continue
+        entries.append({
+            "index": index,
+            "id": notification.id,
+            "user_id": notification.user_id,
+            "status": notification.status,
+            "scheduled_at": notification.scheduled_at,
+            "queued": notification.scheduled_at <= now,
+            "rate_limited": result["rate_limited"]
+        })
+    
+    return {
+        "notifications": entries,
+        "count": len(notifications),
+        "queued_count": len(due_ids),
+        "rate_limited_count": sum(1 for result in results if result["rate_limited"]),
+        "failed_count": len(results) - len(notifications)
+    }
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
@@ -114,10 +223,12 @@ async def get_notification(
     """Get specific notification"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    notification = await database.notifications.find_one({
-        "id": notification_id,
-        "user_id": current_user_id
-    })
+    # Fetch and mark as read in one round trip, keeping an existing read_at
+    notification = await database.notifications.find_one_and_update(
+        {"id": notification_id, "user_id": current_user_id},
+        [{"$set": {"read_at": {"$ifNull": ["$read_at", "$$NOW"]}}}],
+        return_document=ReturnDocument.AFTER
+    )
     
     if not notification:
         raise HTTPException(
@@ -125,14 +236,6 @@ async def get_notification(
             detail="Notification not found"
         )
     
-    # Mark as read if unread
-    if not notification.get("read_at"):
-        await database.notifications.update_one(
-            {"id": notification_id},
-            {"$set": {"read_at": datetime.utcnow()}}
-        )
-        notification["read_at"] = datetime.utcnow()
-    
     notification_data = ValidationUtils.convert_objectid_to_str(notification)
     return NotificationResponse(**notification_data)
 
@@ -147,7 +250,7 @@ async def mark_notification_read(
     
     result = await database.notifications.update_one(
         {"id": notification_id, "user_id": current_user_id},
-        {"$set": {"read_at": datetime.utcnow()}}
+        [{"$set": {"read_at": "$$NOW"}}]
     )
     
     if result.matched_count == 0:
@@ -171,7 +274,7 @@ async def mark_all_notifications_read(
             "user_id": current_user_id,
             "read_at": {"$exists": False}
         },
-        {"$set": {"read_at": datetime.utcnow()}}
+        [{"$set": {"read_at": "$$NOW"}}]
     )
     
     return {"message": f"Marked {result.modified_count} notifications as read"}
@@ -206,6 +309,10 @@ async def get_notification_preferences(
     """Get user's notification preferences"""
     database: AsyncIOMotorDatabase = request.app.database
     
+    cached = await preferences_cache.get(current_user_id)
+    if cached:
+        return NotificationPreferencesResponse.model_validate_json(cached)
+    
     preferences = await database.notification_preferences.find_one({
         "user_id": current_user_id
     })
@@ -217,6 +324,10 @@ async def get_notification_preferences(
         preferences = default_prefs.dict()
     
     preferences_data = ValidationUtils.convert_objectid_to_str(preferences)
+    await preferences_cache.set(
+        current_user_id,
+        UserNotificationPreferences(**preferences_data).model_dump_json()
+    )
     return NotificationPreferencesResponse(**preferences_data)
 
 @router.put("/preferences/", response_model=NotificationPreferencesResponse)
@@ -228,47 +339,31 @@ async def update_notification_preferences(
     """Update user's notification preferences"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Build update fields
-    update_fields = {"updated_at": datetime.utcnow()}
-    
-    if preferences_update.channel_preferences is not None:
-        update_fields["channel_preferences"] = preferences_update.channel_preferences
-    
-    if preferences_update.quiet_hours_enabled is not None:
-        update_fields["quiet_hours_enabled"] = preferences_update.quiet_hours_enabled
-    
-    if preferences_update.quiet_hours_start is not None:
-        update_fields["quiet_hours_start"] = preferences_update.quiet_hours_start
-    
-    if preferences_update.quiet_hours_end is not None:
-        update_fields["quiet_hours_end"] = preferences_update.quiet_hours_end
-    
-    if preferences_update.max_notifications_per_hour is not None:
-        update_fields["max_notifications_per_hour"] = preferences_update.max_notifications_per_hour
+    # Build update fields from the values actually provided
+    update_fields = preferences_update.dict(exclude_none=True)
     
-    if preferences_update.urgent_override_quiet_hours is not None:
-        update_fields["urgent_override_quiet_hours"] = preferences_update.urgent_override_quiet_hours
-    
-    if preferences_update.enable_batching is not None:
-        update_fields["enable_batching"] = preferences_update.enable_batching
-    
-    if preferences_update.preferred_language is not None:
-        update_fields["preferred_language"] = preferences_update.preferred_language
+    # Defaults for anything not being set, kept if the document already has them
+    default_fields = UserNotificationPreferences(user_id=current_user_id).dict(
+        exclude={"created_at", "updated_at"}
+    )
     
-    if preferences_update.timezone is not None:
-        update_fields["timezone"] = preferences_update.timezone
+    set_stage = {
+        key: {"$ifNull": [f"${key}", {"$literal": value}]}
+        for key, value in default_fields.items()
+        if key not in update_fields
+    }
+    set_stage.update({key: {"$literal": value} for key, value in update_fields.items()})
+    set_stage["created_at"] = {"$ifNull": ["$created_at", "$$NOW"]}
+    set_stage["updated_at"] = "$$NOW"
     
-    # Update preferences
-    await database.notification_preferences.update_one(
+    # Update (or create) preferences and read them back in one round trip
+    updated_preferences = await database.notification_preferences.find_one_and_update(
         {"user_id": current_user_id},
-        {"$set": update_fields},
-        upsert=True
+        [{"$set": set_stage}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Get updated preferences
-    updated_preferences = await database.notification_preferences.find_one({
-        "user_id": current_user_id
-    })
+    await preferences_cache.delete(current_user_id)
     
     preferences_data = ValidationUtils.convert_objectid_to_str(updated_preferences)
     return NotificationPreferencesResponse(**preferences_data)
@@ -283,32 +378,29 @@ async def send_test_notification(
     """Send test notification to verify settings"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    try:
-        # Initialize notification service
-        notification_service = NotificationService(database)
-        
-        # Send test notification
-        test_message = f"This is a test notification via {channel.value}"
-        
-        notification = await notification_service.send_notification(
-            user_id=current_user_id,
-            notification_type=NotificationType.SYSTEM_UPDATE,
-            title="Test Notification",
-            message=test_message,
-            channels=[channel],
-            priority=NotificationPriority.NORMAL
-        )
-        
-        return {
-            "message": f"Test notification sent via {channel.value}",
-            "notification_id": notification.id
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to send test notification: {str(e)}"
-        )
+    # Initialize notification service
+    notification_service = NotificationService(database)
+    
+    # Send test notification
+    test_message = f"This is a test notification via {channel.value}"
+    
+    notification = await notification_service.send_notification(
+        user_id=current_user_id,
+        notification_type=NotificationType.SYSTEM_UPDATE,
+        title="Test Notification",
+        message=test_message,
+        channels=[channel],
+        priority=NotificationPriority.NORMAL,
+        deliver=False
+    )
+    
+    if notification.scheduled_at <= datetime.utcnow():
+        await enqueue_notifications(request, background_tasks, [notification.id])
+    
+    return {
+        "message": f"Test notification sent via {channel.value}",
+        "notification_id": notification.id
+    }
 
 @router.get("/stats/", response_model=NotificationStatsResponse)
 async def get_notification_stats(
@@ -323,84 +415,76 @@ async def get_notification_stats(
     start_date = datetime.utcnow() - timedelta(days=days)
     
     # Total counts
-    total_sent = await database.notifications.count_documents({
-        "user_id": current_user_id,
-        "status": "sent"
-    })
-    
-    total_delivered = await database.notifications.count_documents({
-        "user_id": current_user_id,
-        "status": "delivered"
-    })
-    
-    total_failed = await database.notifications.count_documents({
-        "user_id": current_user_id,
-        "status": "failed"
-    })
+    total_sent, total_delivered, total_failed = await asyncio.gather(
+        database.notifications.count_documents({
+            "user_id": current_user_id,
+            "status": "sent"
+        }),
+        database.notifications.count_documents({
+            "user_id": current_user_id,
+            "status": "delivered"
+        }),
+        database.notifications.count_documents({
+            "user_id": current_user_id,
+            "status": "failed"
+        })
+    )
     
-    # Channel stats
-    channel_stats = {}
-    for channel in NotificationChannel:
-        channel_data = await database.notifications.aggregate([
-            {
-                "$match": {
-                    "user_id": current_user_id,
-                    "preferred_channels": channel.value,
-                    "created_at": {"$gte": start_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
-            }
-        ]).to_list(None)
-        
-        channel_stats[channel] = {stat["_id"]: stat["count"] for stat in channel_data}
-    
-    # Type stats
-    type_stats = {}
-    for notification_type in NotificationType:
-        type_data = await database.notifications.aggregate([
-            {
-                "$match": {
-                    "user_id": current_user_id,
-                    "type": notification_type.value,
-                    "created_at": {"$gte": start_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1}
-                }
+    # Channel stats, type stats and recent activity in a single aggregation
+    stats_data = await database.notifications.aggregate([
+        {
+            "$match": {
+                "user_id": current_user_id,
+                "created_at": {"$gte": start_date}
             }
-        ]).to_list(None)
-        
-        type_stats[notification_type] = {stat["_id"]: stat["count"] for stat in type_data}
-    
-    # Recent activity
-    recent_notifications = await database.notifications.find(
+        },
         {
-            "user_id": current_user_id,
-            "created_at": {"$gte": start_date}
+            "$facet": {
+                "channels": [
+                    {"$unwind": "$preferred_channels"},
+                    {"$match": {"preferred_channels": {"$in": CHANNEL_VALUES}}},
+                    {
+                        "$group": {
+                            "_id": {"key": "$preferred_channels", "status": "$status"},
+                            "count": {"$sum": 1}
+                        }
+                    }
+                ],
+                "types": [
+                    {"$match": {"type": {"$in": TYPE_VALUES}}},
+                    {
+                        "$group": {
+                            "_id": {"key": "$type", "status": "$status"},
+                            "count": {"$sum": 1}
+                        }
+                    }
+                ],
+                "recent": [
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": 10},
+                    {"$project": NOTIFICATION_RESPONSE_PROJECTION}
+                ]
+            }
         }
-    ).sort("created_at", -1).limit(10).to_list(None)
-    
-    recent_activity = []
-    for notification in recent_notifications:
-        notification_data = ValidationUtils.convert_objectid_to_str(notification)
-        recent_activity.append(NotificationResponse(**notification_data))
-    
-    return NotificationStatsResponse(
-        total_sent=total_sent,
-        total_delivered=total_delivered,
-        total_failed=total_failed,
-        channel_stats=channel_stats,
-        type_stats=type_stats,
-        recent_activity=recent_activity
-    )
+    ]).to_list(1)
+    
+    channel_stats = {channel: {} for channel in CHANNEL_ENUMS}
+    for stat in stats_data[0]["channels"]:
+        channel_stats[NotificationChannel(stat["_id"]["key"])][stat["_id"]["status"]] = stat["count"]
+    
+    type_stats = {notification_type: {} for notification_type in TYPE_ENUMS}
+    for stat in stats_data[0]["types"]:
+        type_stats[NotificationType(stat["_id"]["key"])][stat["_id"]["status"]] = stat["count"]
+    
+    # Projected documents; response_model validates them once
+    return {
+        "total_sent": total_sent,
+        "total_delivered": total_delivered,
+        "total_failed": total_failed,
+        "channel_stats": channel_stats,
+        "type_stats": type_stats,
+        "recent_activity": stats_data[0]["recent"]
+    }
 
 @router.get("/pending/")
 async def get_pending_notifications(
@@ -410,16 +494,18 @@ async def get_pending_notifications(
     """Get pending notifications that haven't been sent yet"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    pending_notifications = await database.notifications.find({
-        "user_id": current_user_id,
-        "status": "pending",
-        "scheduled_at": {"$lte": datetime.utcnow()}
-    }).sort("scheduled_at", 1).to_list(None)
+    pending_notifications = await database.notifications.find(
+        {
+            "user_id": current_user_id,
+            "status": "pending",
+            "scheduled_at": {"$lte": datetime.utcnow()}
+        },
+        NOTIFICATION_RESPONSE_PROJECTION
+    ).sort("scheduled_at", 1).to_list(None)
     
-    notification_responses = []
-    for notification in pending_notifications:
-        notification_data = ValidationUtils.convert_objectid_to_str(notification)
-        notification_responses.append(NotificationResponse(**notification_data))
+    notification_responses = [
+        NotificationResponse(**notification) for notification in pending_notifications
+    ]
     
     return {
         "pending_notifications": notification_responses,
@@ -445,10 +531,10 @@ async def process_pending_notifications(
     if not pending_notifications:
         return {"message": "No pending notifications to process", "count": 0}
     
-    # Process in background
-    background_tasks.add_task(
-        process_notifications_batch,
-        database,
+    # Process on the task worker
+    await enqueue_notifications(
+        request,
+        background_tasks,
         [notification["id"] for notification in pending_notifications]
     )
     
@@ -465,9 +551,9 @@ async def test_notification_channels(
     """Test all configured notification channels"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user info
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
+    # Get user contact info
+    contact = await NotificationService(database).get_user_contact(current_user_id)
+    if not contact:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -480,7 +566,7 @@ async def test_notification_channels(
     test_results["email"] = {"available": True, "configured": True}
     
     # Test SMS
-    phone_number = user.get("profile", {}).get("phone_number")
+    phone_number = contact["phone_number"]
     test_results["sms"] = {
         "available": bool(phone_number),
         "configured": bool(phone_number)
@@ -498,6 +584,28 @@ async def test_notification_channels(
     }
 
 # Background task functions
+async def enqueue_notifications(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    notification_ids: List[str]
+):
+    """Queue notifications for delivery by the task worker
+    
+    Jobs go to the arq queue so they survive restarts and are spread over
+    worker processes; without a queue connection they fall back to
+    in-process background tasks.
+    """
+    arq_pool = getattr(request.app, "arq_pool", None)
+    
+    if arq_pool:
+        await arq_pool.enqueue_job("process_notifications_batch", notification_ids)
+    else:
+        background_tasks.add_task(
+            process_notifications_batch,
+            request.app.database,
+            notification_ids
+        )
+
 async def process_notifications_batch(
     database: AsyncIOMotorDatabase,
     notification_ids: List[str]
@@ -505,12 +613,19 @@ async def process_notifications_batch(
     """Background task to process a batch of notifications"""
     try:
         notification_service = NotificationService(database)
+        semaphore = asyncio.Semaphore(NOTIFICATION_CONCURRENCY)
+        
+        async def process_one(notification_id: str):
+            async with semaphore:
+                try:
+                    await notification_service.process_notification(notification_id)
+                except Exception:
+                    logger.exception("Failed to process notification %s", notification_id)
         
-        for notification_id in notification_ids:
-            try:
-                await notification_service.process_notification(notification_id)
-            except Exception as e:
-                print(f"Failed to process notification {notification_id}: {e}")
+        await asyncio.gather(
+            *(process_one(notification_id) for notification_id in notification_ids),
+            return_exceptions=True
+        )
                 
-    except Exception as e:
-        print(f"Notification batch processing failed: {e}")
\ No newline at end of file
+    except Exception:
+        logger.exception("Notification batch processing failed")
\ No newline at end of file
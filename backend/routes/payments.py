@@ -1,7 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
+from types import MappingProxyType
 from typing import Optional, List
+import asyncio
+import hashlib
+import logging
+import orjson
 import stripe
 from decouple import config
 
@@ -12,66 +20,105 @@ from models.payments import (
     UpdateSubscriptionRequest, UsageStatsResponse, CreditBalanceResponse,
     CreditPackage, PaymentStatus, CREDIT_COSTS
 )
-from models.user import CreditBalance
 from utils.auth import get_current_user_id
-from utils.database import ValidationUtils
+from utils.cache import get_user_cached
+from utils.database import PaginationHelper
 from services.stripe_service import StripeService
 from services.credit_service import CreditService
 
 # Initialize Stripe
 stripe.api_key = config('STRIPE_SECRET_KEY', default='sk_test_placeholder')
 
-router = APIRouter()
+# Credit catalog is constant, so build and serialize it once at import
+CREDIT_PACKAGES = [
+    CreditPackageInfo(
+        package_type=CreditPackage.STARTER,
+        credits=500,
+        price_usd=9.99,
+        price_per_credit=0.01998,
+        description="Perfect for getting started with Jessica AI",
+        features=[
+            "500 email processing credits",
+            "250 draft generations", 
+            "Email classification and prioritization",
+            "Basic scheduling assistance"
+        ]
+    ),
+    CreditPackageInfo(
+        package_type=CreditPackage.PROFESSIONAL,
+        credits=2000,
+        price_usd=29.99,
+        price_per_credit=0.01499,
+        description="For professionals who rely on email automation",
+        features=[
+            "2,000 email processing credits",
+            "1,000 draft generations",
+            "Advanced AI analysis",
+            "Smart scheduling optimization",
+            "Priority support"
+        ]
+    ),
+    CreditPackageInfo(
+        package_type=CreditPackage.ENTERPRISE,
+        credits=10000,
+        price_usd=99.99,
+        price_per_credit=0.00999,
+        description="Maximum automation for power users",
+        features=[
+            "10,000 email processing credits", 
+            "5,000 draft generations",
+            "Advanced analytics",
+            "Custom automation rules",
+            "Priority support",
+            "Extended credit validity"
+        ]
+    )
+]
+CREDIT_PACKAGES_JSON = orjson.dumps([package.dict() for package in CREDIT_PACKAGES])
+
+# Price in cents
+_PACKAGE_INFO = MappingProxyType({
+    CreditPackage.STARTER: {"credits": 500, "price": 999},
+    CreditPackage.PROFESSIONAL: {"credits": 2000, "price": 2999},
+    CreditPackage.ENTERPRISE: {"credits": 10000, "price": 9999}
+})
+
+CREDIT_COSTS_JSON = orjson.dumps({
+    "credit_costs": CREDIT_COSTS,
+    "description": {
+        "email_processing": "Analyze and classify an email",
+        "draft_generation": "Generate AI draft response",
+        "calendar_analysis": "Analyze calendar event for optimization", 
+        "urgent_notification": "Send urgent SMS/WhatsApp notification",
+        "smart_scheduling": "Get AI scheduling suggestions",
+        "ai_analysis": "General AI analysis tasks",
+        "auto_reply": "Send automated email reply",
+        "meeting_scheduling": "Schedule meeting automatically"
+    }
+})
+
+# User fields needed for balances and for creating the Stripe customer
+USER_CREDITS_PROJECTION = {"_id": 0, "credits": 1}
+USER_CUSTOMER_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "email": 1,
+    "profile.full_name": 1,
+    "stripe_customer_id": 1
+}
+
+# Fields returned by the history and subscription listings; skips _id
+PAYMENT_PROJECTION = {"_id": 0, **dict.fromkeys(Payment.model_fields, 1)}
+TRANSACTION_PROJECTION = {"_id": 0, **dict.fromkeys(CreditTransaction.model_fields, 1)}
+SUBSCRIPTION_PROJECTION = {"_id": 0, **dict.fromkeys(SubscriptionResponse.model_fields, 1)}
+
+router = APIRouter(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
 
 @router.get("/packages", response_model=List[CreditPackageInfo])
 async def get_credit_packages():
     """Get available credit packages"""
-    packages = [
-        CreditPackageInfo(
-            package_type=CreditPackage.STARTER,
-            credits=500,
-            price_usd=9.99,
-            price_per_credit=0.01998,
-            description="Perfect for getting started with Jessica AI",
-            features=[
-                "500 email processing credits",
-                "250 draft generations", 
-                "Email classification and prioritization",
-                "Basic scheduling assistance"
-            ]
-        ),
-        CreditPackageInfo(
-            package_type=CreditPackage.PROFESSIONAL,
-            credits=2000,
-            price_usd=29.99,
-            price_per_credit=0.01499,
-            description="For professionals who rely on email automation",
-            features=[
-                "2,000 email processing credits",
-                "1,000 draft generations",
-                "Advanced AI analysis",
-                "Smart scheduling optimization",
-                "Priority support"
-            ]
-        ),
-        CreditPackageInfo(
-            package_type=CreditPackage.ENTERPRISE,
-            credits=10000,
-            price_usd=99.99,
-            price_per_credit=0.00999,
-            description="Maximum automation for power users",
-            features=[
-                "10,000 email processing credits", 
-                "5,000 draft generations",
-                "Advanced analytics",
-                "Custom automation rules",
-                "Priority support",
-                "Extended credit validity"
-            ]
-        )
-    ]
-    
-    return packages
+    return Response(content=CREDIT_PACKAGES_JSON, media_type="application/json")
 
 @router.post("/create-payment-intent", response_model=PaymentIntentResponse)
 async def create_payment_intent(
@@ -83,26 +130,19 @@ async def create_payment_intent(
     database: AsyncIOMotorDatabase = request.app.database
     
     # Get package details
-    package_info = {
-        CreditPackage.STARTER: {"credits": 500, "price": 999},  # Price in cents
-        CreditPackage.PROFESSIONAL: {"credits": 2000, "price": 2999},
-        CreditPackage.ENTERPRISE: {"credits": 10000, "price": 9999}
-    }
-    
-    if payment_request.package_type not in package_info:
+    if payment_request.package_type not in _PACKAGE_INFO:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid package type"
         )
     
-    package = package_info[payment_request.package_type]
+    package = _PACKAGE_INFO[payment_request.package_type]
     
     try:
-        # Initialize Stripe service
-        stripe_service = StripeService()
+        stripe_service: StripeService = request.app.stripe_service
         
         # Get or create Stripe customer
-        user = await database.users.find_one({"id": current_user_id})
+        user = await get_user_cached(database, current_user_id, USER_CUSTOMER_PROJECTION)
         customer_id = await stripe_service.get_or_create_customer(user)
         
         # Create payment intent
@@ -113,7 +153,8 @@ async def create_payment_intent(
                 "user_id": current_user_id,
                 "package_type": payment_request.package_type,
                 "credits": package["credits"]
-            }
+            },
+            idempotency_key=f"pi:{current_user_id}:{payment_request.package_type.value}:{payment_request.client_nonce}"
         )
         
         # Create payment record
@@ -127,7 +168,12 @@ async def create_payment_intent(
             status=PaymentStatus.PENDING
         )
         
-        await database.payments.insert_one(payment.dict())
+        # A retried request gets the same intent back, so keep the first record
+        await database.payments.update_one(
+            {"stripe_payment_intent_id": payment_intent.id},
+            {"$setOnInsert": payment.dict()},
+            upsert=True
+        )
         
         return PaymentIntentResponse(
             payment_intent_id=payment_intent.id,
@@ -144,7 +190,7 @@ async def create_payment_intent(
         )
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request):
+async def stripe_webhook(request: Request, background_tasks: BackgroundTasks):
     """Handle Stripe webhooks"""
     database: AsyncIOMotorDatabase = request.app.database
     
@@ -158,37 +204,6 @@ async def stripe_webhook(request: Request):
             sig_header, 
             config('STRIPE_WEBHOOK_SECRET', default='whsec_placeholder')
         )
-        
-        # Initialize services
-        stripe_service = StripeService()
-        credit_service = CreditService(database)
-        
-        # Handle different event types
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            await handle_payment_success(
-                database, 
-                payment_intent, 
-                credit_service
-            )
-        
-        elif event['type'] == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            await handle_payment_failure(
-                database, 
-                payment_intent
-            )
-        
-        elif event['type'] == 'invoice.payment_succeeded':
-            invoice = event['data']['object']
-            await handle_subscription_payment(
-                database,
-                invoice,
-                credit_service
-            )
-        
-        return {"status": "success"}
-        
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -199,12 +214,27 @@ async def stripe_webhook(request: Request):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid signature"
         )
-    except Exception as e:
-        print(f"Webhook error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Webhook processing failed"
-        )
+    
+    # Record the event id first so Stripe retries are not processed twice
+    try:
+        await database.stripe_events.insert_one({
+            "event_id": event["id"],
+            "type": event["type"],
+            "created": event["created"],
+            "processed_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return {"status": "duplicate"}
+    
+    # Acknowledge right away; Stripe retries if the response is slow
+    background_tasks.add_task(
+        process_stripe_event,
+        database,
+        request.app.credit_service,
+        event
+    )
+    
+    return {"status": "queued"}
 
 @router.get("/balance", response_model=CreditBalanceResponse)
 async def get_credit_balance(
@@ -214,71 +244,94 @@ async def get_credit_balance(
     """Get user's current credit balance"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
+    user = await get_user_cached(database, current_user_id, USER_CREDITS_PROJECTION)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
+    # Read stored counters directly; defaults match CreditBalance for new users
     credits = user.get("credits", {})
-    credit_balance = CreditBalance(**credits)
-    
-    return CreditBalanceResponse(
-        total_credits=credit_balance.total_credits,
-        used_credits=credit_balance.used_credits,
-        remaining_credits=credit_balance.remaining_credits,
-        last_purchase_date=credit_balance.last_purchase_date,
-        credit_expiry_date=credit_balance.credit_expiry_date,
-        needs_refill=credit_balance.remaining_credits < 50
-    )
+    remaining_credits = credits.get("remaining_credits", 50)
+    
+    body = orjson.dumps({
+        "total_credits": credits.get("total_credits", 50),
+        "used_credits": credits.get("used_credits", 0),
+        "remaining_credits": remaining_credits,
+        "last_purchase_date": credits.get("last_purchase_date"),
+        "credit_expiry_date": credits.get("credit_expiry_date"),
+        "low_credit_threshold": 50,
+        "needs_refill": remaining_credits < 50
+    })
+    
+    # Let polling clients revalidate cheaply
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.get("/history", response_model=PaymentHistoryResponse)
 async def get_payment_history(
     request: Request,
     page: int = 1,
     limit: int = 50,
+    after: Optional[str] = None,
     current_user_id: str = Depends(get_current_user_id)
 ):
-    """Get user's payment and transaction history"""
+    """Get user's payment and transaction history
+    
+    Pass the previous response's ``next_cursor`` as ``after`` to page payments
+    by keyset instead of offset; transactions still follow ``page``.
+    """
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get payments
-    skip = (page - 1) * limit
-    payments = await database.payments.find({"user_id": current_user_id})\
-        .sort("created_at", -1)\
-        .skip(skip)\
-        .limit(limit)\
-        .to_list(None)
+    query = {"user_id": current_user_id}
     
-    # Get credit transactions
-    transactions = await database.credit_transactions.find({"user_id": current_user_id})\
-        .sort("created_at", -1)\
-        .skip(skip)\
-        .limit(limit)\
-        .to_list(None)
+    # Keyset pagination when a cursor is given, offset otherwise
+    payments_query = query
+    skip = (page - 1) * limit
+    payments_skip = skip
+    if after:
+        try:
+            payments_query = PaginationHelper.build_keyset_query(query, after)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+        payments_skip = 0
     
-    # Get total count
-    total_count = await database.payments.count_documents({"user_id": current_user_id})
-    
-    # Convert to response format
-    payment_objects = []
-    for payment in payments:
-        payment_data = ValidationUtils.convert_objectid_to_str(payment)
-        payment_objects.append(Payment(**payment_data))
-    
-    transaction_objects = []
-    for transaction in transactions:
-        transaction_data = ValidationUtils.convert_objectid_to_str(transaction)
-        transaction_objects.append(CreditTransaction(**transaction_data))
-    
-    return PaymentHistoryResponse(
-        payments=payment_objects,
-        transactions=transaction_objects,
-        total_count=total_count,
-        page=page,
-        limit=limit
+    # Get payments, their total count and credit transactions concurrently
+    payments, total_count, transactions = await asyncio.gather(
+        database.payments.find(payments_query, PAYMENT_PROJECTION)
+            .sort([("created_at", -1), ("id", -1)])
+            .skip(payments_skip)
+            .limit(limit)
+            .to_list(limit),
+        database.payments.count_documents(query),
+        database.credit_transactions.find(query, TRANSACTION_PROJECTION)
+            .sort("created_at", -1)
+            .skip(skip)
+            .limit(limit)
+            .to_list(limit)
     )
+    
+    next_cursor = None
+    if len(payments) == limit:
+        last = payments[-1]
+        next_cursor = PaginationHelper.encode_cursor(last["created_at"], last["id"])
+    
+    # Documents already match the response shape, so serialize them directly
+    return ORJSONResponse({
+        "payments": payments,
+        "transactions": transactions,
+        "total_count": total_count,
+        "page": page,
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
 
 @router.get("/usage-stats", response_model=UsageStatsResponse)
 async def get_usage_stats(
@@ -289,53 +342,53 @@ async def get_usage_stats(
     """Get credit usage statistics"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user credits info
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
+    # Get user credits info and usage breakdowns concurrently, scanning usage once
+    user, usage_result = await asyncio.gather(
+        get_user_cached(database, current_user_id, USER_CREDITS_PROJECTION),
+        database.credit_transactions.aggregate([
+            {
+                "$match": {
+                    "user_id": current_user_id,
+                    "transaction_type": "usage"
+                }
+            },
+            {
+                "$facet": {
+                    "by_action": [
+                        {
+                            "$group": {
+                                "_id": "$action_type",
+                                "total_credits": {"$sum": {"$abs": "$credits_amount"}}
+                            }
+                        }
+                    ],
+                    "by_month": [
+                        {
+                            "$group": {
+                                "_id": {
+                                    "$dateToString": {
+                                        "format": "%Y-%m",
+                                        "date": "$created_at"
+                                    }
+                                },
+                                "total_credits": {"$sum": {"$abs": "$credits_amount"}}
+                            }
+                        },
+                        {"$sort": {"_id": 1}}
+                    ]
+                }
+            }
+        ]).to_list(1)
+    )
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
     credits = user.get("credits", {})
-    
-    # Get usage by action type
-    usage_by_action = await database.credit_transactions.aggregate([
-        {
-            "$match": {
-                "user_id": current_user_id,
-                "transaction_type": "usage"
-            }
-        },
-        {
-            "$group": {
-                "_id": "$action_type",
-                "total_credits": {"$sum": {"$abs": "$credits_amount"}}
-            }
-        }
-    ]).to_list(None)
-    
-    # Get usage by month
-    usage_by_month = await database.credit_transactions.aggregate([
-        {
-            "$match": {
-                "user_id": current_user_id,
-                "transaction_type": "usage"
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m",
-                        "date": "$created_at"
-                    }
-                },
-                "total_credits": {"$sum": {"$abs": "$credits_amount"}}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]).to_list(None)
+    usage_by_action = usage_result[0]["by_action"]
+    usage_by_month = usage_result[0]["by_month"]
     
     # Calculate daily average
     total_days = max(days, 1)
@@ -363,16 +416,14 @@ async def get_user_subscriptions(
     """Get user's active subscriptions"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    subscriptions = await database.subscriptions.find({"user_id": current_user_id})\
+    subscriptions = await database.subscriptions.find(
+        {"user_id": current_user_id},
+        SUBSCRIPTION_PROJECTION
+    )\
         .sort("created_at", -1)\
         .to_list(None)
     
-    subscription_responses = []
-    for subscription in subscriptions:
-        subscription_data = ValidationUtils.convert_objectid_to_str(subscription)
-        subscription_responses.append(SubscriptionResponse(**subscription_data))
-    
-    return subscription_responses
+    return ORJSONResponse(subscriptions)
 
 @router.post("/subscriptions", response_model=SubscriptionResponse)
 async def create_subscription(
@@ -384,18 +435,18 @@ async def create_subscription(
     database: AsyncIOMotorDatabase = request.app.database
     
     try:
-        # Initialize Stripe service
-        stripe_service = StripeService()
+        stripe_service: StripeService = request.app.stripe_service
         
         # Get user
-        user = await database.users.find_one({"id": current_user_id})
+        user = await get_user_cached(database, current_user_id, USER_CUSTOMER_PROJECTION)
         customer_id = await stripe_service.get_or_create_customer(user)
         
         # Create Stripe subscription
         stripe_subscription = await stripe_service.create_subscription(
             customer_id=customer_id,
             price_id=subscription_request.price_id,
-            payment_method_id=subscription_request.payment_method_id
+            payment_method_id=subscription_request.payment_method_id,
+            idempotency_key=f"sub:{current_user_id}:{subscription_request.price_id}:{subscription_request.payment_method_id}"
         )
         
         # Create subscription record
@@ -444,8 +495,7 @@ async def update_subscription(
         )
     
     try:
-        # Initialize Stripe service
-        stripe_service = StripeService()
+        stripe_service: StripeService = request.app.stripe_service
         
         # Update Stripe subscription
         if subscription_update.cancel_at_period_end is not None:
@@ -478,19 +528,49 @@ async def update_subscription(
 @router.get("/credit-costs")
 async def get_credit_costs():
     """Get current credit costs for different actions"""
-    return {
-        "credit_costs": CREDIT_COSTS,
-        "description": {
-            "email_processing": "Analyze and classify an email",
-            "draft_generation": "Generate AI draft response",
-            "calendar_analysis": "Analyze calendar event for optimization", 
-            "urgent_notification": "Send urgent SMS/WhatsApp notification",
-            "smart_scheduling": "Get AI scheduling suggestions",
-            "ai_analysis": "General AI analysis tasks",
-            "auto_reply": "Send automated email reply",
-            "meeting_scheduling": "Schedule meeting automatically"
-        }
-    }
+    return Response(content=CREDIT_COSTS_JSON, media_type="application/json")
+
+# Background task functions
+async def process_stripe_event(
+    database: AsyncIOMotorDatabase,
+    credit_service: CreditService,
+    event: dict
+):
+    """Dispatch a verified Stripe event, dead-lettering it on failure"""
+    try:
+        # Handle different event types
+        if event['type'] == 'payment_intent.succeeded':
+            payment_intent = event['data']['object']
+            await handle_payment_success(
+                database, 
+                payment_intent, 
+                credit_service
+            )
+        
+        elif event['type'] == 'payment_intent.payment_failed':
+            payment_intent = event['data']['object']
+            await handle_payment_failure(
+                database, 
+                payment_intent
+            )
+        
+        elif event['type'] == 'invoice.payment_succeeded':
+            invoice = event['data']['object']
+            await handle_subscription_payment(
+                database,
+                invoice,
+                credit_service
+            )
+    
+    except Exception as e:
+        logger.exception("Webhook processing failed for event %s", event["id"])
+        await database.webhook_dead_letters.insert_one({
+            "event_id": event["id"],
+            "type": event["type"],
+            "event": event,
+            "error": str(e),
+            "failed_at": datetime.utcnow()
+        })
 
 # Helper functions for webhook handling
 async def handle_payment_success(
@@ -499,63 +579,54 @@ async def handle_payment_success(
     credit_service: CreditService
 ):
     """Handle successful payment"""
-    try:
-        # Find payment record
-        payment = await database.payments.find_one({
-            "stripe_payment_intent_id": payment_intent["id"]
-        })
-        
-        if not payment:
-            print(f"Payment not found for intent: {payment_intent['id']}")
-            return
-        
-        # Update payment status
-        await database.payments.update_one(
-            {"stripe_payment_intent_id": payment_intent["id"]},
-            {
-                "$set": {
-                    "status": PaymentStatus.SUCCEEDED,
-                    "paid_at": datetime.utcnow()
-                }
+    # Mark the payment succeeded and read back what is needed to grant credits
+    payment = await database.payments.find_one_and_update(
+        {"stripe_payment_intent_id": payment_intent["id"]},
+        {
+            "$set": {
+                "status": PaymentStatus.SUCCEEDED,
+                "paid_at": datetime.utcnow()
             }
-        )
-        
-        # Add credits to user account
-        await credit_service.add_credits(
-            user_id=payment["user_id"],
-            credits=payment["credits_purchased"],
-            transaction_type="purchase",
-            description=f"Credit purchase - {payment['package_type']}",
-            payment_intent_id=payment_intent["id"]
-        )
-        
-        print(f"Successfully processed payment for user {payment['user_id']}")
-        
-    except Exception as e:
-        print(f"Failed to handle payment success: {e}")
+        },
+        projection={"_id": 0, "user_id": 1, "credits_purchased": 1, "package_type": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if not payment:
+        logger.warning("Payment not found for intent: %s", payment_intent["id"])
+        return
+    
+    # Add credits to user account
+    added = await credit_service.add_credits(
+        user_id=payment["user_id"],
+        credits=payment["credits_purchased"],
+        transaction_type="purchase",
+        description=f"Credit purchase - {payment['package_type']}",
+        payment_intent_id=payment_intent["id"]
+    )
+    if not added:
+        raise Exception(f"Failed to add credits for user {payment['user_id']}")
+    
+    logger.info("Successfully processed payment for user %s", payment["user_id"])
 
 async def handle_payment_failure(
     database: AsyncIOMotorDatabase,
     payment_intent: dict
 ):
     """Handle failed payment"""
-    try:
-        # Update payment status
-        await database.payments.update_one(
-            {"stripe_payment_intent_id": payment_intent["id"]},
-            {
-                "$set": {
-                    "status": PaymentStatus.FAILED,
-                    "failure_reason": payment_intent.get("last_payment_error", {}).get("message"),
-                    "failure_code": payment_intent.get("last_payment_error", {}).get("code")
-                }
+    # Update payment status
+    await database.payments.update_one(
+        {"stripe_payment_intent_id": payment_intent["id"]},
+        {
+            "$set": {
+                "status": PaymentStatus.FAILED,
+                "failure_reason": payment_intent.get("last_payment_error", {}).get("message"),
+                "failure_code": payment_intent.get("last_payment_error", {}).get("code")
             }
-        )
-        
-        print(f"Payment failed for intent: {payment_intent['id']}")
-        
-    except Exception as e:
-        print(f"Failed to handle payment failure: {e}")
+        }
+    )
+    
+    logger.info("Payment failed for intent: %s", payment_intent["id"])
 
 async def handle_subscription_payment(
     database: AsyncIOMotorDatabase,
@@ -563,26 +634,24 @@ async def handle_subscription_payment(
     credit_service: CreditService
 ):
     """Handle subscription payment success"""
-    try:
-        # Find subscription
-        subscription = await database.subscriptions.find_one({
-            "stripe_customer_id": invoice["customer"]
-        })
-        
-        if not subscription:
-            print(f"Subscription not found for customer: {invoice['customer']}")
-            return
-        
-        # Add monthly credits
-        await credit_service.add_credits(
-            user_id=subscription["user_id"],
-            credits=subscription["credits_per_period"],
-            transaction_type="subscription",
-            description=f"Monthly subscription credits - {subscription['plan_name']}",
-            stripe_invoice_id=invoice["id"]
-        )
-        
-        print(f"Added subscription credits for user {subscription['user_id']}")
-        
-    except Exception as e:
-        print(f"Failed to handle subscription payment: {e}")
\ No newline at end of file
+    # Find subscription
+    subscription = await database.subscriptions.find_one({
+        "stripe_customer_id": invoice["customer"]
+    })
+    
+    if not subscription:
+        logger.warning("Subscription not found for customer: %s", invoice["customer"])
+        return
+    
+    # Add monthly credits
+    added = await credit_service.add_credits(
+        user_id=subscription["user_id"],
+        credits=subscription["credits_per_period"],
+        transaction_type="subscription",
+        description=f"Monthly subscription credits - {subscription['plan_name']}",
+        stripe_invoice_id=invoice["id"]
+    )
+    if not added:
+        raise Exception(f"Failed to add credits for user {subscription['user_id']}")
+    
+    logger.info("Added subscription credits for user %s", subscription["user_id"])
\ No newline at end of file
@@ -1,18 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Path
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, WriteConcern
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
+import asyncio
 
 from models.user import (
     UserResponse, UserUpdateRequest, UserProfile, UserPreferences,
     UserActivityStats, CreditBalance
 )
 from utils.auth import get_current_user_id
-from utils.database import ValidationUtils
+from utils.cache import cached_user_view, invalidate_user_cache, invalidate_user_views
+from services.notification_service import user_contact_cache
+
+# Only the fields each view reads; connections skips the OAuth tokens
+USER_RESPONSE_PROJECTION = {"_id": 0, **dict.fromkeys(UserResponse.model_fields, 1)}
+USER_ACTIVITY_PROJECTION = {"_id": 0, "activity": 1}
+USER_CREDITS_PROJECTION = {"_id": 0, "credits": 1}
+USER_CONNECTIONS_PROJECTION = {
+    "_id": 0,
+    "connections.google_connected": 1,
+    "connections.microsoft_connected": 1,
+    "connections.connected_calendars": 1,
+    "connections.connected_email_accounts": 1
+}
+USER_DASHBOARD_PROJECTION = {
+    "_id": 0,
+    "profile.full_name": 1,
+    "email": 1,
+    "created_at": 1,
+    "last_login": 1,
+    "credits": 1,
+    "connections.google_connected": 1,
+    "connections.microsoft_connected": 1,
+    "activity": 1
+}
+
+# Account toggles (deactivate, reactivate, disconnect) are idempotent and safe
+# to retry, so they skip waiting on the journal; deletes and credits keep the
+# client default
+TOGGLE_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+# Dotted paths for the profile/preferences fields a profile update can set
+PROFILE_FIELD_PATHS = {name: f"profile.{name}" for name in UserProfile.model_fields}
+PREFERENCES_FIELD_PATHS = {name: f"preferences.{name}" for name in UserPreferences.model_fields}
+
+# Fields cleared when a provider is disconnected
+DISCONNECT_UPDATES = {
+    provider: {
+        f"connections.{provider}_connected": False,
+        f"connections.{provider}_access_token": None,
+        f"connections.{provider}_refresh_token": None,
+        f"connections.{provider}_token_expiry": None
+    }
+    for provider in ("google", "microsoft")
+}
+
+# Bound once; the write paths stamp updated_at on every request
+_utcnow = datetime.utcnow
 
 router = APIRouter()
 
 @router.get("/profile", response_model=UserResponse)
+@cached_user_view("profile")
 async def get_user_profile(
     request: Request,
     current_user_id: str = Depends(get_current_user_id)
@@ -20,15 +70,16 @@ async def get_user_profile(
     """Get current user's profile"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    user = await database.users.find_one({"id": current_user_id})
+    user = await database.users.find_one({"id": current_user_id}, USER_RESPONSE_PROJECTION)
     
-    if not user:
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse(**ValidationUtils.convert_objectid_to_str(user))
+    # The view cache returns a ready-made response, so shape it here
+    return UserResponse.model_validate(user).model_dump()
 
 @router.put("/profile", response_model=UserResponse)
 async def update_user_profile(
@@ -40,37 +91,43 @@ async def update_user_profile(
     database: AsyncIOMotorDatabase = request.app.database
     
     # Build update query
-    update_fields = {"updated_at": datetime.utcnow()}
+    update_fields = {"updated_at": _utcnow()}
     
     if update_data.profile:
         # Update profile fields
         profile_dict = update_data.profile.dict(exclude_unset=True)
         for key, value in profile_dict.items():
-            update_fields[f"profile.{key}"] = value
+            update_fields[PROFILE_FIELD_PATHS[key]] = value
     
     if update_data.preferences:
         # Update preferences fields
         preferences_dict = update_data.preferences.dict(exclude_unset=True)
         for key, value in preferences_dict.items():
-            update_fields[f"preferences.{key}"] = value
+            update_fields[PREFERENCES_FIELD_PATHS[key]] = value
     
-    # Update user in database
-    result = await database.users.update_one(
+    # Update user in database and read back the result
+    updated_user = await database.users.find_one_and_update(
         {"id": current_user_id},
-        {"$set": update_fields}
+        {"$set": update_fields},
+        projection=USER_RESPONSE_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if updated_user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Return updated user
-    updated_user = await database.users.find_one({"id": current_user_id})
-    return UserResponse(**ValidationUtils.convert_objectid_to_str(updated_user))
+    await invalidate_user_views(current_user_id)
+    if update_data.profile:
+        await user_contact_cache.delete(current_user_id)
+    
+    # FastAPI validates against response_model, so don't build the model twice
+    return updated_user
 
 @router.get("/activity", response_model=UserActivityStats)
+@cached_user_view("activity")
 async def get_user_activity_stats(
     request: Request,
     current_user_id: str = Depends(get_current_user_id)
@@ -78,9 +135,9 @@ async def get_user_activity_stats(
     """Get user activity statistics"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    user = await database.users.find_one({"id": current_user_id})
+    user = await database.users.find_one({"id": current_user_id}, USER_ACTIVITY_PROJECTION)
     
-    if not user:
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -89,6 +146,7 @@ async def get_user_activity_stats(
     return UserActivityStats(**user.get("activity", {}))
 
 @router.get("/credits", response_model=CreditBalance)
+@cached_user_view("credits")
 async def get_credit_balance(
     request: Request,
     current_user_id: str = Depends(get_current_user_id)
@@ -96,9 +154,9 @@ async def get_credit_balance(
     """Get user credit balance"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    user = await database.users.find_one({"id": current_user_id})
+    user = await database.users.find_one({"id": current_user_id}, USER_CREDITS_PROJECTION)
     
-    if not user:
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -115,12 +173,14 @@ async def deactivate_account(
     database: AsyncIOMotorDatabase = request.app.database
     
     # Update user status
-    result = await database.users.update_one(
+    result = await database.users.with_options(
+        write_concern=TOGGLE_WRITE_CONCERN
+    ).update_one(
         {"id": current_user_id},
         {
             "$set": {
                 "is_active": False,
-                "updated_at": datetime.utcnow()
+                "updated_at": _utcnow()
             }
         }
     )
@@ -131,6 +191,8 @@ async def deactivate_account(
             detail="User not found"
         )
     
+    await invalidate_user_views(current_user_id)
+    
     # TODO: Clean up user data, cancel subscriptions, etc.
     
     return {"message": "Account deactivated successfully"}
@@ -144,12 +206,14 @@ async def reactivate_account(
     database: AsyncIOMotorDatabase = request.app.database
     
     # Update user status
-    result = await database.users.update_one(
+    result = await database.users.with_options(
+        write_concern=TOGGLE_WRITE_CONCERN
+    ).update_one(
         {"id": current_user_id},
         {
             "$set": {
                 "is_active": True,
-                "updated_at": datetime.utcnow()
+                "updated_at": _utcnow()
             }
         }
     )
@@ -160,6 +224,8 @@ async def reactivate_account(
             detail="User not found"
         )
     
+    await invalidate_user_views(current_user_id)
+    
     return {"message": "Account reactivated successfully"}
 
 @router.delete("/account")
@@ -171,8 +237,8 @@ async def delete_account(
     database: AsyncIOMotorDatabase = request.app.database
     
     # Find user first
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
+    user = await database.users.find_one({"id": current_user_id}, {"_id": 1})
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -192,15 +258,20 @@ async def delete_account(
         "payments"
     ]
     
-    for collection_name in collections_to_clean:
-        await database[collection_name].delete_many({"user_id": current_user_id})
+    await asyncio.gather(*(
+        database[collection_name].delete_many({"user_id": current_user_id})
+        for collection_name in collections_to_clean
+    ))
     
     # Finally delete the user
     await database.users.delete_one({"id": current_user_id})
+    await user_contact_cache.delete(current_user_id)
+    await invalidate_user_views(current_user_id)
     
     return {"message": "Account and all associated data deleted successfully"}
 
 @router.get("/connections")
+@cached_user_view("connections")
 async def get_connection_status(
     request: Request,
     current_user_id: str = Depends(get_current_user_id)
@@ -208,9 +279,9 @@ async def get_connection_status(
     """Get user's third-party connection status"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    user = await database.users.find_one({"id": current_user_id})
+    user = await database.users.find_one({"id": current_user_id}, USER_CONNECTIONS_PROJECTION)
     
-    if not user:
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
@@ -230,29 +301,22 @@ async def get_connection_status(
 
 @router.post("/disconnect/{provider}")
 async def disconnect_provider(
-    provider: str,
     request: Request,
+    provider: Literal["google", "microsoft"] = Path(...),
     current_user_id: str = Depends(get_current_user_id)
 ):
     """Disconnect a third-party provider"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    if provider not in ["google", "microsoft"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid provider"
-        )
-    
     # Update fields to disconnect
     update_fields = {
-        f"connections.{provider}_connected": False,
-        f"connections.{provider}_access_token": None,
-        f"connections.{provider}_refresh_token": None,
-        f"connections.{provider}_token_expiry": None,
-        "updated_at": datetime.utcnow()
+        **DISCONNECT_UPDATES[provider],
+        "updated_at": _utcnow()
     }
     
-    result = await database.users.update_one(
+    result = await database.users.with_options(
+        write_concern=TOGGLE_WRITE_CONCERN
+    ).update_one(
         {"id": current_user_id},
         {"$set": update_fields}
     )
@@ -263,9 +327,13 @@ async def disconnect_provider(
             detail="User not found"
         )
     
+    invalidate_user_cache(current_user_id)
+    await invalidate_user_views(current_user_id)
+    
     return {"message": f"{provider.title()} disconnected successfully"}
 
 @router.get("/dashboard-stats")
+@cached_user_view("dashboard")
 async def get_dashboard_stats(
     request: Request,
     current_user_id: str = Depends(get_current_user_id)
@@ -273,37 +341,72 @@ async def get_dashboard_stats(
     """Get comprehensive dashboard statistics for user"""
     database: AsyncIOMotorDatabase = request.app.database
     
-    # Get user info
-    user = await database.users.find_one({"id": current_user_id})
-    if not user:
+    # Get user info with email, calendar and notification counts joined in
+    # server-side, so the whole dashboard is one round-trip
+    dashboard = await database.users.aggregate([
+        {"$match": {"id": current_user_id}},
+        {"$project": USER_DASHBOARD_PROJECTION},
+        {
+            "$lookup": {
+                "from": "emails",
+                "pipeline": [
+                    {"$match": {"user_id": current_user_id}},
+                    {
+                        "$facet": {
+                            "total": [{"$count": "n"}],
+                            "unread": [
+                                {"$match": {"status": "unread"}},
+                                {"$count": "n"}
+                            ],
+                            "urgent": [
+                                {"$match": {"priority": "urgent", "status": "unread"}},
+                                {"$count": "n"}
+                            ]
+                        }
+                    }
+                ],
+                "as": "email_stats"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "calendar_events",
+                "pipeline": [
+                    {
+                        "$match": {
+                            "user_id": current_user_id,
+                            "start_datetime": {"$gte": _utcnow().replace(microsecond=0)}
+                        }
+                    },
+                    {"$count": "n"}
+                ],
+                "as": "upcoming_events"
+            }
+        },
+        {
+            "$lookup": {
+                "from": "notifications",
+                "pipeline": [
+                    {"$match": {"user_id": current_user_id, "status": "pending"}},
+                    {"$count": "n"}
+                ],
+                "as": "pending_notifications"
+            }
+        }
+    ]).to_list(1)
+    if not dashboard:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    # Get email stats
-    total_emails = await database.emails.count_documents({"user_id": current_user_id})
-    unread_emails = await database.emails.count_documents({
-        "user_id": current_user_id, 
-        "status": "unread"
-    })
-    urgent_emails = await database.emails.count_documents({
-        "user_id": current_user_id,
-        "priority": "urgent",
-        "status": "unread"
-    })
-    
-    # Get calendar stats  
-    upcoming_events = await database.calendar_events.count_documents({
-        "user_id": current_user_id,
-        "start_datetime": {"$gte": datetime.utcnow()}
-    })
-    
-    # Get notification stats
-    pending_notifications = await database.notifications.count_documents({
-        "user_id": current_user_id,
-        "status": "pending"
-    })
+    user = dashboard[0]
+    email_counts = {
+        key: counts[0]["n"] if counts else 0
+        for key, counts in user["email_stats"][0].items()
+    }
+    upcoming_events = user["upcoming_events"][0]["n"] if user["upcoming_events"] else 0
+    pending_notifications = user["pending_notifications"][0]["n"] if user["pending_notifications"] else 0
     
     # Get credit balance
     credits = user.get("credits", {})
@@ -316,9 +419,9 @@ async def get_dashboard_stats(
             "last_login": user.get("last_login")
         },
         "email_stats": {
-            "total_emails": total_emails,
-            "unread_emails": unread_emails,
-            "urgent_emails": urgent_emails
+            "total_emails": email_counts["total"],
+            "unread_emails": email_counts["unread"],
+            "urgent_emails": email_counts["urgent"]
         },
         "calendar_stats": {
             "upcoming_events": upcoming_events
@@ -1,10 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer
 from motor.motor_asyncio import AsyncIOMotorClient
+from arq import create_pool
+from arq.connections import RedisSettings
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from decouple import config
+from pymongo.errors import PyMongoError
+from twilio.base.exceptions import TwilioRestException
+import logging
+
+from utils.database import DatabaseManager
+from services.stripe_service import StripeService
+from services.credit_service import CreditService
+from services.ai_service import AIService
+from services.google_service import GoogleService
+from services.microsoft_service import MicrosoftService
+from utils.logging_config import setup_logging
 
 # Import all route modules
 from routes.auth import router as auth_router
@@ -18,6 +33,8 @@ from routes.emails import router as emails_router
 from routes.calendar import router as calendar_router
 from routes.analytics import router as analytics_router
 
+logger = logging.getLogger(__name__)
+
 # Database connection
 mongodb_client = None
 database = None
@@ -26,30 +43,78 @@ database = None
 async def lifespan(app: FastAPI):
     # Startup
     global mongodb_client, database
-    mongodb_client = AsyncIOMotorClient(config('MONGO_URL'))
+    log_listener = setup_logging()
+    
+    # Size the pool for concurrent handlers: each stats/list request can hold
+    # several connections at once (gathered queries), so keep
+    # concurrent requests x queries per request <= MONGO_POOL_MAX.
+    # Wire compression is negotiated with the server; zstd needs the
+    # zstandard package and falls back to zlib when it is missing.
+    mongo_pool_min = int(config('MONGO_POOL_MIN', default=20))
+    mongodb_client = AsyncIOMotorClient(
+        config('MONGO_URL'),
+        maxPoolSize=int(config('MONGO_POOL_MAX', default=200)),
+        minPoolSize=mongo_pool_min,
+        waitQueueTimeoutMS=2000,
+        serverSelectionTimeoutMS=3000,
+        compressors=config('MONGO_COMPRESSORS', default='zstd,zlib'),
+        retryWrites=True
+    )
     database = mongodb_client.jessica_ai
     app.mongodb_client = mongodb_client
     app.database = database
     
-    # Test database connection
+    # Check the connection, build indexes and open the minimum pool
+    # concurrently so workers start serving sooner
+    ping, indexes, *_ = await asyncio.gather(
+        mongodb_client.admin.command('ismaster'),
+        DatabaseManager(database).create_indexes(),
+        *(database.command('ping') for _ in range(mongo_pool_min)),
+        return_exceptions=True
+    )
+    if isinstance(ping, Exception):
+        logger.error("Failed to connect to MongoDB: %s", ping)
+    else:
+        logger.info("Connected to MongoDB")
+    if isinstance(indexes, Exception):
+        logger.error("Failed to create database indexes: %s", indexes)
+    elif indexes:
+        logger.error("Missing database indexes: %s", ", ".join(indexes))
+    
+    # Shared service instances, reused across requests
+    app.stripe_service = StripeService()
+    app.credit_service = CreditService(database)
+    
+    # Task queue for durable background jobs (see worker.py)
     try:
-        await mongodb_client.admin.command('ismaster')
-        print("✅ Connected to MongoDB successfully")
+        app.arq_pool = await create_pool(
+            RedisSettings.from_dsn(config('REDIS_URL', default='redis://localhost:6379'))
+        )
+        logger.info("Connected to task queue")
     except Exception as e:
-        print(f"❌ Failed to connect to MongoDB: {e}")
+        app.arq_pool = None
+        logger.error("Failed to connect to task queue: %s", e)
     
     yield
     
     # Shutdown
+    if app.arq_pool:
+        await app.arq_pool.close()
+    
+    await asyncio.gather(AIService.aclose(), GoogleService.aclose(), MicrosoftService.aclose())
+    
     if mongodb_client:
         mongodb_client.close()
-        print("📴 Disconnected from MongoDB")
+        logger.info("Disconnected from MongoDB")
+    
+    log_listener.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Jessica AI Agent API",
     description="Comprehensive SAAS Platform for Productivity Automation",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -69,6 +134,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Exception handlers: routes let unexpected errors propagate and these map
+# them to sanitized responses instead of leaking internals
+@app.exception_handler(PyMongoError)
+async def database_exception_handler(request: Request, exc: PyMongoError):
+    logger.exception("Database error on %s %s", request.method, request.url.path)
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database temporarily unavailable"}
+    )
+
+@app.exception_handler(TwilioRestException)
+async def twilio_exception_handler(request: Request, exc: TwilioRestException):
+    logger.exception("Twilio error on %s %s", request.method, request.url.path)
+    return ORJSONResponse(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        content={"detail": "Notification provider error"}
+    )
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.exception("Unhandled error on %s %s", request.method, request.url.path)
+    return ORJSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "Internal server error"}
+    )
+
 # Include all routers with proper prefixes
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users_router, prefix="/api/users", tags=["User Management"])
@@ -91,6 +182,19 @@ async def health_check():
         "database": "connected" if mongodb_client else "disconnected"
     }
 
+@app.get("/api/healthz")
+async def healthz():
+    """Database ping, also keeps pooled connections warm"""
+    try:
+        await mongodb_client.admin.command('ping')
+        return {"status": "ok"}
+    except Exception:
+        logger.exception("Health check ping failed")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable"
+        )
+
 @app.get("/api")
 async def root():
     """Root endpoint with API information"""
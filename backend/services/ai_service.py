@@ -1,46 +1,31 @@
 import openai
-import json
-from typing import Dict, Any, List, Optional
+import httpx
+import asyncio
+import functools
+import hashlib
+import logging
+import orjson
+import re
+import tiktoken
+from collections import Counter
+from typing import Dict, Any, List, Optional, AsyncIterator, Union, NamedTuple
 from datetime import datetime
 from decouple import config
+from cachetools import LRUCache, TTLCache
+from aiolimiter import AsyncLimiter
+from pydantic import BaseModel, ValidationError
 
-class AIService:
-    """Service for AI-powered email analysis and automation"""
-    
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=config('OPENAI_API_KEY', default='sk-placeholder'))
-        self.model = "gpt-4o"  # Using latest model
-    
-    async def analyze_email_content(
-        self, 
-        subject: str,
-        body_text: str,
-        sender_email: str,
-        sender_name: Optional[str] = None,
-        user_guidelines: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """Analyze email content for classification and insights"""
-        
-        try:
-            # Prepare context from user guidelines
-            guidelines_context = ""
-            if user_guidelines:
-                email_rules = user_guidelines.get("email_classification_rules", [])
-                if email_rules:
-                    guidelines_context = f"\nUser's email classification preferences: {json.dumps(email_rules, indent=2)}"
-            
-            # Create analysis prompt
-            prompt = f"""
-You are Jessica, an AI email assistant. Analyze this email and provide insights:
+from models.ai import EmailAnalysis, DraftResponse, CalendarAnalysis, SchedulingSuggestions
 
-EMAIL DETAILS:
-From: {sender_name or sender_email} <{sender_email}>
-Subject: {subject}
-Body: {body_text}
+logger = logging.getLogger(__name__)
 
-{guidelines_context}
+# Prompts lead with their static instructions and end with the per-call
+# fields, so repeated calls share a byte-identical prefix that OpenAI's
+# prompt caching can reuse
+EMAIL_ANALYSIS_SYSTEM = "You are Jessica, an intelligent email analysis AI assistant. Always respond with valid JSON only."
+EMAIL_ANALYSIS_INSTRUCTIONS = """You are Jessica, an AI email assistant. Analyze the email given after these instructions and provide insights.
 
-Please analyze this email and return a JSON response with:
+Return a JSON response with:
 1. sentiment: "positive", "negative", or "neutral"
 2. urgency_score: float 0.0-1.0 (0=not urgent, 1=extremely urgent)
 3. topics: list of main topics/keywords (max 5)
@@ -57,53 +42,584 @@ Consider factors like:
 - Time-sensitive content
 - Action requests
 - Questions requiring responses
+- The user's email classification preferences, when given
 
-Return only valid JSON.
-"""
+Return only valid JSON."""
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are Jessica, an intelligent email analysis AI assistant. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
+DRAFT_SYSTEM = "You are Jessica, an intelligent email drafting AI assistant. Always respond with valid JSON only."
+DRAFT_INSTRUCTIONS = """You are Jessica, an AI email assistant. Generate a professional email reply based on the original email, user profile and requirements given after these instructions.
+
+Return JSON with:
+1. body_text: plain text version of the reply
+2. body_html: HTML version of the reply
+3. confidence: float 0.0-1.0 (confidence in response appropriateness)
+4. prompt_used: brief description of approach taken
+
+Guidelines:
+- Match the user's communication style and tone
+- Address all points from the original email
+- Be helpful and professional
+- Include appropriate greeting and closing
+- Keep the requested length
+- Use the requested tone throughout
+
+Return only valid JSON."""
+
+CALENDAR_SYSTEM = "You are Jessica, an intelligent calendar analysis AI assistant. Always respond with valid JSON only."
+CALENDAR_INSTRUCTIONS = """You are Jessica, an AI calendar optimization assistant. Analyze the calendar event given after these instructions.
+
+Return JSON with:
+1. optimal_time_score: float 0.0-1.0 (how optimal is this timing?)
+2. productivity_impact: "low", "medium", or "high"
+3. meeting_type_classification: string (meeting type/purpose)
+4. estimated_preparation_time: int (minutes needed to prepare)
+5. recommended_buffer_time: int (minutes buffer before/after)
+6. energy_level_match: "high", "medium", or "low" (energy needed vs time slot)
+7. scheduling_suggestions: list of improvement suggestions (max 3)
+
+Consider:
+- Time of day for different meeting types
+- Meeting duration appropriateness
+- Attendee convenience
+- Buffer time needs
+- Energy levels throughout day
+
+Return only valid JSON."""
+
+SCHEDULING_SYSTEM = "You are Jessica, an intelligent scheduling AI assistant. Always respond with valid JSON only."
+SCHEDULING_INSTRUCTIONS = """You are Jessica, an AI scheduling assistant. Based on the meeting context given after these instructions, suggest optimal meeting times.
+
+Find 3-5 optimal time slots considering:
+- Avoid conflicts with existing events
+- Prefer user's optimal time preferences
+- Consider meeting type and duration
+- Allow buffer time between meetings
+- Account for different time zones if needed
+
+Return JSON with a "suggestions" array, each containing:
+1. suggested_datetime: ISO datetime string
+2. duration_minutes: int (meeting duration)
+3. confidence_score: float 0.0-1.0 (how good is this slot?)
+4. reasons: list of strings explaining why this time is good (max 3)
+5. attendee_availability: list of objects with email and boolean available
+6. optimal_score: float 0.0-1.0 (overall optimization score)
+
+Suggest 3-5 time slots in order of preference.
+Return only valid JSON."""
+
+# System messages are shared by every call so the leading message is the
+# same object each time; the client only reads them
+_SYS_EMAIL = {"role": "system", "content": EMAIL_ANALYSIS_SYSTEM}
+_SYS_DRAFT = {"role": "system", "content": DRAFT_SYSTEM}
+_SYS_CALENDAR = {"role": "system", "content": CALENDAR_SYSTEM}
+_SYS_SCHEDULING = {"role": "system", "content": SCHEDULING_SYSTEM}
+
+def _json_schema_format(name: str, model: type[BaseModel]) -> Dict[str, Any]:
+    """Structured-outputs response_format for a response model"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": model.model_json_schema(), "strict": True}
+    }
+
+# Structured outputs: the API guarantees JSON matching these schemas, so
+# responses need no fence stripping and parse on the first try
+EMAIL_ANALYSIS_FORMAT = _json_schema_format("email_analysis", EmailAnalysis)
+DRAFT_FORMAT = _json_schema_format("email_draft", DraftResponse)
+CALENDAR_FORMAT = _json_schema_format("calendar_analysis", CalendarAnalysis)
+SCHEDULING_FORMAT = _json_schema_format("scheduling_suggestions", SchedulingSuggestions)
+
+# Bulk analyses sent through the Batch API (half the cost, separate rate
+# limits) fall back to online requests if the batch is not done by then
+BATCH_TIMEOUT_SECONDS = int(config('AI_BATCH_TIMEOUT_SECONDS', default=3600))
+
+# Completions for identical requests (model, sampling settings and messages),
+# shared by every AIService instance in the worker. Analyses run at low
+# temperature, so replaying an answer for the same input is acceptable.
+_completion_cache = TTLCache(maxsize=10_000, ttl=3600)
+
+# Completions currently being requested, by the same key as the cache, so
+# identical concurrent requests (e.g. one email sent to a group) share a call
+_inflight_completions: Dict[str, asyncio.Future] = {}
+
+# Pretty-printed guideline JSON, keyed by the identity of the rules object.
+# A batch passes the same guidelines document for every email, so it is
+# serialized once; the stored reference keeps the id from being reused.
+_prompt_json_cache = LRUCache(maxsize=512)
+
+def _prompt_json(value: Any) -> str:
+    """Serialize guideline data for a prompt, reusing the last dump of the same object"""
+    cached = _prompt_json_cache.get(id(value))
+    if cached is not None and cached[0] is value:
+        return cached[1]
+    
+    text = orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode()
+    _prompt_json_cache[id(value)] = (value, text)
+    return text
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO timestamp, memoized since the same events recur across calls"""
+    return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+
+def _to_datetime(value: Any) -> datetime:
+    """Event time as a datetime; Mongo already decodes these, strings are parsed"""
+    if isinstance(value, datetime):
+        return value
+    return _parse_iso(str(value))
+
+class ContextEvent(NamedTuple):
+    """Calendar event reduced to the fields conflict detection needs"""
+    id: str
+    title: str
+    start: datetime
+    end: datetime
+
+def prepare_context(events: List[Dict[str, Any]]) -> List[ContextEvent]:
+    """Parse context events once so they can be reused across analyses"""
+    prepared = []
+    for event in events:
+        try:
+            prepared.append(ContextEvent(
+                event['id'],
+                event['title'],
+                _to_datetime(event['start_datetime']),
+                _to_datetime(event['end_datetime'])
+            ))
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skipping context event %s with invalid times", event.get('id'))
+    return prepared
+
+# Escape sequences a JSON string can contain, other than \uXXXX
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_JSON_FIELD_START = r'"{field}"\s*:\s*"'
+
+class _StreamedJsonString:
+    """Incrementally decodes one top-level string field of streamed JSON"""
+    
+    def __init__(self, field: str):
+        self._start = re.compile(_JSON_FIELD_START.format(field=re.escape(field)))
+        self._buffer = ""
+        self._pos = None
+        self.done = False
+    
+    def feed(self, chunk: str) -> str:
+        """Add streamed text; return the newly decoded part of the field value"""
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        
+        buffer, i, decoded = self._buffer, self._pos, []
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                break
+            if char != '\\':
+                decoded.append(char)
+                i += 1
+                continue
+            # Stop at an escape split across chunks; the next feed resumes it
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != 'u':
+                decoded.append(_JSON_ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # Surrogate pair: wait for the low half as well
+                if i + 12 > len(buffer):
+                    break
+                low = int(buffer[i + 8:i + 12], 16)
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                i += 6
+            decoded.append(chr(code))
+            i += 6
+        
+        self._pos = i
+        return "".join(decoded)
+
+# One connection pool per worker. AIService is created per request, so a
+# client per instance would redo the TCP/TLS handshake on every call; HTTP/2
+# multiplexes concurrent (gathered) calls over a few connections.
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=30),
+    timeout=httpx.Timeout(60.0, connect=5.0)
+)
+# The SDK retries 429s and 5xx with jittered exponential backoff and honors
+# Retry-After, so rate-limited calls are retried rather than falling back
+_openai_client = openai.AsyncOpenAI(
+    api_key=config('OPENAI_API_KEY', default='sk-placeholder'),
+    http_client=_http_client,
+    max_retries=5
+)
+
+# Per-worker request and token budgets, kept under the account's limits so
+# bursts wait locally instead of spending a round-trip on a 429
+OPENAI_RPM = int(config('OPENAI_RPM', default=500))
+OPENAI_TPM = int(config('OPENAI_TPM', default=30000))
+_request_limiter = AsyncLimiter(OPENAI_RPM, 60)
+_token_limiter = AsyncLimiter(OPENAI_TPM, 60)
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding() -> tiktoken.Encoding:
+    """The gpt-4o tokenizer, loaded on first use rather than at import"""
+    return tiktoken.encoding_for_model("gpt-4o")
+
+# Static prompt text is tokenized once per worker; per call only the dynamic
+# suffix after it is encoded
+STATIC_PROMPTS = (
+    EMAIL_ANALYSIS_INSTRUCTIONS,
+    DRAFT_INSTRUCTIONS,
+    CALENDAR_INSTRUCTIONS,
+    SCHEDULING_INSTRUCTIONS
+)
+
+@functools.lru_cache(maxsize=32)
+def _static_token_count(text: str) -> int:
+    """Token count of a system message or static instruction block"""
+    return len(_get_encoding().encode(text))
+
+def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a call counts against the TPM limit: prompt plus max_tokens"""
+    encoding = _get_encoding()
+    tokens = max_tokens
+    for message in messages:
+        content = message["content"]
+        if message["role"] == "system":
+            tokens += _static_token_count(content)
+            continue
+        for static in STATIC_PROMPTS:
+            if content.startswith(static):
+                tokens += _static_token_count(static)
+                content = content[len(static):]
+                break
+        tokens += len(encoding.encode(content))
+    return tokens
+
+# Quoted reply history adds prompt tokens (and latency) without changing the
+# analysis: "On <date>, <name> wrote:" / Outlook headers to the end, and "> " lines
+_QUOTED_HISTORY = re.compile(
+    r'^(?:On [^\n]{0,300}wrote:|-{2,}\s*Original Message\s*-{2,}).*\Z',
+    re.MULTILINE | re.DOTALL
+)
+_QUOTED_LINE = re.compile(r'^>.*(?:\n|\Z)', re.MULTILINE)
+MAX_BODY_TOKENS = 2000
+
+def _trim_body(text: str, max_tokens: int = MAX_BODY_TOKENS) -> str:
+    """Drop quoted history and cap an email body at max_tokens, keeping head and tail"""
+    stripped = _QUOTED_LINE.sub("", _QUOTED_HISTORY.sub("", text)).strip()
+    text = stripped or text
+    
+    # Every token covers at least one character, so short bodies skip encoding
+    if len(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    
+    head = max_tokens * 3 // 4
+    tail = max_tokens - head
+    return f"{encoding.decode(tokens[:head])}\n[...]\n{encoding.decode(tokens[-tail:])}"
+
+# Classification-style tasks run on the cheaper, faster mini model; drafts
+# keep the full model since their quality is user-visible
+TASK_MODELS = {
+    "analyze_email": "gpt-4o-mini",
+    "draft": "gpt-4o",
+    "calendar": "gpt-4o-mini",
+    "scheduling": "gpt-4o-mini"
+}
+
+# Title keywords for the rule-based analysis of routine calendar events,
+# checked in order
+MEETING_TYPE_KEYWORDS = (
+    ("standup", "standup"),
+    ("stand-up", "standup"),
+    ("1:1", "one_on_one"),
+    ("one on one", "one_on_one"),
+    ("interview", "interview"),
+    ("review", "review"),
+    ("planning", "planning"),
+    ("focus", "focus_time"),
+    ("lunch", "social"),
+    ("coffee", "social")
+)
+
+# Email analyses less confident than this are re-run on the full model
+ESCALATION_CONFIDENCE = 0.5
+
+class AIService:
+    """Service for AI-powered email analysis and automation"""
+    
+    def __init__(self, max_concurrency: int = 20, escalate_on_low_confidence: bool = True):
+        self.client = _openai_client
+        self.model = "gpt-4o"  # Using latest model
+        self.models = dict(TASK_MODELS)
+        self.escalate_on_low_confidence = escalate_on_low_confidence
+        self.max_concurrency = max_concurrency
+        # Bounds in-flight API calls when a batch is gathered, keeping bursts
+        # under the OpenAI rate limits
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    @staticmethod
+    async def aclose():
+        """Close the shared HTTP connection pool at shutdown"""
+        await _http_client.aclose()
+    
+    async def _create_completion(self, **kwargs):
+        """Call chat.completions.create within the concurrency and rate limits"""
+        tokens = _estimate_tokens(kwargs["messages"], kwargs.get("max_tokens", 0))
+        await _token_limiter.acquire(min(tokens, OPENAI_TPM))
+        async with _request_limiter, self._semaphore:
+            return await self.client.chat.completions.create(**kwargs)
+    
+    async def _cached_complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Dict[str, Any]
+    ) -> str:
+        """Get a completion's text, reusing the answer to an identical request"""
+        key = hashlib.sha256(orjson.dumps(
+            [model, temperature, max_tokens, response_format["json_schema"]["name"], messages],
+            option=orjson.OPT_SORT_KEYS
+        )).hexdigest()
+        cached = _completion_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        inflight = _inflight_completions.get(key)
+        if inflight is not None:
+            try:
+                # Shielded so a cancelled waiter doesn't cancel the shared call
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request that owned the call was cancelled, so make our own
+                return await self._cached_complete(model, messages, temperature, max_tokens, response_format)
+        
+        future = _inflight_completions[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._create_completion(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format=response_format
+            )
+            choice = response.choices[0]
+            # Refusals come back without content and fail validation downstream
+            content = (choice.message.content or "").strip()
+            # Truncated output is likely invalid JSON, so don't replay it
+            if choice.finish_reason == "stop":
+                _completion_cache[key] = content
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; retrieving it here stops asyncio warning
+            # about an unretrieved exception when there were none
+            future.exception()
+            raise
+        finally:
+            del _inflight_completions[key]
+    
+    def _email_analysis_messages(
+        self,
+        subject: str,
+        body_text: str,
+        sender_email: str,
+        sender_name: Optional[str] = None,
+        user_guidelines: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for an email analysis request"""
+        # Prepare context from user guidelines; sorted keys keep identical
+        # guidelines byte-identical across calls
+        guidelines_context = ""
+        if user_guidelines:
+            email_rules = user_guidelines.get("email_classification_rules", [])
+            if email_rules:
+                guidelines_context = f"\n\nUser's email classification preferences: {_prompt_json(email_rules)}"
+        
+        # Static instructions first, email details last
+        prompt = f"""{EMAIL_ANALYSIS_INSTRUCTIONS}
+
+EMAIL DETAILS:
+From: {sender_name or sender_email} <{sender_email}>
+Subject: {subject}
+Body: {_trim_body(body_text)}{guidelines_context}"""
+        
+        return [
+            _SYS_EMAIL,
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _parse_email_analysis(self, analysis_text: str) -> Dict[str, Any]:
+        """Validate an email analysis response and apply the list limits"""
+        analysis_result = EmailAnalysis.model_validate_json(analysis_text).model_dump()
+        analysis_result["topics"] = analysis_result["topics"][:5]
+        analysis_result["suggested_actions"] = analysis_result["suggested_actions"][:3]
+        analysis_result["key_entities"] = analysis_result["key_entities"][:5]
+        return analysis_result
+    
+    async def analyze_email_content(
+        self, 
+        subject: str,
+        body_text: str,
+        sender_email: str,
+        sender_name: Optional[str] = None,
+        user_guidelines: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Analyze email content for classification and insights"""
+        
+        try:
+            messages = self._email_analysis_messages(
+                subject, body_text, sender_email, sender_name, user_guidelines
             )
             
-            # Parse response
-            analysis_text = response.choices[0].message.content.strip()
-            
-            # Clean and parse JSON
-            if analysis_text.startswith("```json"):
-                analysis_text = analysis_text[7:-3]
-            elif analysis_text.startswith("```"):
-                analysis_text = analysis_text[3:-3]
+            # Call OpenAI API, replaying the answer to an identical request
+            analysis_text = await self._cached_complete(
+                model=self.models["analyze_email"],
+                messages=messages,
+                temperature=0.3,
+                max_tokens=1000,
+                response_format=EMAIL_ANALYSIS_FORMAT
+            )
+            analysis_result = self._parse_email_analysis(analysis_text)
             
-            analysis_result = json.loads(analysis_text)
+            # Re-run uncertain analyses on the full model
+            if (
+                self.escalate_on_low_confidence
+                and analysis_result["confidence_score"] < ESCALATION_CONFIDENCE
+                and self.models["analyze_email"] != self.model
+            ):
+                analysis_text = await self._cached_complete(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=1000,
+                    response_format=EMAIL_ANALYSIS_FORMAT
+                )
+                analysis_result = self._parse_email_analysis(analysis_text)
             
-            # Validate and set defaults
-            return {
-                "sentiment": analysis_result.get("sentiment", "neutral"),
-                "urgency_score": float(analysis_result.get("urgency_score", 0.5)),
-                "topics": analysis_result.get("topics", [])[:5],
-                "action_required": bool(analysis_result.get("action_required", False)),
-                "suggested_actions": analysis_result.get("suggested_actions", [])[:3],
-                "key_entities": analysis_result.get("key_entities", [])[:5],
-                "deadline_mentioned": analysis_result.get("deadline_mentioned"),
-                "meeting_request": bool(analysis_result.get("meeting_request", False)),
-                "confidence_score": float(analysis_result.get("confidence_score", 0.7))
-            }
+            return analysis_result
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error in AI analysis: {e}")
+        except ValidationError as e:
+            logger.warning("Invalid AI analysis response: %s", e)
             return self._get_fallback_analysis()
-        except Exception as e:
-            print(f"AI analysis error: {e}")
+        except Exception:
+            logger.exception("AI analysis failed")
             return self._get_fallback_analysis()
     
-    async def generate_email_draft(
+    async def analyze_emails_batch(
+        self,
+        emails: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Analyze emails concurrently, each given as analyze_email_content kwargs"""
+        return await asyncio.gather(*(
+            self.analyze_email_content(**email) for email in emails
+        ))
+    
+    async def analyze_emails_bulk(
+        self,
+        emails: Dict[str, Dict[str, Any]],
+        use_batch: bool = True,
+        timeout_s: float = BATCH_TIMEOUT_SECONDS
+    ) -> Dict[str, Dict[str, Any]]:
+        """Analyze emails keyed by id, through the Batch API when use_batch is set"""
+        results = {}
+        
+        if use_batch and emails:
+            try:
+                batch = await self._submit_email_batch(emails)
+                batch = await self.wait_for_batch(batch.id, timeout_s=timeout_s)
+                if batch is not None and batch.output_file_id:
+                    output = await self.client.files.content(batch.output_file_id)
+                    for line in output.text.splitlines():
+                        item = orjson.loads(line)
+                        try:
+                            body = item["response"]["body"]
+                            analysis_text = body["choices"][0]["message"]["content"].strip()
+                            results[item["custom_id"]] = self._parse_email_analysis(analysis_text)
+                        except (KeyError, IndexError, TypeError, ValueError):
+                            continue
+            except Exception:
+                logger.exception("Batch email analysis failed for %d emails", len(emails))
+        
+        # Anything the batch did not answer goes through the online path
+        missing = [email_id for email_id in emails if email_id not in results]
+        if missing:
+            analyses = await self.analyze_emails_batch([emails[email_id] for email_id in missing])
+            results.update(zip(missing, analyses))
+        
+        return results
+    
+    async def _submit_email_batch(self, emails: Dict[str, Dict[str, Any]]):
+        """Upload email analysis requests as a JSONL batch input and start the batch"""
+        lines = [
+            orjson.dumps({
+                "custom_id": email_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.models["analyze_email"],
+                    "messages": self._email_analysis_messages(**email),
+                    "temperature": 0.3,
+                    "max_tokens": 1000,
+                    "response_format": EMAIL_ANALYSIS_FORMAT
+                }
+            })
+            for email_id, email in emails.items()
+        ]
+        batch_input = await self.client.files.create(
+            file=("email_analysis.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        return await self.client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+    
+    async def wait_for_batch(
+        self,
+        batch_id: str,
+        poll_s: float = 30,
+        timeout_s: float = BATCH_TIMEOUT_SECONDS
+    ):
+        """Poll a batch until it completes; None if it failed or timed out"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_s
+        
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                return batch
+            if batch.status in ("failed", "expired", "cancelled"):
+                return None
+            if loop.time() >= deadline:
+                # Stop paying for work the caller is about to redo online
+                await self.client.batches.cancel(batch_id)
+                return None
+            await asyncio.sleep(poll_s)
+    
+    def _draft_messages(
         self,
         original_email: Dict[str, Any],
         user_guidelines: Optional[Dict[str, Any]] = None,
@@ -111,29 +627,27 @@ Return only valid JSON.
         tone: str = "professional",
         length: str = "medium",
         custom_instructions: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate AI-powered email draft response"""
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a draft reply"""
+        # Extract communication style from guidelines
+        comm_style = {}
+        if user_guidelines:
+            comm_style = user_guidelines.get("communication_style", {})
         
-        try:
-            # Extract communication style from guidelines
-            comm_style = {}
-            if user_guidelines:
-                comm_style = user_guidelines.get("communication_style", {})
-            
-            # Extract user info
-            user_name = ""
-            user_signature = ""
-            if user_profile:
-                profile = user_profile.get("profile", {})
-                user_name = profile.get("full_name", "")
-                user_signature = comm_style.get("signature", "")
-            
-            # Prepare context
-            context = f"""
+        # Extract user info
+        user_name = ""
+        user_signature = ""
+        if user_profile:
+            profile = user_profile.get("profile", {})
+            user_name = profile.get("full_name", "")
+            user_signature = comm_style.get("signature", "")
+        
+        # Prepare context
+        context = f"""
 ORIGINAL EMAIL:
 From: {original_email['sender']['email']}
 Subject: {original_email['subject']}
-Body: {original_email.get('body_text', '')}
+Body: {_trim_body(original_email.get('body_text') or '')}
 
 USER PROFILE:
 Name: {user_name}
@@ -148,93 +662,142 @@ REQUIREMENTS:
 - Include context: {comm_style.get('include_context', True)}
 """
 
-            if custom_instructions:
-                context += f"\nCUSTOM INSTRUCTIONS: {custom_instructions}"
-
-            prompt = f"""
-You are Jessica, an AI email assistant. Generate a professional email reply based on:
-
-{context}
-
-Please generate an appropriate email response and return JSON with:
-1. body_text: plain text version of the reply
-2. body_html: HTML version of the reply
-3. confidence: float 0.0-1.0 (confidence in response appropriateness)
-4. prompt_used: brief description of approach taken
-
-Guidelines:
-- Match the user's communication style and tone
-- Address all points from the original email
-- Be helpful and professional
-- Include appropriate greeting and closing
-- Keep length as requested ({length})
-- Use {tone} tone throughout
-
-Return only valid JSON.
-"""
+        if custom_instructions:
+            context += f"\nCUSTOM INSTRUCTIONS: {custom_instructions}"
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are Jessica, an intelligent email drafting AI assistant. Always respond with valid JSON only."},
-                    {"role": "user", "content": prompt}
-                ],
+        # Static instructions first, per-email context last
+        return [
+            _SYS_DRAFT,
+            {"role": "user", "content": f"{DRAFT_INSTRUCTIONS}\n{context}"}
+        ]
+    
+    def _parse_draft(self, draft_text: str) -> Dict[str, Any]:
+        """Validate a draft response and fill in the HTML body"""
+        draft_result = DraftResponse.model_validate_json(draft_text)
+        
+        # Convert plain text to HTML if not provided
+        body_html = draft_result.body_html or draft_result.body_text.replace("\n", "<br>")
+        
+        return {
+            "body_text": draft_result.body_text,
+            "body_html": body_html,
+            "confidence": draft_result.confidence,
+            "prompt_used": draft_result.prompt_used or "Generated professional response"
+        }
+    
+    async def generate_email_draft(
+        self,
+        original_email: Dict[str, Any],
+        user_guidelines: Optional[Dict[str, Any]] = None,
+        user_profile: Optional[Dict[str, Any]] = None,
+        tone: str = "professional",
+        length: str = "medium",
+        custom_instructions: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate AI-powered email draft response"""
+        
+        try:
+            # Call OpenAI API, replaying the answer to an identical request
+            draft_text = await self._cached_complete(
+                model=self.models["draft"],
+                messages=self._draft_messages(
+                    original_email, user_guidelines, user_profile,
+                    tone, length, custom_instructions
+                ),
                 temperature=0.4,
-                max_tokens=1500
+                max_tokens=1500,
+                response_format=DRAFT_FORMAT
             )
             
-            # Parse response
-            draft_text = response.choices[0].message.content.strip()
-            
-            # Clean and parse JSON
-            if draft_text.startswith("```json"):
-                draft_text = draft_text[7:-3]
-            elif draft_text.startswith("```"):
-                draft_text = draft_text[3:-3]
+            return self._parse_draft(draft_text)
             
-            draft_result = json.loads(draft_text)
+        except ValidationError as e:
+            logger.warning("Invalid draft generation response: %s", e)
+            return self._get_fallback_draft()
+        except Exception:
+            logger.exception("Draft generation failed")
+            return self._get_fallback_draft()
+    
+    async def stream_email_draft(
+        self,
+        original_email: Dict[str, Any],
+        user_guidelines: Optional[Dict[str, Any]] = None,
+        user_profile: Optional[Dict[str, Any]] = None,
+        tone: str = "professional",
+        length: str = "medium",
+        custom_instructions: Optional[str] = None
+    ) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        """Yield a draft's body_text as it is generated, then the full draft dict"""
+        body_text = _StreamedJsonString("body_text")
+        streamed = False
+        
+        try:
+            stream = await self._create_completion(
+                model=self.models["draft"],
+                messages=self._draft_messages(
+                    original_email, user_guidelines, user_profile,
+                    tone, length, custom_instructions
+                ),
+                temperature=0.4,
+                max_tokens=1500,
+                response_format=DRAFT_FORMAT,
+                stream=True
+            )
             
-            # Convert plain text to HTML if not provided
-            body_html = draft_result.get("body_html")
-            if not body_html:
-                body_text = draft_result.get("body_text", "")
-                body_html = body_text.replace("\n", "<br>")
+            # body_text is the schema's first field, so it streams before the rest
+            raw = []
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                raw.append(chunk.choices[0].delta.content)
+                text = body_text.feed(raw[-1])
+                if text:
+                    streamed = True
+                    yield text
             
-            return {
-                "body_text": draft_result.get("body_text", ""),
-                "body_html": body_html,
-                "confidence": float(draft_result.get("confidence", 0.7)),
-                "prompt_used": draft_result.get("prompt_used", "Generated professional response")
-            }
+            draft = self._parse_draft("".join(raw))
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error in draft generation: {e}")
-            return self._get_fallback_draft()
-        except Exception as e:
-            print(f"Draft generation error: {e}")
-            return self._get_fallback_draft()
+        except Exception:
+            logger.exception("Draft streaming failed")
+            draft = self._get_fallback_draft()
+            if not streamed:
+                yield draft["body_text"]
+        
+        yield draft
     
     async def analyze_calendar_event(
         self,
         event: Dict[str, Any],
-        context_events: List[Dict[str, Any]],
+        context_events: Union[List[Dict[str, Any]], List[ContextEvent]],
         user_guidelines: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Analyze calendar event for scheduling optimization"""
+        """Analyze calendar event for scheduling optimization
+        
+        Callers analyzing several events against the same context can pass
+        it through prepare_context once instead of raw event documents.
+        """
         
         try:
+            if context_events and not isinstance(context_events[0], ContextEvent):
+                context_events = prepare_context(context_events)
+            
             # Prepare scheduling preferences
             scheduling_prefs = []
             if user_guidelines:
                 scheduling_prefs = user_guidelines.get("scheduling_preferences", [])
             
-            # Analyze conflicts with other events
+            # Analyze conflicts with other events; these are reported as
+            # computed here, so the model is not told about them
             conflicts = self._detect_conflicts(event, context_events)
             
-            # Create analysis prompt
-            prompt = f"""
-You are Jessica, an AI calendar optimization assistant. Analyze this calendar event:
+            # Routine solo events without preferences don't need the model
+            start = _to_datetime(event['start_datetime'])
+            duration_minutes = (_to_datetime(event['end_datetime']) - start).total_seconds() / 60
+            if not scheduling_prefs and not event.get('attendees') and 15 <= duration_minutes <= 60:
+                return self._heuristic_calendar_analysis(event, start, duration_minutes, conflicts)
+            
+            # Static instructions first, event details last
+            prompt = f"""{CALENDAR_INSTRUCTIONS}
 
 EVENT:
 Title: {event['title']}
@@ -244,64 +807,28 @@ Attendees: {len(event.get('attendees', []))}
 Location: {event.get('location', {}).get('name', 'Not specified')}
 
 CONTEXT EVENTS: {len(context_events)} other events in timeframe
-CONFLICTS DETECTED: {len(conflicts)} potential conflicts
 
-SCHEDULING PREFERENCES: {json.dumps(scheduling_prefs, indent=2) if scheduling_prefs else 'None specified'}
+SCHEDULING PREFERENCES: {_prompt_json(scheduling_prefs) if scheduling_prefs else 'None specified'}"""
 
-Analyze and return JSON with:
-1. optimal_time_score: float 0.0-1.0 (how optimal is this timing?)
-2. productivity_impact: "low", "medium", or "high"
-3. meeting_type_classification: string (meeting type/purpose)
-4. estimated_preparation_time: int (minutes needed to prepare)
-5. recommended_buffer_time: int (minutes buffer before/after)
-6. energy_level_match: "high", "medium", or "low" (energy needed vs time slot)
-7. conflicts_detected: list of conflict objects with type and description
-8. scheduling_suggestions: list of improvement suggestions (max 3)
-
-Consider:
-- Time of day for different meeting types
-- Meeting duration appropriateness
-- Attendee convenience
-- Buffer time needs
-- Energy levels throughout day
-
-Return only valid JSON.
-"""
-
-            response = self.client.chat.completions.create(
-                model=self.model,
+            # Call OpenAI API, replaying the answer to an identical request
+            analysis_text = await self._cached_complete(
+                model=self.models["calendar"],
                 messages=[
-                    {"role": "system", "content": "You are Jessica, an intelligent calendar analysis AI assistant. Always respond with valid JSON only."},
+                    _SYS_CALENDAR,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3,
-                max_tokens=1000
+                max_tokens=1000,
+                response_format=CALENDAR_FORMAT
             )
             
-            # Parse response
-            analysis_text = response.choices[0].message.content.strip()
-            
-            # Clean and parse JSON
-            if analysis_text.startswith("```json"):
-                analysis_text = analysis_text[7:-3]
-            elif analysis_text.startswith("```"):
-                analysis_text = analysis_text[3:-3]
-            
-            analysis_result = json.loads(analysis_text)
-            
-            return {
-                "optimal_time_score": float(analysis_result.get("optimal_time_score", 0.7)),
-                "productivity_impact": analysis_result.get("productivity_impact", "medium"),
-                "meeting_type_classification": analysis_result.get("meeting_type_classification", "general"),
-                "estimated_preparation_time": int(analysis_result.get("estimated_preparation_time", 15)),
-                "recommended_buffer_time": int(analysis_result.get("recommended_buffer_time", 15)),
-                "energy_level_match": analysis_result.get("energy_level_match", "medium"),
-                "conflicts_detected": conflicts,  # Use our detected conflicts
-                "scheduling_suggestions": analysis_result.get("scheduling_suggestions", [])[:3]
-            }
+            analysis_result = CalendarAnalysis.model_validate_json(analysis_text).model_dump()
+            analysis_result["scheduling_suggestions"] = analysis_result["scheduling_suggestions"][:3]
+            analysis_result["conflicts_detected"] = conflicts  # Use our detected conflicts
+            return analysis_result
             
-        except Exception as e:
-            print(f"Calendar analysis error: {e}")
+        except Exception:
+            logger.exception("Calendar analysis failed for event %s", event.get('id'))
             return self._get_fallback_calendar_analysis()
     
     async def generate_scheduling_suggestions(
@@ -318,8 +845,9 @@ Return only valid JSON.
         """Generate AI-powered scheduling suggestions"""
         
         try:
-            # Prepare context
-            context = f"""
+            # Static instructions first, meeting context last
+            prompt = f"""{SCHEDULING_INSTRUCTIONS}
+
 MEETING TO SCHEDULE:
 Title: {title}
 Duration: {duration_minutes} minutes
@@ -328,62 +856,34 @@ Date Range: {date_range_start} to {date_range_end}
 Preferred Times: {preferred_times or 'None specified'}
 
 EXISTING EVENTS: {len(existing_events)} events in range
-SCHEDULING PREFERENCES: {user_guidelines.get('scheduling_preferences', []) if user_guidelines else 'None'}
-
-Find 3-5 optimal time slots considering:
-- Avoid conflicts with existing events
-- Prefer user's optimal time preferences
-- Consider meeting type and duration
-- Allow buffer time between meetings
-- Account for different time zones if needed
-"""
-
-            prompt = f"""
-You are Jessica, an AI scheduling assistant. Based on the context, suggest optimal meeting times:
-
-{context}
-
-Return JSON with array of suggestions, each containing:
-1. suggested_datetime: ISO datetime string
-2. duration_minutes: int (meeting duration)
-3. confidence_score: float 0.0-1.0 (how good is this slot?)
-4. reasons: list of strings explaining why this time is good (max 3)
-5. attendee_availability: object with email keys and boolean availability values
-6. optimal_score: float 0.0-1.0 (overall optimization score)
+SCHEDULING PREFERENCES: {user_guidelines.get('scheduling_preferences', []) if user_guidelines else 'None'}"""
 
-Suggest 3-5 time slots in order of preference.
-Return only valid JSON.
-"""
-
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = await self._create_completion(
+                model=self.models["scheduling"],
                 messages=[
-                    {"role": "system", "content": "You are Jessica, an intelligent scheduling AI assistant. Always respond with valid JSON only."},
+                    _SYS_SCHEDULING,
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.4,
-                max_tokens=1500
+                max_tokens=1500,
+                response_format=SCHEDULING_FORMAT
             )
             
             # Parse response
-            suggestions_text = response.choices[0].message.content.strip()
-            
-            # Clean and parse JSON
-            if suggestions_text.startswith("```json"):
-                suggestions_text = suggestions_text[7:-3]
-            elif suggestions_text.startswith("```"):
-                suggestions_text = suggestions_text[3:-3]
-            
-            suggestions = json.loads(suggestions_text)
+            suggestions = SchedulingSuggestions.model_validate_json(
+                response.choices[0].message.content or ""
+            ).model_dump()["suggestions"]
             
-            # Ensure it's a list
-            if isinstance(suggestions, dict):
-                suggestions = suggestions.get("suggestions", [])
+            # Availability comes back as a list; callers expect email -> bool
+            for suggestion in suggestions:
+                suggestion["attendee_availability"] = {
+                    item["email"]: item["available"] for item in suggestion["attendee_availability"]
+                }
             
             return suggestions[:5]  # Limit to 5 suggestions
             
-        except Exception as e:
-            print(f"Scheduling suggestions error: {e}")
+        except Exception:
+            logger.exception("Scheduling suggestions failed")
             return self._get_fallback_scheduling_suggestions()
     
     async def train_user_model(
@@ -396,67 +896,64 @@ Return only valid JSON.
         
         try:
             # Analyze feedback patterns
-            positive_feedback = [f for f in feedback_data if f.get("feedback_type") == "positive"]
-            negative_feedback = [f for f in feedback_data if f.get("feedback_type") == "negative"]
+            feedback_counts = Counter(f.get("feedback_type") for f in feedback_data)
+            positive_feedback = feedback_counts["positive"]
+            negative_feedback = feedback_counts["negative"]
             
             # Analyze email interaction patterns
-            sent_drafts = [e for e in email_interactions if e.get("status") == "replied"]
+            sent_drafts = sum(1 for e in email_interactions if e.get("status") == "replied")
             
             training_stats = {
                 "total_feedback_points": len(feedback_data),
-                "positive_feedback": len(positive_feedback),
-                "negative_feedback": len(negative_feedback),
-                "emails_with_replies": len(sent_drafts),
+                "positive_feedback": positive_feedback,
+                "negative_feedback": negative_feedback,
+                "emails_with_replies": sent_drafts,
                 "learning_confidence": min(1.0, len(feedback_data) / 50),  # More feedback = higher confidence
                 "model_version": datetime.utcnow().isoformat(),
                 "improvements_identified": []
             }
             
             # Identify improvement areas
-            if len(negative_feedback) > len(positive_feedback) * 0.3:
+            if negative_feedback > positive_feedback * 0.3:
                 training_stats["improvements_identified"].append("Review email classification accuracy")
             
-            if len(sent_drafts) < len(email_interactions) * 0.1:
+            if sent_drafts < len(email_interactions) * 0.1:
                 training_stats["improvements_identified"].append("Improve draft generation quality")
             
             return training_stats
             
         except Exception as e:
-            print(f"Model training error: {e}")
+            logger.exception("Model training failed for user %s", user_id)
             return {
                 "total_feedback_points": 0,
                 "learning_confidence": 0.0,
                 "error": str(e)
             }
     
-    def _detect_conflicts(self, event: Dict[str, Any], context_events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _detect_conflicts(self, event: Dict[str, Any], context_events: List[ContextEvent]) -> List[Dict[str, Any]]:
         """Detect scheduling conflicts with other events"""
         conflicts = []
         
-        event_start = datetime.fromisoformat(str(event['start_datetime']).replace('Z', '+00:00'))
-        event_end = datetime.fromisoformat(str(event['end_datetime']).replace('Z', '+00:00'))
+        # Stored events come back from Mongo as datetimes, so only strings
+        # need parsing; formatting them to text and back was pure overhead
+        event_id = event['id']
+        event_start = _to_datetime(event['start_datetime'])
+        event_end = _to_datetime(event['end_datetime'])
         
-        for other_event in context_events:
-            if other_event['id'] == event['id']:
-                continue
-                
-            try:
-                other_start = datetime.fromisoformat(str(other_event['start_datetime']).replace('Z', '+00:00'))
-                other_end = datetime.fromisoformat(str(other_event['end_datetime']).replace('Z', '+00:00'))
-                
-                # Check for overlap
-                if (event_start < other_end and event_end > other_start):
-                    overlap_minutes = min(event_end, other_end) - max(event_start, other_start)
-                    conflicts.append({
-                        "conflict_type": "hard",
-                        "conflicting_event_id": other_event['id'],
-                        "conflicting_event_title": other_event['title'],
-                        "overlap_duration_minutes": int(overlap_minutes.total_seconds() / 60),
-                        "suggested_resolution": "Reschedule one of the events"
-                    })
-            except Exception as e:
-                print(f"Error detecting conflict: {e}")
+        for other_id, other_title, other_start, other_end in context_events:
+            if other_id == event_id or other_start >= event_end:
                 continue
+            
+            # Check for overlap
+            if event_start < other_end:
+                overlap = min(event_end, other_end) - max(event_start, other_start)
+                conflicts.append({
+                    "conflict_type": "hard",
+                    "conflicting_event_id": other_id,
+                    "conflicting_event_title": other_title,
+                    "overlap_duration_minutes": int(overlap.total_seconds() / 60),
+                    "suggested_resolution": "Reschedule one of the events"
+                })
         
         return conflicts
     
@@ -483,6 +980,42 @@ Return only valid JSON.
             "prompt_used": "Fallback template response"
         }
     
+    def _heuristic_calendar_analysis(
+        self,
+        event: Dict[str, Any],
+        start: datetime,
+        duration_minutes: float,
+        conflicts: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Rule-based calendar analysis for routine events"""
+        hour = start.hour
+        if 9 <= hour < 12:
+            optimal_time_score, energy_level_match = 0.9, "high"
+        elif 13 <= hour < 16:
+            optimal_time_score, energy_level_match = 0.8, "medium"
+        elif 8 <= hour < 18:
+            optimal_time_score, energy_level_match = 0.6, "medium"
+        else:
+            optimal_time_score, energy_level_match = 0.4, "low"
+        
+        title = event.get('title', '').lower()
+        meeting_type = next(
+            (kind for keyword, kind in MEETING_TYPE_KEYWORDS if keyword in title),
+            "general"
+        )
+        short = duration_minutes <= 30
+        
+        return {
+            "optimal_time_score": optimal_time_score,
+            "productivity_impact": "low" if short else "medium",
+            "meeting_type_classification": meeting_type,
+            "estimated_preparation_time": 5 if short else 15,
+            "recommended_buffer_time": 5 if short else 10,
+            "energy_level_match": energy_level_match,
+            "conflicts_detected": conflicts,
+            "scheduling_suggestions": []
+        }
+    
     def _get_fallback_calendar_analysis(self) -> Dict[str, Any]:
         """Fallback calendar analysis when AI fails"""
         return {
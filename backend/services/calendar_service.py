@@ -1,16 +1,44 @@
+import asyncio
+import hashlib
+import heapq
 import uuid
-from typing import Dict, Any, List, Optional
+import orjson
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
 from models.calendar import (
     CalendarEvent, EventCreateRequest, EventUpdateRequest, 
     SchedulingSuggestion, CalendarProvider, EventStatus,
-    AvailabilitySlot, ConflictInfo
+    ConflictInfo
 )
 from services.ai_service import AIService
 from services.google_service import GoogleService
 from services.microsoft_service import MicrosoftService
+from utils.cache import CacheLayer, get_user_cached, invalidate_user_cache
+
+# Scheduling checks only need when each event is and what to call it, not the
+# provider metadata stored with synced events
+EVENT_TIMES_PROJECTION = {"_id": 0, "id": 1, "title": 1, "start_datetime": 1, "end_datetime": 1}
+SCHEDULING_CONTEXT_PROJECTION = {**EVENT_TIMES_PROJECTION, "status": 1, "attendees": 1}
+
+# Stored event times are naive UTC, so offsets from a naive epoch give
+# comparable integers without going through the local timezone
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch_seconds(value: datetime) -> int:
+    """Whole seconds since the epoch for a naive UTC datetime"""
+    return (value - _EPOCH) // timedelta(seconds=1)
+
+# Calendar providers and the prefix of their fields in user connections
+CONNECTION_PREFIXES = {CalendarProvider.GOOGLE: "google", CalendarProvider.OUTLOOK: "microsoft"}
+
+# Smart scheduling suggestions per user, as JSON keyed by request signature.
+# A user's entries are dropped whenever their calendar is written through this
+# service; the short local TTL bounds how long other workers miss that.
+_suggestion_cache = CacheLayer("scheduling_suggestions", local_ttl=5, redis_ttl=120)
 
 class CalendarService:
     """Service for calendar management and smart scheduling"""
@@ -21,6 +49,10 @@ class CalendarService:
         self.google_service = GoogleService()
         self.microsoft_service = MicrosoftService()
     
+    async def _get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the user document with connection tokens, briefly cached"""
+        return await get_user_cached(self.db, user_id)
+    
     async def create_event(
         self,
         user_id: str,
@@ -30,7 +62,7 @@ class CalendarService:
         
         try:
             # Get user's primary calendar provider
-            user = await self.db.users.find_one({"id": user_id})
+            user = await self._get_user(user_id)
             if not user:
                 raise Exception(f"User {user_id} not found")
             
@@ -39,7 +71,7 @@ class CalendarService:
             # Determine provider (prefer Google, fall back to Microsoft)
             provider = CalendarProvider.GOOGLE
             if not connections.get("google_connected") and connections.get("microsoft_connected"):
-                provider = CalendarProvider.MICROSOFT
+                provider = CalendarProvider.OUTLOOK
             
             # Create event object
             event = CalendarEvent(
@@ -65,38 +97,47 @@ class CalendarService:
                     "is_required": True
                 })
             
-            # Create event in external provider
-            if provider == CalendarProvider.GOOGLE and connections.get("google_connected"):
-                access_token = connections.get("google_access_token")
-                if access_token:
-                    provider_event = await self.google_service.create_calendar_event(
-                        access_token=access_token,
-                        title=event_data.title,
-                        start_time=event_data.start_datetime,
-                        end_time=event_data.end_datetime,
-                        attendees=event_data.attendee_emails,
-                        description=event_data.description,
-                        location=event_data.location.name if event_data.location else None
-                    )
-                    event.provider_event_id = provider_event.get("id", event.provider_event_id)
-            
-            elif provider == CalendarProvider.MICROSOFT and connections.get("microsoft_connected"):
-                access_token = connections.get("microsoft_access_token")
-                if access_token:
-                    provider_event = await self.microsoft_service.create_calendar_event(
-                        access_token=access_token,
-                        title=event_data.title,
-                        start_time=event_data.start_datetime,
-                        end_time=event_data.end_datetime,
-                        attendees=event_data.attendee_emails,
-                        description=event_data.description,
-                        location=event_data.location.name if event_data.location else None
-                    )
-                    event.provider_event_id = provider_event.get("id", event.provider_event_id)
+            # Store in database and create in the external provider at the
+            # same time; the provider id replaces the temporary one afterwards
+            stored, provider_event = await asyncio.gather(
+                self.db.calendar_events.insert_one(event.dict()),
+                self._call_provider(
+                    user_id, provider, "create_calendar_event",
+                    title=event_data.title,
+                    start_time=event_data.start_datetime,
+                    end_time=event_data.end_datetime,
+                    attendees=event_data.attendee_emails,
+                    description=event_data.description,
+                    location=event_data.location.name if event_data.location else None
+                ),
+                return_exceptions=True
+            )
             
-            # Store in database
-            await self.db.calendar_events.insert_one(event.dict())
+            # Undo whichever half succeeded if the other failed
+            if isinstance(stored, Exception):
+                if provider_event and not isinstance(provider_event, Exception):
+                    # The provider services report a failed delete as False
+                    try:
+                        deleted = await self._call_provider(
+                            user_id, provider, "delete_calendar_event", event_id=provider_event["id"]
+                        )
+                    except Exception:
+                        deleted = False
+                    if deleted is False:
+                        print(f"Failed to remove provider event {provider_event['id']} after storage error")
+                raise stored
+            if isinstance(provider_event, Exception):
+                await self.db.calendar_events.delete_one({"id": event.id})
+                raise provider_event
+            
+            if provider_event and provider_event.get("id"):
+                event.provider_event_id = provider_event["id"]
+                await self.db.calendar_events.update_one(
+                    {"id": event.id},
+                    {"$set": {"provider_event_id": event.provider_event_id}}
+                )
             
+            await _suggestion_cache.delete(user_id)
             return event
             
         except Exception as e:
@@ -112,15 +153,6 @@ class CalendarService:
         """Update existing calendar event"""
         
         try:
-            # Get existing event
-            existing_event = await self.db.calendar_events.find_one({
-                "id": event_id,
-                "user_id": user_id
-            })
-            
-            if not existing_event:
-                raise Exception(f"Event {event_id} not found")
-            
             # Prepare update fields
             update_fields = {"updated_at": datetime.utcnow()}
             
@@ -148,38 +180,31 @@ class CalendarService:
             if update_data.status:
                 update_fields["status"] = update_data.status
             
-            # Update in database
-            await self.db.calendar_events.update_one(
-                {"id": event_id},
-                {"$set": update_fields}
+            # Update in database in one round trip; the previous version
+            # gives the provider ids and lets a failed provider update be undone
+            existing_event = await self.db.calendar_events.find_one_and_update(
+                {"id": event_id, "user_id": user_id},
+                {"$set": update_fields},
+                return_document=ReturnDocument.BEFORE
             )
             
-            # Update in external provider
-            user = await self.db.users.find_one({"id": user_id})
-            connections = user.get("connections", {})
-            provider = existing_event["provider"]
-            
-            if provider == "google" and connections.get("google_connected"):
-                access_token = connections.get("google_access_token")
-                if access_token:
-                    await self.google_service.update_calendar_event(
-                        access_token=access_token,
-                        event_id=existing_event["provider_event_id"],
-                        updates=update_fields
-                    )
+            if not existing_event:
+                raise Exception(f"Event {event_id} not found")
             
-            elif provider == "outlook" and connections.get("microsoft_connected"):
-                access_token = connections.get("microsoft_access_token")
-                if access_token:
-                    await self.microsoft_service.update_calendar_event(
-                        access_token=access_token,
-                        event_id=existing_event["provider_event_id"],
-                        updates=update_fields
-                    )
+            # Update in external provider
+            try:
+                await self._call_provider(
+                    user_id, existing_event["provider"], "update_calendar_event",
+                    event_id=existing_event["provider_event_id"],
+                    updates=update_fields
+                )
+            except Exception:
+                # Put the stored event back if the provider rejected the change
+                await self.db.calendar_events.replace_one({"id": event_id}, existing_event)
+                raise
             
-            # Get updated event
-            updated_event = await self.db.calendar_events.find_one({"id": event_id})
-            return CalendarEvent(**updated_event)
+            await _suggestion_cache.delete(user_id)
+            return CalendarEvent(**{**existing_event, **update_fields})
             
         except Exception as e:
             print(f"Event update error: {e}")
@@ -198,33 +223,62 @@ class CalendarService:
             if not event:
                 return False
             
-            # Delete from external provider
-            user = await self.db.users.find_one({"id": user_id})
-            connections = user.get("connections", {})
-            provider = event["provider"]
-            
-            if provider == "google" and connections.get("google_connected"):
-                access_token = connections.get("google_access_token")
-                if access_token:
-                    await self.google_service.delete_calendar_event(
-                        access_token, event["provider_event_id"]
-                    )
-            
-            elif provider == "outlook" and connections.get("microsoft_connected"):
-                access_token = connections.get("microsoft_access_token")
-                if access_token:
-                    await self.microsoft_service.delete_calendar_event(
-                        access_token, event["provider_event_id"]
-                    )
+            # Delete from the external provider and the database at the same time
+            provider_result, result = await asyncio.gather(
+                self._call_provider(
+                    user_id, event["provider"], "delete_calendar_event",
+                    event_id=event["provider_event_id"]
+                ),
+                self.db.calendar_events.delete_one({"id": event_id}),
+                return_exceptions=True
+            )
             
-            # Delete from database
-            result = await self.db.calendar_events.delete_one({"id": event_id})
+            # Keep the stored event if the provider still has it; the provider
+            # services report a failed delete as False rather than raising
+            if provider_result is False or isinstance(provider_result, Exception):
+                if not isinstance(result, Exception) and result.deleted_count:
+                    await self.db.calendar_events.insert_one(event)
+                if provider_result is False:
+                    raise Exception("Provider failed to delete the event")
+                raise provider_result
+            if isinstance(result, Exception):
+                raise result
+            
+            await _suggestion_cache.delete(user_id)
             return result.deleted_count > 0
             
         except Exception as e:
             print(f"Event deletion error: {e}")
             return False
     
+    async def _get_token(self, user_id: str, provider: str) -> Optional[str]:
+        """Access token for a connected provider, None when not connected"""
+        prefix = CONNECTION_PREFIXES.get(provider)
+        if prefix is None:
+            return None
+        
+        # Read through the briefly cached user document on every call, so a
+        # disconnect or token refresh takes effect right away
+        user = await self._get_user(user_id)
+        connections = user.get("connections", {}) if user else {}
+        if not connections.get(f"{prefix}_connected"):
+            return None
+        return connections.get(f"{prefix}_access_token")
+    
+    async def _call_provider(self, user_id: str, provider: str, method: str, **kwargs) -> Any:
+        """Call a calendar method on the user's connected provider, None when not connected"""
+        access_token = await self._get_token(user_id, provider)
+        if not access_token:
+            return None
+        
+        service = self.google_service if provider == CalendarProvider.GOOGLE else self.microsoft_service
+        try:
+            return await getattr(service, method)(access_token=access_token, **kwargs)
+        except Exception:
+            # The token may have been revoked or refreshed elsewhere
+            invalidate_user_cache(user_id)
+            raise
+    
     async def check_availability(
         self,
         user_id: str,
@@ -237,62 +291,109 @@ class CalendarService:
         """Check availability for scheduling"""
         
         try:
-            # Get user's events in date range
-            user_events = await self.db.calendar_events.find({
-                "user_id": user_id,
-                "start_datetime": {"$lte": end_date},
-                "end_datetime": {"$gte": start_date},
-                "status": {"$ne": "cancelled"}
-            }).to_list(None)
-            
-            # Generate availability slots
+            # Get user's events in date range as buffered busy times, sorted
+            # on the index and trimmed to the fields slots report
+            buffer_ms = buffer_time_minutes * 60 * 1000
+            busy_events = self.db.calendar_events.aggregate([
+                {"$match": {
+                    "user_id": user_id,
+                    "start_datetime": {"$lte": end_date},
+                    "end_datetime": {"$gte": start_date},
+                    "status": {"$ne": "cancelled"}
+                }},
+                {"$sort": {"start_datetime": 1}},
+                {"$project": {
+                    "_id": 0,
+                    "id": 1,
+                    "title": 1,
+                    "start": {"$subtract": ["$start_datetime", buffer_ms]},
+                    "end": {"$add": ["$end_datetime", buffer_ms]}
+                }}
+            ], batchSize=500)
+            
+            # Merged so each slot is checked against one interval instead of
+            # every event
+            busy_intervals = await self._merge_busy_intervals(busy_events)
+            interval_index = 0
+            
+            # Generate availability slots, comparing times as epoch seconds
             availability_by_date = {}
             current_date = start_date.date()
             end_date_only = end_date.date()
+            slot_length = duration_minutes * 60
+            slot_duration = timedelta(seconds=slot_length)
+            # Slot start offsets within a day, in 15-minute increments
+            slot_offsets = range(0, 9 * 60 * 60 - slot_length + 1, 15 * 60)
             
             while current_date <= end_date_only:
                 # Create time slots for this date (9 AM to 6 PM by default)
                 day_start = datetime.combine(current_date, datetime.min.time().replace(hour=9))
-                day_end = datetime.combine(current_date, datetime.min.time().replace(hour=18))
+                day_start_ts = _epoch_seconds(day_start)
+                day_end_ts = day_start_ts + 9 * 60 * 60
+                
+                # Skip intervals that ended before today
+                while (interval_index < len(busy_intervals)
+                       and busy_intervals[interval_index][1] <= day_start_ts):
+                    interval_index += 1
+                
+                # Nothing busy today (always the case with no events), so every slot is free
+                if interval_index == len(busy_intervals) or busy_intervals[interval_index][0] >= day_end_ts:
+                    availability_slots = [
+                        {
+                            "start_datetime": day_start + timedelta(seconds=offset),
+                            "end_datetime": day_start + timedelta(seconds=offset) + slot_duration,
+                            "is_busy": False,
+                            "event_title": None,
+                            "event_id": None,
+                            "buffer_time_needed": True
+                        }
+                        for offset in slot_offsets
+                    ]
+                    availability_by_date[current_date.isoformat()] = {
+                        "date": current_date.isoformat(),
+                        "slots": availability_slots
+                    }
+                    current_date += timedelta(days=1)
+                    continue
                 
                 availability_slots = []
-                current_slot = day_start
                 
-                while current_slot + timedelta(minutes=duration_minutes) <= day_end:
-                    slot_end = current_slot + timedelta(minutes=duration_minutes)
+                for offset in slot_offsets:
+                    slot_start_ts = day_start_ts + offset
+                    slot_end_ts = slot_start_ts + slot_length
+                    
+                    # Slots only move forward, so skip intervals that have ended
+                    while (interval_index < len(busy_intervals)
+                           and busy_intervals[interval_index][1] <= slot_start_ts):
+                        interval_index += 1
                     
                     # Check if slot conflicts with existing events
                     is_busy = False
                     conflicting_event = None
                     
-                    for event in user_events:
-                        event_start = event["start_datetime"]
-                        event_end = event["end_datetime"]
-                        
-                        # Add buffer time
-                        buffered_start = current_slot - timedelta(minutes=buffer_time_minutes)
-                        buffered_end = slot_end + timedelta(minutes=buffer_time_minutes)
-                        
-                        if (buffered_start < event_end and buffered_end > event_start):
-                            is_busy = True
-                            conflicting_event = event
-                            break
-                    
-                    availability_slots.append(AvailabilitySlot(
-                        start_datetime=current_slot,
-                        end_datetime=slot_end,
-                        is_busy=is_busy,
-                        event_title=conflicting_event["title"] if conflicting_event else None,
-                        event_id=conflicting_event["id"] if conflicting_event else None,
-                        buffer_time_needed=True
-                    ))
+                    if interval_index < len(busy_intervals) and busy_intervals[interval_index][0] < slot_end_ts:
+                        is_busy = True
+                        # First event in the merged interval that overlaps this slot
+                        conflicting_event = next(
+                            event for start, end, event in busy_intervals[interval_index][2]
+                            if start < slot_end_ts and end > slot_start_ts
+                        )
                     
-                    # Move to next slot (15-minute increments)
-                    current_slot += timedelta(minutes=15)
+                    # Plain dicts in AvailabilitySlot's shape; the response model
+                    # validates them once at the API boundary
+                    current_slot = day_start + timedelta(seconds=offset)
+                    availability_slots.append({
+                        "start_datetime": current_slot,
+                        "end_datetime": current_slot + slot_duration,
+                        "is_busy": is_busy,
+                        "event_title": conflicting_event["title"] if conflicting_event else None,
+                        "event_id": conflicting_event["id"] if conflicting_event else None,
+                        "buffer_time_needed": True
+                    })
                 
                 availability_by_date[current_date.isoformat()] = {
                     "date": current_date.isoformat(),
-                    "slots": [slot.dict() for slot in availability_slots]
+                    "slots": availability_slots
                 }
                 
                 current_date += timedelta(days=1)
@@ -303,6 +404,28 @@ class CalendarService:
             print(f"Availability check error: {e}")
             return []
     
+    async def _merge_busy_intervals(
+        self,
+        busy_events: AsyncIterator[Dict[str, Any]]
+    ) -> List[Tuple[int, int, List[Tuple[int, int, Dict[str, Any]]]]]:
+        """Merge busy times, sorted by start, into non-overlapping intervals
+        
+        Each interval is (start, end, contributors) in epoch seconds, where
+        contributors are the (start, end, event) entries it covers, in start order.
+        """
+        merged = []
+        async for event in busy_events:
+            entry = (_epoch_seconds(event["start"]), _epoch_seconds(event["end"]), event)
+            if merged and entry[0] <= merged[-1][1]:
+                last = merged[-1]
+                last[2].append(entry)
+                if entry[1] > last[1]:
+                    merged[-1] = (last[0], entry[1], last[2])
+            else:
+                merged.append((entry[0], entry[1], [entry]))
+        
+        return merged
+    
     async def get_smart_scheduling_suggestions(
         self,
         user_id: str,
@@ -310,6 +433,20 @@ class CalendarService:
     ) -> List[SchedulingSuggestion]:
         """Get AI-powered scheduling suggestions"""
         
+        # Same request for the same user, with no calendar writes since
+        signature = hashlib.sha1(orjson.dumps([
+            scheduling_request["title"],
+            scheduling_request["duration_minutes"],
+            sorted(email.lower() for email in scheduling_request["attendee_emails"]),
+            list(scheduling_request.get("preferred_times") or ()),
+            scheduling_request["date_range_start"],
+            scheduling_request["date_range_end"]
+        ], default=str)).hexdigest()
+        cached = await _suggestion_cache.get(user_id)
+        entries = orjson.loads(cached) if cached else {}
+        if signature in entries:
+            return [SchedulingSuggestion(**suggestion) for suggestion in entries[signature]]
+        
         try:
             # Get user's events for context
             existing_events = await self.db.calendar_events.find({
@@ -318,7 +455,7 @@ class CalendarService:
                     "$gte": scheduling_request["date_range_start"],
                     "$lte": scheduling_request["date_range_end"]
                 }
-            }).to_list(None)
+            }, SCHEDULING_CONTEXT_PROJECTION).to_list(None)
             
             # Get user guidelines
             guidelines = await self.db.user_guidelines.find_one({"user_id": user_id})
@@ -352,6 +489,9 @@ class CalendarService:
                     print(f"Invalid suggestion format: {e}")
                     continue
             
+            if suggestion_objects:
+                entries[signature] = [suggestion.model_dump(mode="json") for suggestion in suggestion_objects]
+                await _suggestion_cache.set(user_id, orjson.dumps(entries).decode())
             return suggestion_objects
             
         except Exception as e:
@@ -367,52 +507,66 @@ class CalendarService:
         """Find scheduling conflicts in date range"""
         
         try:
-            # Get events in date range
-            events = await self.db.calendar_events.find({
+            # Stream events in date range in start order
+            events = self.db.calendar_events.find({
                 "user_id": user_id,
                 "start_datetime": {"$lte": end_date},
                 "end_datetime": {"$gte": start_date},
                 "status": {"$ne": "cancelled"}
-            }).sort("start_datetime", 1).to_list(None)
+            }, EVENT_TIMES_PROJECTION).sort("start_datetime", 1).batch_size(500)
             
             conflicts = []
-            
-            # Check for overlapping events
-            for i, event1 in enumerate(events):
-                for event2 in events[i+1:]:
-                    # Check if events overlap
-                    if (event1["start_datetime"] < event2["end_datetime"] and 
-                        event1["end_datetime"] > event2["start_datetime"]):
-                        
-                        # Calculate overlap duration
-                        overlap_start = max(event1["start_datetime"], event2["start_datetime"])
-                        overlap_end = min(event1["end_datetime"], event2["end_datetime"])
-                        overlap_minutes = int((overlap_end - overlap_start).total_seconds() / 60)
-                        
-                        conflict = ConflictInfo(
-                            conflict_type="hard",
-                            conflicting_event_id=event2["id"],
-                            conflicting_event_title=event2["title"],
-                            overlap_duration_minutes=overlap_minutes,
-                            suggested_resolution=f"Reschedule '{event2['title']}' to avoid overlap with '{event1['title']}'"
-                        )
-                        conflicts.append(conflict)
-            
-            # Check for insufficient buffer time
-            for i, event in enumerate(events[:-1]):
-                next_event = events[i + 1]
-                time_between = (next_event["start_datetime"] - event["end_datetime"]).total_seconds() / 60
+            buffer_conflicts = []
+            
+            # Check for overlapping events: sweep in start order, keeping a
+            # heap of events that haven't ended by the current start
+            active = []  # (end_datetime, index, event)
+            previous_event = None
+            i = 0
+            async for event2 in events:
+                while active and active[0][0] <= event2["start_datetime"]:
+                    heapq.heappop(active)
                 
-                if 0 < time_between < 15:  # Less than 15 minutes between events
+                for _, _, event1 in sorted(active, key=lambda entry: entry[1]):
+                    # Events still active end after this one starts; a
+                    # zero-length event only overlaps events that began earlier
+                    if event1["start_datetime"] >= event2["end_datetime"]:
+                        continue
+                    
+                    # Calculate overlap duration
+                    overlap_start = event2["start_datetime"]
+                    overlap_end = min(event1["end_datetime"], event2["end_datetime"])
+                    overlap_minutes = int((overlap_end - overlap_start).total_seconds() / 60)
+                    
                     conflict = ConflictInfo(
-                        conflict_type="soft",
-                        conflicting_event_id=next_event["id"],
-                        conflicting_event_title=next_event["title"],
-                        overlap_duration_minutes=0,
-                        suggested_resolution=f"Add buffer time between '{event['title']}' and '{next_event['title']}'"
+                        conflict_type="hard",
+                        conflicting_event_id=event2["id"],
+                        conflicting_event_title=event2["title"],
+                        overlap_duration_minutes=overlap_minutes,
+                        suggested_resolution=f"Reschedule '{event2['title']}' to avoid overlap with '{event1['title']}'"
                     )
                     conflicts.append(conflict)
+                
+                heapq.heappush(active, (event2["end_datetime"], i, event2))
+                i += 1
+                
+                # Check for insufficient buffer time after the previous event
+                if previous_event is not None:
+                    time_between = (event2["start_datetime"] - previous_event["end_datetime"]).total_seconds() / 60
+                    
+                    if 0 < time_between < 15:  # Less than 15 minutes between events
+                        conflict = ConflictInfo(
+                            conflict_type="soft",
+                            conflicting_event_id=event2["id"],
+                            conflicting_event_title=event2["title"],
+                            overlap_duration_minutes=0,
+                            suggested_resolution=f"Add buffer time between '{previous_event['title']}' and '{event2['title']}'"
+                        )
+                        buffer_conflicts.append(conflict)
+                previous_event = event2
             
+            # Overlaps first, then buffer warnings
+            conflicts.extend(buffer_conflicts)
             return conflicts
             
         except Exception as e:
@@ -499,12 +653,13 @@ class CalendarService:
         
         try:
             # Get user's connection info
-            user = await self.db.users.find_one({"id": user_id})
+            user = await self._get_user(user_id)
             if not user:
                 raise Exception(f"User {user_id} not found")
             
             connections = user.get("connections", {})
             sync_result = {"synced_count": 0, "errors": []}
+            events = []
             
             if provider == "google" and connections.get("google_connected"):
                 access_token = connections.get("google_access_token")
@@ -516,12 +671,10 @@ class CalendarService:
                     access_token, days_ahead=30
                 )
                 
-                # Process and store events
+                # Convert events, then store them in one bulk write
                 for google_event in google_events:
                     try:
-                        event = await self._convert_google_to_event(user_id, google_event)
-                        await self._store_event_if_new(event)
-                        sync_result["synced_count"] += 1
+                        events.append(self._convert_google_to_event(user_id, google_event))
                     except Exception as e:
                         sync_result["errors"].append(f"Failed to process event: {str(e)}")
             
@@ -535,25 +688,28 @@ class CalendarService:
                     access_token, days_ahead=30
                 )
                 
-                # Process and store events
+                # Convert events, then store them in one bulk write
                 for outlook_event in outlook_events:
                     try:
-                        event = await self._convert_outlook_to_event(user_id, outlook_event)
-                        await self._store_event_if_new(event)
-                        sync_result["synced_count"] += 1
+                        events.append(self._convert_outlook_to_event(user_id, outlook_event))
                     except Exception as e:
                         sync_result["errors"].append(f"Failed to process event: {str(e)}")
             
             else:
                 raise Exception(f"Provider {provider} not connected or not supported")
             
+            stored_count, store_errors = await self._store_events(events)
+            sync_result["synced_count"] = stored_count
+            sync_result["errors"].extend(store_errors)
+            
+            await _suggestion_cache.delete(user_id)
             return sync_result
             
         except Exception as e:
             print(f"Calendar sync error for {provider}: {e}")
             return {"synced_count": 0, "errors": [str(e)]}
     
-    async def _convert_google_to_event(self, user_id: str, google_data: Dict[str, Any]) -> CalendarEvent:
+    def _convert_google_to_event(self, user_id: str, google_data: Dict[str, Any]) -> CalendarEvent:
         """Convert Google Calendar API response to CalendarEvent object"""
         
         try:
@@ -615,7 +771,7 @@ class CalendarService:
             print(f"Google event conversion error: {e}")
             raise Exception(f"Failed to convert Google event: {str(e)}")
     
-    async def _convert_outlook_to_event(self, user_id: str, outlook_data: Dict[str, Any]) -> CalendarEvent:
+    def _convert_outlook_to_event(self, user_id: str, outlook_data: Dict[str, Any]) -> CalendarEvent:
         """Convert Outlook API response to CalendarEvent object"""
         
         try:
@@ -658,7 +814,7 @@ class CalendarService:
             # Create event object
             event = CalendarEvent(
                 user_id=user_id,
-                provider=CalendarProvider.MICROSOFT,
+                provider=CalendarProvider.OUTLOOK,
                 title=outlook_data.get("subject", "Untitled Event"),
                 description=outlook_data.get("bodyPreview"),
                 location=location,
@@ -679,28 +835,33 @@ class CalendarService:
             print(f"Outlook event conversion error: {e}")
             raise Exception(f"Failed to convert Outlook event: {str(e)}")
     
-    async def _store_event_if_new(self, event: CalendarEvent) -> bool:
-        """Store calendar event in database if it doesn't already exist"""
+    async def _store_events(self, events: List[CalendarEvent]) -> Tuple[int, List[str]]:
+        """Upsert synced events in one bulk write, matched on user, provider and provider event id
+        
+        Returns the number of events stored and an error for each one that failed.
+        """
+        if not events:
+            return 0, []
+        
+        operations = [
+            UpdateOne(
+                {"user_id": event.user_id, "provider": event.provider, "provider_event_id": event.provider_event_id},
+                {
+                    # Existing events keep their id and creation time
+                    "$set": event.dict(exclude={"id", "created_at"}),
+                    "$setOnInsert": {"id": event.id, "created_at": event.created_at}
+                },
+                upsert=True
+            )
+            for event in events
+        ]
         
         try:
-            # Check if event already exists
-            existing = await self.db.calendar_events.find_one({
-                "user_id": event.user_id,
-                "provider_event_id": event.provider_event_id
-            })
-            
-            if existing:
-                # Update existing event
-                await self.db.calendar_events.update_one(
-                    {"id": existing["id"]},
-                    {"$set": event.dict(exclude={"id", "created_at"})}
-                )
-                return False
-            
-            # Store new event
-            await self.db.calendar_events.insert_one(event.dict())
-            return True
-            
-        except Exception as e:
-            print(f"Event storage error: {e}")
-            return False
\ No newline at end of file
+            result = await self.db.calendar_events.bulk_write(operations, ordered=False)
+            return result.upserted_count + result.matched_count, []
+        except BulkWriteError as e:
+            details = e.details
+            return (
+                details["nUpserted"] + details["nMatched"],
+                [f"Failed to store event: {error['errmsg']}" for error in details["writeErrors"]]
+            )
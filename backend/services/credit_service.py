@@ -4,6 +4,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from models.payments import CreditTransaction, CREDIT_COSTS
 from models.user import CreditBalance
+from utils.cache import invalidate_user_cache, invalidate_user_views
 
 class CreditService:
     """Service for managing user credits and consumption tracking"""
@@ -73,6 +74,8 @@ class CreditService:
                     }
                 }
             )
+            invalidate_user_cache(user_id)
+            await invalidate_user_views(user_id, "credits", "dashboard")
             
             # Create credit transaction record
             transaction = CreditTransaction(
@@ -108,35 +111,30 @@ class CreditService:
         """Add credits to user account"""
         
         try:
-            # Get current user credits
-            user = await self.db.users.find_one({"id": user_id})
-            if not user:
-                return False
-            
-            current_credits = user.get("credits", {})
-            current_total = current_credits.get("total_credits", 0)
-            current_remaining = current_credits.get("remaining_credits", 0)
-            
-            # Calculate new totals
-            new_total = current_total + credits
-            new_remaining = current_remaining + credits
+            now = datetime.utcnow()
             
             # Set expiry date (12 months from now)
-            expiry_date = datetime.utcnow() + timedelta(days=365)
+            expiry_date = now + timedelta(days=365)
             
-            # Update user credits
-            await self.db.users.update_one(
+            # Increment user credits in place rather than read-modify-write
+            result = await self.db.users.update_one(
                 {"id": user_id},
                 {
+                    "$inc": {
+                        "credits.total_credits": credits,
+                        "credits.remaining_credits": credits
+                    },
                     "$set": {
-                        "credits.total_credits": new_total,
-                        "credits.remaining_credits": new_remaining,
-                        "credits.last_purchase_date": datetime.utcnow(),
+                        "credits.last_purchase_date": now,
                         "credits.credit_expiry_date": expiry_date,
-                        "updated_at": datetime.utcnow()
+                        "updated_at": now
                     }
                 }
             )
+            if not result.matched_count:
+                return False
+            invalidate_user_cache(user_id)
+            await invalidate_user_views(user_id, "credits", "dashboard")
             
             # Create credit transaction record
             transaction = CreditTransaction(
@@ -312,6 +310,8 @@ class CreditService:
                             }
                         }
                     )
+                    invalidate_user_cache(user_id)
+                    await invalidate_user_views(user_id, "credits", "dashboard")
                     
                     # Create expiry transaction
                     transaction = CreditTransaction(
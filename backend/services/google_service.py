@@ -6,6 +6,13 @@ from datetime import datetime, timedelta
 from decouple import config
 import asyncio
 
+# One connection pool per worker, shared by every GoogleService; services are
+# created per request, so a client per call redid the TLS handshake each time
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
 class GoogleService:
     """Service for Google APIs integration (Gmail, Calendar)"""
     
@@ -17,29 +24,35 @@ class GoogleService:
         self.gmail_base_url = "https://gmail.googleapis.com/gmail/v1"
         self.calendar_base_url = "https://www.googleapis.com/calendar/v3"
         self.oauth_base_url = "https://oauth2.googleapis.com"
+        
+        self.http = _http_client
+    
+    @staticmethod
+    async def aclose():
+        """Close the shared HTTP connection pool at shutdown"""
+        await _http_client.aclose()
     
     async def refresh_access_token(self, refresh_token: str) -> Dict[str, Any]:
         """Refresh Google access token"""
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.oauth_base_url}/token",
-                    data={
-                        "client_id": self.client_id,
-                        "client_secret": self.client_secret,
-                        "refresh_token": refresh_token,
-                        "grant_type": "refresh_token"
-                    }
-                )
-                response.raise_for_status()
-                tokens = response.json()
-                
-                return {
-                    "access_token": tokens["access_token"],
-                    "expires_at": datetime.utcnow() + timedelta(seconds=tokens["expires_in"])
+            response = await self.http.post(
+                f"{self.oauth_base_url}/token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "refresh_token": refresh_token,
+                    "grant_type": "refresh_token"
                 }
-                
+            )
+            response.raise_for_status()
+            tokens = response.json()
+            
+            return {
+                "access_token": tokens["access_token"],
+                "expires_at": datetime.utcnow() + timedelta(seconds=tokens["expires_in"])
+            }
+            
         except Exception as e:
             print(f"Google token refresh error: {e}")
             raise Exception(f"Failed to refresh Google token: {str(e)}")
@@ -55,44 +68,43 @@ class GoogleService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                # First, get list of message IDs
-                params = {
-                    "maxResults": limit,
-                    "q": query or "in:inbox"
-                }
-                
-                response = await client.get(
-                    f"{self.gmail_base_url}/users/me/messages",
-                    headers=headers,
-                    params=params
-                )
-                response.raise_for_status()
-                message_list = response.json()
-                
-                emails = []
-                
-                # Fetch details for each message
-                for message_info in message_list.get("messages", []):
-                    try:
-                        message_response = await client.get(
-                            f"{self.gmail_base_url}/users/me/messages/{message_info['id']}",
-                            headers=headers,
-                            params={"format": "full"}
-                        )
-                        message_response.raise_for_status()
-                        email_data = message_response.json()
-                        emails.append(email_data)
-                        
-                        # Small delay to avoid rate limiting
-                        await asyncio.sleep(0.1)
-                        
-                    except Exception as e:
-                        print(f"Failed to fetch email {message_info['id']}: {e}")
-                        continue
-                
-                return emails
-                
+            # First, get list of message IDs
+            params = {
+                "maxResults": limit,
+                "q": query or "in:inbox"
+            }
+            
+            response = await self.http.get(
+                f"{self.gmail_base_url}/users/me/messages",
+                headers=headers,
+                params=params
+            )
+            response.raise_for_status()
+            message_list = response.json()
+            
+            emails = []
+            
+            # Fetch details for each message
+            for message_info in message_list.get("messages", []):
+                try:
+                    message_response = await self.http.get(
+                        f"{self.gmail_base_url}/users/me/messages/{message_info['id']}",
+                        headers=headers,
+                        params={"format": "full"}
+                    )
+                    message_response.raise_for_status()
+                    email_data = message_response.json()
+                    emails.append(email_data)
+                    
+                    # Small delay to avoid rate limiting
+                    await asyncio.sleep(0.1)
+                    
+                except Exception as e:
+                    print(f"Failed to fetch email {message_info['id']}: {e}")
+                    continue
+            
+            return emails
+            
         except Exception as e:
             print(f"Gmail fetch error: {e}")
             raise Exception(f"Failed to fetch Gmail emails: {str(e)}")
@@ -130,31 +142,29 @@ class GoogleService:
             if reply_to_message_id:
                 try:
                     # Get original message to find thread ID
-                    async with httpx.AsyncClient() as client:
-                        orig_response = await client.get(
-                            f"{self.gmail_base_url}/users/me/messages/{reply_to_message_id}",
-                            headers=headers,
-                            params={"format": "minimal"}
-                        )
-                        if orig_response.status_code == 200:
-                            orig_data = orig_response.json()
-                            thread_id = orig_data.get("threadId")
-                            if thread_id:
-                                email_payload["threadId"] = thread_id
+                    orig_response = await self.http.get(
+                        f"{self.gmail_base_url}/users/me/messages/{reply_to_message_id}",
+                        headers=headers,
+                        params={"format": "minimal"}
+                    )
+                    if orig_response.status_code == 200:
+                        orig_data = orig_response.json()
+                        thread_id = orig_data.get("threadId")
+                        if thread_id:
+                            email_payload["threadId"] = thread_id
                 except Exception as e:
                     print(f"Failed to get thread ID: {e}")
             
             # Send email
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.gmail_base_url}/users/me/messages/send",
-                    headers=headers,
-                    json=email_payload
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            response = await self.http.post(
+                f"{self.gmail_base_url}/users/me/messages/send",
+                headers=headers,
+                json=email_payload
+            )
+            response.raise_for_status()
+            
+            return response.json()
+            
         except Exception as e:
             print(f"Gmail send error: {e}")
             raise Exception(f"Failed to send Gmail email: {str(e)}")
@@ -165,17 +175,16 @@ class GoogleService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.gmail_base_url}/users/me/messages/{message_id}/modify",
-                    headers=headers,
-                    json={
-                        "removeLabelIds": ["UNREAD"]
-                    }
-                )
-                response.raise_for_status()
-                return True
-                
+            response = await self.http.post(
+                f"{self.gmail_base_url}/users/me/messages/{message_id}/modify",
+                headers=headers,
+                json={
+                    "removeLabelIds": ["UNREAD"]
+                }
+            )
+            response.raise_for_status()
+            return True
+            
         except Exception as e:
             print(f"Gmail mark read error: {e}")
             return False
@@ -203,17 +212,16 @@ class GoogleService:
                 "maxResults": 100
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.calendar_base_url}/calendars/{calendar_id}/events",
-                    headers=headers,
-                    params=params
-                )
-                response.raise_for_status()
-                
-                calendar_data = response.json()
-                return calendar_data.get("items", [])
-                
+            response = await self.http.get(
+                f"{self.calendar_base_url}/calendars/{calendar_id}/events",
+                headers=headers,
+                params=params
+            )
+            response.raise_for_status()
+            
+            calendar_data = response.json()
+            return calendar_data.get("items", [])
+            
         except Exception as e:
             print(f"Google Calendar fetch error: {e}")
             raise Exception(f"Failed to fetch Google Calendar events: {str(e)}")
@@ -257,16 +265,15 @@ class GoogleService:
                 event_data["attendees"] = [{"email": email} for email in attendees]
             
             # Create event
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.calendar_base_url}/calendars/{calendar_id}/events",
-                    headers=headers,
-                    json=event_data
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            response = await self.http.post(
+                f"{self.calendar_base_url}/calendars/{calendar_id}/events",
+                headers=headers,
+                json=event_data
+            )
+            response.raise_for_status()
+            
+            return response.json()
+            
         except Exception as e:
             print(f"Google Calendar create error: {e}")
             raise Exception(f"Failed to create Google Calendar event: {str(e)}")
@@ -284,40 +291,39 @@ class GoogleService:
             headers = {"Authorization": f"Bearer {access_token}"}
             
             # Get current event
-            async with httpx.AsyncClient() as client:
-                get_response = await client.get(
-                    f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
-                    headers=headers
-                )
-                get_response.raise_for_status()
-                current_event = get_response.json()
-                
-                # Apply updates
-                if "title" in updates:
-                    current_event["summary"] = updates["title"]
-                if "description" in updates:
-                    current_event["description"] = updates["description"]
-                if "start_datetime" in updates:
-                    current_event["start"] = {
-                        "dateTime": updates["start_datetime"].isoformat(),
-                        "timeZone": "UTC"
-                    }
-                if "end_datetime" in updates:
-                    current_event["end"] = {
-                        "dateTime": updates["end_datetime"].isoformat(),
-                        "timeZone": "UTC"
-                    }
-                
-                # Update event
-                update_response = await client.put(
-                    f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
-                    headers=headers,
-                    json=current_event
-                )
-                update_response.raise_for_status()
-                
-                return update_response.json()
-                
+            get_response = await self.http.get(
+                f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
+                headers=headers
+            )
+            get_response.raise_for_status()
+            current_event = get_response.json()
+            
+            # Apply updates
+            if "title" in updates:
+                current_event["summary"] = updates["title"]
+            if "description" in updates:
+                current_event["description"] = updates["description"]
+            if "start_datetime" in updates:
+                current_event["start"] = {
+                    "dateTime": updates["start_datetime"].isoformat(),
+                    "timeZone": "UTC"
+                }
+            if "end_datetime" in updates:
+                current_event["end"] = {
+                    "dateTime": updates["end_datetime"].isoformat(),
+                    "timeZone": "UTC"
+                }
+            
+            # Update event
+            update_response = await self.http.put(
+                f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
+                headers=headers,
+                json=current_event
+            )
+            update_response.raise_for_status()
+            
+            return update_response.json()
+            
         except Exception as e:
             print(f"Google Calendar update error: {e}")
             raise Exception(f"Failed to update Google Calendar event: {str(e)}")
@@ -333,14 +339,13 @@ class GoogleService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
-                    headers=headers
-                )
-                response.raise_for_status()
-                return True
-                
+            response = await self.http.delete(
+                f"{self.calendar_base_url}/calendars/{calendar_id}/events/{event_id}",
+                headers=headers
+            )
+            response.raise_for_status()
+            return True
+            
         except Exception as e:
             print(f"Google Calendar delete error: {e}")
             return False
@@ -351,28 +356,27 @@ class GoogleService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                # Test Gmail API
-                gmail_response = await client.get(
-                    f"{self.gmail_base_url}/users/me/profile",
-                    headers=headers
-                )
-                gmail_healthy = gmail_response.status_code == 200
-                
-                # Test Calendar API
-                calendar_response = await client.get(
-                    f"{self.calendar_base_url}/calendars/primary",
-                    headers=headers
-                )
-                calendar_healthy = calendar_response.status_code == 200
-                
-                return {
-                    "gmail_api": "healthy" if gmail_healthy else "unhealthy",
-                    "calendar_api": "healthy" if calendar_healthy else "unhealthy",
-                    "overall_status": "healthy" if (gmail_healthy and calendar_healthy) else "degraded",
-                    "token_valid": True
-                }
-                
+            # Test Gmail API
+            gmail_response = await self.http.get(
+                f"{self.gmail_base_url}/users/me/profile",
+                headers=headers
+            )
+            gmail_healthy = gmail_response.status_code == 200
+            
+            # Test Calendar API
+            calendar_response = await self.http.get(
+                f"{self.calendar_base_url}/calendars/primary",
+                headers=headers
+            )
+            calendar_healthy = calendar_response.status_code == 200
+            
+            return {
+                "gmail_api": "healthy" if gmail_healthy else "unhealthy",
+                "calendar_api": "healthy" if calendar_healthy else "unhealthy",
+                "overall_status": "healthy" if (gmail_healthy and calendar_healthy) else "degraded",
+                "token_valid": True
+            }
+            
         except Exception as e:
             print(f"Google health check error: {e}")
             return {
@@ -397,18 +401,17 @@ class GoogleService:
                     "topicName": f"projects/your-project/topics/gmail-{user_id}"
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    gmail_response = await client.post(
-                        f"{self.gmail_base_url}/users/me/watch",
-                        headers=headers,
-                        json=gmail_webhook_data
-                    )
+                gmail_response = await self.http.post(
+                    f"{self.gmail_base_url}/users/me/watch",
+                    headers=headers,
+                    json=gmail_webhook_data
+                )
+                
+                if gmail_response.status_code == 200:
+                    webhook_results["gmail"] = gmail_response.json()
+                else:
+                    webhook_results["gmail"] = {"error": "Failed to setup Gmail webhook"}
                     
-                    if gmail_response.status_code == 200:
-                        webhook_results["gmail"] = gmail_response.json()
-                    else:
-                        webhook_results["gmail"] = {"error": "Failed to setup Gmail webhook"}
-                        
             except Exception as e:
                 webhook_results["gmail"] = {"error": str(e)}
             
@@ -420,18 +423,17 @@ class GoogleService:
                     "address": f"{config('BACKEND_URL', 'http://localhost:8001')}/api/integrations/webhooks/google"
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    calendar_response = await client.post(
-                        f"{self.calendar_base_url}/calendars/primary/events/watch",
-                        headers=headers,
-                        json=calendar_webhook_data
-                    )
+                calendar_response = await self.http.post(
+                    f"{self.calendar_base_url}/calendars/primary/events/watch",
+                    headers=headers,
+                    json=calendar_webhook_data
+                )
+                
+                if calendar_response.status_code == 200:
+                    webhook_results["calendar"] = calendar_response.json()
+                else:
+                    webhook_results["calendar"] = {"error": "Failed to setup Calendar webhook"}
                     
-                    if calendar_response.status_code == 200:
-                        webhook_results["calendar"] = calendar_response.json()
-                    else:
-                        webhook_results["calendar"] = {"error": "Failed to setup Calendar webhook"}
-                        
             except Exception as e:
                 webhook_results["calendar"] = {"error": str(e)}
             
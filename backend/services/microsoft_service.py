@@ -5,6 +5,13 @@ from datetime import datetime, timedelta
 from decouple import config
 import asyncio
 
+# One connection pool per worker, shared by every MicrosoftService; services are
+# created per request, so a client per call redid the TLS handshake each time
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
 class MicrosoftService:
     """Service for Microsoft Graph API integration (Outlook, Calendar)"""
     
@@ -15,30 +22,36 @@ class MicrosoftService:
         
         self.graph_base_url = "https://graph.microsoft.com/v1.0"
         self.oauth_base_url = "https://login.microsoftonline.com/common/oauth2/v2.0"
+        
+        self.http = _http_client
+    
+    @staticmethod
+    async def aclose():
+        """Close the shared HTTP connection pool at shutdown"""
+        await _http_client.aclose()
     
     async def refresh_access_token(self, refresh_token: str) -> Dict[str, Any]:
         """Refresh Microsoft access token"""
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.oauth_base_url}/token",
-                    data={
-                        "client_id": self.client_id,
-                        "client_secret": self.client_secret,
-                        "refresh_token": refresh_token,
-                        "grant_type": "refresh_token",
-                        "scope": "https://graph.microsoft.com/mail.read https://graph.microsoft.com/calendars.readwrite offline_access"
-                    }
-                )
-                response.raise_for_status()
-                tokens = response.json()
-                
-                return {
-                    "access_token": tokens["access_token"],
-                    "expires_at": datetime.utcnow() + timedelta(seconds=tokens["expires_in"])
+            response = await self.http.post(
+                f"{self.oauth_base_url}/token",
+                data={
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "refresh_token": refresh_token,
+                    "grant_type": "refresh_token",
+                    "scope": "https://graph.microsoft.com/mail.read https://graph.microsoft.com/calendars.readwrite offline_access"
                 }
-                
+            )
+            response.raise_for_status()
+            tokens = response.json()
+            
+            return {
+                "access_token": tokens["access_token"],
+                "expires_at": datetime.utcnow() + timedelta(seconds=tokens["expires_in"])
+            }
+            
         except Exception as e:
             print(f"Microsoft token refresh error: {e}")
             raise Exception(f"Failed to refresh Microsoft token: {str(e)}")
@@ -63,17 +76,16 @@ class MicrosoftService:
             if filter_query:
                 params["$filter"] = filter_query
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.graph_base_url}/me/messages",
-                    headers=headers,
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                return data.get("value", [])
-                
+            response = await self.http.get(
+                f"{self.graph_base_url}/me/messages",
+                headers=headers,
+                params=params
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data.get("value", [])
+            
         except Exception as e:
             print(f"Outlook fetch error: {e}")
             raise Exception(f"Failed to fetch Outlook emails: {str(e)}")
@@ -114,16 +126,15 @@ class MicrosoftService:
                 email_data["message"]["replyTo"] = [{"emailAddress": {"address": ""}}]
             
             # Send email
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.graph_base_url}/me/sendMail",
-                    headers=headers,
-                    json=email_data
-                )
-                response.raise_for_status()
-                
-                return {"id": "sent", "status": "sent"}
-                
+            response = await self.http.post(
+                f"{self.graph_base_url}/me/sendMail",
+                headers=headers,
+                json=email_data
+            )
+            response.raise_for_status()
+            
+            return {"id": "sent", "status": "sent"}
+            
         except Exception as e:
             print(f"Outlook send error: {e}")
             raise Exception(f"Failed to send Outlook email: {str(e)}")
@@ -137,15 +148,14 @@ class MicrosoftService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(
-                    f"{self.graph_base_url}/me/messages/{message_id}",
-                    headers=headers,
-                    json={"isRead": True}
-                )
-                response.raise_for_status()
-                return True
-                
+            response = await self.http.patch(
+                f"{self.graph_base_url}/me/messages/{message_id}",
+                headers=headers,
+                json={"isRead": True}
+            )
+            response.raise_for_status()
+            return True
+            
         except Exception as e:
             print(f"Outlook mark read error: {e}")
             return False
@@ -175,17 +185,16 @@ class MicrosoftService:
             # Use specific calendar or default
             calendar_endpoint = f"/me/calendars/{calendar_id}/events" if calendar_id else "/me/events"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.graph_base_url}{calendar_endpoint}",
-                    headers=headers,
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                return data.get("value", [])
-                
+            response = await self.http.get(
+                f"{self.graph_base_url}{calendar_endpoint}",
+                headers=headers,
+                params=params
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data.get("value", [])
+            
         except Exception as e:
             print(f"Outlook Calendar fetch error: {e}")
             raise Exception(f"Failed to fetch Outlook Calendar events: {str(e)}")
@@ -245,16 +254,15 @@ class MicrosoftService:
             calendar_endpoint = f"/me/calendars/{calendar_id}/events" if calendar_id else "/me/events"
             
             # Create event
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.graph_base_url}{calendar_endpoint}",
-                    headers=headers,
-                    json=event_data
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            response = await self.http.post(
+                f"{self.graph_base_url}{calendar_endpoint}",
+                headers=headers,
+                json=event_data
+            )
+            response.raise_for_status()
+            
+            return response.json()
+            
         except Exception as e:
             print(f"Outlook Calendar create error: {e}")
             raise Exception(f"Failed to create Outlook Calendar event: {str(e)}")
@@ -299,16 +307,15 @@ class MicrosoftService:
             calendar_endpoint = f"/me/calendars/{calendar_id}/events/{event_id}" if calendar_id else f"/me/events/{event_id}"
             
             # Update event
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(
-                    f"{self.graph_base_url}{calendar_endpoint}",
-                    headers=headers,
-                    json=update_data
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            response = await self.http.patch(
+                f"{self.graph_base_url}{calendar_endpoint}",
+                headers=headers,
+                json=update_data
+            )
+            response.raise_for_status()
+            
+            return response.json()
+            
         except Exception as e:
             print(f"Outlook Calendar update error: {e}")
             raise Exception(f"Failed to update Outlook Calendar event: {str(e)}")
@@ -327,14 +334,13 @@ class MicrosoftService:
             # Use specific calendar or default
             calendar_endpoint = f"/me/calendars/{calendar_id}/events/{event_id}" if calendar_id else f"/me/events/{event_id}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.graph_base_url}{calendar_endpoint}",
-                    headers=headers
-                )
-                response.raise_for_status()
-                return True
-                
+            response = await self.http.delete(
+                f"{self.graph_base_url}{calendar_endpoint}",
+                headers=headers
+            )
+            response.raise_for_status()
+            return True
+            
         except Exception as e:
             print(f"Outlook Calendar delete error: {e}")
             return False
@@ -345,36 +351,35 @@ class MicrosoftService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                # Test user profile endpoint
-                profile_response = await client.get(
-                    f"{self.graph_base_url}/me",
-                    headers=headers
-                )
-                profile_healthy = profile_response.status_code == 200
-                
-                # Test mail endpoint
-                mail_response = await client.get(
-                    f"{self.graph_base_url}/me/messages?$top=1",
-                    headers=headers
-                )
-                mail_healthy = mail_response.status_code == 200
-                
-                # Test calendar endpoint
-                calendar_response = await client.get(
-                    f"{self.graph_base_url}/me/events?$top=1",
-                    headers=headers
-                )
-                calendar_healthy = calendar_response.status_code == 200
-                
-                return {
-                    "user_profile": "healthy" if profile_healthy else "unhealthy",
-                    "mail_api": "healthy" if mail_healthy else "unhealthy",
-                    "calendar_api": "healthy" if calendar_healthy else "unhealthy",
-                    "overall_status": "healthy" if (profile_healthy and mail_healthy and calendar_healthy) else "degraded",
-                    "token_valid": True
-                }
-                
+            # Test user profile endpoint
+            profile_response = await self.http.get(
+                f"{self.graph_base_url}/me",
+                headers=headers
+            )
+            profile_healthy = profile_response.status_code == 200
+            
+            # Test mail endpoint
+            mail_response = await self.http.get(
+                f"{self.graph_base_url}/me/messages?$top=1",
+                headers=headers
+            )
+            mail_healthy = mail_response.status_code == 200
+            
+            # Test calendar endpoint
+            calendar_response = await self.http.get(
+                f"{self.graph_base_url}/me/events?$top=1",
+                headers=headers
+            )
+            calendar_healthy = calendar_response.status_code == 200
+            
+            return {
+                "user_profile": "healthy" if profile_healthy else "unhealthy",
+                "mail_api": "healthy" if mail_healthy else "unhealthy",
+                "calendar_api": "healthy" if calendar_healthy else "unhealthy",
+                "overall_status": "healthy" if (profile_healthy and mail_healthy and calendar_healthy) else "degraded",
+                "token_valid": True
+            }
+            
         except Exception as e:
             print(f"Microsoft health check error: {e}")
             return {
@@ -408,18 +413,17 @@ class MicrosoftService:
                     "clientState": f"mail-{user_id}"
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    mail_response = await client.post(
-                        f"{self.graph_base_url}/subscriptions",
-                        headers=headers,
-                        json=mail_webhook_data
-                    )
+                mail_response = await self.http.post(
+                    f"{self.graph_base_url}/subscriptions",
+                    headers=headers,
+                    json=mail_webhook_data
+                )
+                
+                if mail_response.status_code == 201:
+                    webhook_results["mail"] = mail_response.json()
+                else:
+                    webhook_results["mail"] = {"error": "Failed to setup mail webhook"}
                     
-                    if mail_response.status_code == 201:
-                        webhook_results["mail"] = mail_response.json()
-                    else:
-                        webhook_results["mail"] = {"error": "Failed to setup mail webhook"}
-                        
             except Exception as e:
                 webhook_results["mail"] = {"error": str(e)}
             
@@ -433,18 +437,17 @@ class MicrosoftService:
                     "clientState": f"calendar-{user_id}"
                 }
                 
-                async with httpx.AsyncClient() as client:
-                    calendar_response = await client.post(
-                        f"{self.graph_base_url}/subscriptions",
-                        headers=headers,
-                        json=calendar_webhook_data
-                    )
+                calendar_response = await self.http.post(
+                    f"{self.graph_base_url}/subscriptions",
+                    headers=headers,
+                    json=calendar_webhook_data
+                )
+                
+                if calendar_response.status_code == 201:
+                    webhook_results["calendar"] = calendar_response.json()
+                else:
+                    webhook_results["calendar"] = {"error": "Failed to setup calendar webhook"}
                     
-                    if calendar_response.status_code == 201:
-                        webhook_results["calendar"] = calendar_response.json()
-                    else:
-                        webhook_results["calendar"] = {"error": "Failed to setup calendar webhook"}
-                        
             except Exception as e:
                 webhook_results["calendar"] = {"error": str(e)}
             
@@ -472,15 +475,14 @@ class MicrosoftService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.graph_base_url}/me",
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                return response.json()
-                
+            response = await self.http.get(
+                f"{self.graph_base_url}/me",
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            return response.json()
+            
         except Exception as e:
             print(f"Microsoft profile fetch error: {e}")
             raise Exception(f"Failed to fetch Microsoft profile: {str(e)}")
@@ -491,16 +493,15 @@ class MicrosoftService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.graph_base_url}/me/mailFolders",
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                return data.get("value", [])
-                
+            response = await self.http.get(
+                f"{self.graph_base_url}/me/mailFolders",
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data.get("value", [])
+            
         except Exception as e:
             print(f"Microsoft mailboxes fetch error: {e}")
             return []
@@ -511,16 +512,15 @@ class MicrosoftService:
         try:
             headers = {"Authorization": f"Bearer {access_token}"}
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.graph_base_url}/me/calendars",
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                return data.get("value", [])
-                
+            response = await self.http.get(
+                f"{self.graph_base_url}/me/calendars",
+                headers=headers
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data.get("value", [])
+            
         except Exception as e:
             print(f"Microsoft calendars fetch error: {e}")
             return []
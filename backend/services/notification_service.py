@@ -1,7 +1,10 @@
+import asyncio
+import json
 import uuid
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
 
 from models.notifications import (
     Notification, NotificationChannel, NotificationType, 
@@ -9,6 +12,13 @@ from models.notifications import (
     UserNotificationPreferences, DeliveryAttempt
 )
 from services.twilio_service import TwilioService
+from utils.cache import CacheLayer
+
+# Per-user notification preferences, invalidated on update
+preferences_cache = CacheLayer("notif_prefs")
+
+# Per-user contact details used for delivery, invalidated on profile update
+user_contact_cache = CacheLayer("user_contact")
 
 class NotificationService:
     """Service for managing multi-channel notifications"""
@@ -28,46 +38,25 @@ class NotificationService:
         scheduled_at: Optional[datetime] = None,
         metadata: Dict[str, Any] = None,
         related_email_id: Optional[str] = None,
-        related_event_id: Optional[str] = None
+        related_event_id: Optional[str] = None,
+        deliver: bool = True
     ) -> Notification:
-        """Send a notification through specified channels"""
+        """Send a notification through specified channels
+        
+        With ``deliver=False`` the notification is only stored, leaving
+        channel delivery to the caller (e.g. the task queue).
+        """
         
         try:
-            # Get user's notification preferences
-            preferences = await self._get_user_preferences(user_id)
-            
-            # Check if user wants this type of notification
-            user_channels = preferences.channel_preferences.get(notification_type, channels)
-            if not user_channels:
-                user_channels = channels
-            
-            # Check quiet hours if applicable
-            if (priority != NotificationPriority.URGENT and 
-                preferences.quiet_hours_enabled and 
-                self._is_in_quiet_hours(preferences)):
-                # Schedule for later
-                scheduled_at = self._get_next_allowed_time(preferences)
-            
-            # Check rate limits
-            if not await self._check_rate_limits(user_id, user_channels, preferences):
-                # Skip or delay notification
-                scheduled_at = datetime.utcnow() + timedelta(minutes=30)
-            
-            # Create notification content
-            content = NotificationContent(
+            notification = await self._build_notification(
+                user_id=user_id,
+                notification_type=notification_type,
                 title=title,
                 message=message,
-                metadata=metadata or {}
-            )
-            
-            # Create notification object
-            notification = Notification(
-                user_id=user_id,
-                type=notification_type,
+                channels=channels,
                 priority=priority,
-                content=content,
-                preferred_channels=user_channels,
-                scheduled_at=scheduled_at or datetime.utcnow(),
+                scheduled_at=scheduled_at,
+                metadata=metadata,
                 related_email_id=related_email_id,
                 related_event_id=related_event_id
             )
@@ -76,7 +65,7 @@ class NotificationService:
             await self.db.notifications.insert_one(notification.dict())
             
             # Send immediately if not scheduled
-            if not scheduled_at or scheduled_at <= datetime.utcnow():
+            if deliver and notification.scheduled_at <= datetime.utcnow():
                 await self._deliver_notification(notification)
             
             return notification
@@ -85,6 +74,102 @@ class NotificationService:
             print(f"Notification sending error: {e}")
             raise Exception(f"Failed to send notification: {str(e)}")
     
+    async def send_notifications_bulk(
+        self,
+        items: List[Dict[str, Any]],
+        concurrency: int = 16
+    ) -> List[Dict[str, Any]]:
+        """Store many notifications with a single insert_many
+        
+        Each item takes the keyword arguments of ``send_notification``.
+        Items are grouped by user, so preferences and recent send counts are
+        loaded once per user and the rate limit also counts the items
+        accepted before it in the same request. Returns one entry per item,
+        in order, with its ``notification`` (None when it failed), whether
+        it was ``rate_limited`` and any ``error``. Delivery is left to the
+        caller (e.g. the task queue).
+        """
+        
+        results: List[Dict[str, Any]] = [
+            {"notification": None, "rate_limited": False, "error": None} for _ in items
+        ]
+        
+        by_user: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            by_user.setdefault(item["user_id"], []).append(index)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def build_user_group(user_id: str, indexes: List[int]):
+            async with semaphore:
+                try:
+                    preferences = await self._get_user_preferences(user_id)
+                    resolved = {
+                        index: self._apply_preferences(
+                            preferences,
+                            items[index]["notification_type"],
+                            items[index]["channels"],
+                            items[index].get("priority", NotificationPriority.NORMAL),
+                            items[index].get("scheduled_at")
+                        )
+                        for index in indexes
+                    }
+                    sent_counts = await self._count_recent_sends(
+                        user_id,
+                        list({channel for channels, _ in resolved.values() for channel in channels})
+                    )
+                except Exception as e:
+                    print(f"Bulk notification error for user {user_id}: {e}")
+                    for index in indexes:
+                        results[index]["error"] = "Failed to create notification"
+                    return
+                
+                for index in indexes:
+                    user_channels, scheduled_at = resolved[index]
+                    now = datetime.utcnow()
+                    
+                    if not self._within_rate_limits(sent_counts, user_channels, preferences):
+                        scheduled_at = now + timedelta(minutes=30)
+                        results[index]["rate_limited"] = True
+                    elif not scheduled_at or scheduled_at <= now:
+                        # Due now, so it counts towards the next items' limits
+                        for channel in user_channels:
+                            sent_counts[channel] = sent_counts.get(channel, 0) + 1
+                    
+                    try:
+                        results[index]["notification"] = self._create_notification(
+                            items[index], user_channels, scheduled_at
+                        )
+                    except Exception as e:
+                        print(f"Bulk notification error for item {index}: {e}")
+                        results[index]["error"] = "Failed to create notification"
+        
+        await asyncio.gather(*(
+            build_user_group(user_id, indexes) for user_id, indexes in by_user.items()
+        ))
+        
+        built = [(index, result) for index, result in enumerate(results) if result["notification"]]
+        if not built:
+            return results
+        
+        try:
+            await self.db.notifications.insert_many(
+                [result["notification"].dict() for _, result in built],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # The other notifications were still stored
+            for write_error in e.details.get("writeErrors", []):
+                index, result = built[write_error["index"]]
+                print(f"Bulk notification insert error for item {index}: {write_error.get('errmsg')}")
+                result["notification"] = None
+                result["error"] = "Failed to store notification"
+        except Exception as e:
+            print(f"Bulk notification sending error: {e}")
+            raise Exception(f"Failed to send notifications: {str(e)}")
+        
+        return results
+    
     async def send_urgent_email_notification(
         self,
         user_id: str,
@@ -285,6 +370,98 @@ class NotificationService:
             print(f"Notification processing error: {e}")
             return False
     
+    async def _build_notification(
+        self,
+        user_id: str,
+        notification_type: NotificationType,
+        title: str,
+        message: str,
+        channels: List[NotificationChannel],
+        priority: NotificationPriority = NotificationPriority.NORMAL,
+        scheduled_at: Optional[datetime] = None,
+        metadata: Dict[str, Any] = None,
+        related_email_id: Optional[str] = None,
+        related_event_id: Optional[str] = None
+    ) -> Notification:
+        """Apply user preferences, quiet hours and rate limits to a new notification"""
+        
+        # Get user's notification preferences
+        preferences = await self._get_user_preferences(user_id)
+        user_channels, scheduled_at = self._apply_preferences(
+            preferences, notification_type, channels, priority, scheduled_at
+        )
+        
+        # Check rate limits
+        if not await self._check_rate_limits(user_id, user_channels, preferences):
+            # Skip or delay notification
+            scheduled_at = datetime.utcnow() + timedelta(minutes=30)
+        
+        return self._create_notification(
+            {
+                "user_id": user_id,
+                "notification_type": notification_type,
+                "title": title,
+                "message": message,
+                "priority": priority,
+                "metadata": metadata,
+                "related_email_id": related_email_id,
+                "related_event_id": related_event_id
+            },
+            user_channels,
+            scheduled_at
+        )
+    
+    def _apply_preferences(
+        self,
+        preferences: UserNotificationPreferences,
+        notification_type: NotificationType,
+        channels: List[NotificationChannel],
+        priority: NotificationPriority,
+        scheduled_at: Optional[datetime]
+    ) -> Tuple[List[NotificationChannel], Optional[datetime]]:
+        """Channels and schedule for a notification after the user's preferences"""
+        
+        # Check if user wants this type of notification
+        user_channels = preferences.channel_preferences.get(notification_type, channels)
+        if not user_channels:
+            user_channels = channels
+        
+        # Check quiet hours if applicable
+        if (priority != NotificationPriority.URGENT and 
+            preferences.quiet_hours_enabled and 
+            self._is_in_quiet_hours(preferences)):
+            # Schedule for later
+            scheduled_at = self._get_next_allowed_time(preferences)
+        
+        return user_channels, scheduled_at
+    
+    def _create_notification(
+        self,
+        item: Dict[str, Any],
+        user_channels: List[NotificationChannel],
+        scheduled_at: Optional[datetime]
+    ) -> Notification:
+        """Notification object for ``send_notification`` keyword arguments"""
+        
+        # Create notification content
+        content = NotificationContent(
+            title=item["title"],
+            message=item["message"],
+            metadata=item.get("metadata") or {}
+        )
+        
+        # Create notification object
+        return Notification(
+            user_id=item["user_id"],
+            type=item["notification_type"],
+            priority=item.get("priority", NotificationPriority.NORMAL),
+            content=content,
+            preferred_channels=user_channels,
+            scheduled_at=scheduled_at or datetime.utcnow(),
+            related_email_id=item.get("related_email_id"),
+            related_event_id=item.get("related_event_id")
+        )
+    
     async def _deliver_notification(self, notification: Notification) -> bool:
         """Deliver notification through all specified channels"""
         
@@ -365,11 +542,11 @@ class NotificationService:
         """Send SMS notification"""
         try:
             # Get user phone number
-            user = await self.db.users.find_one({"id": notification.user_id})
-            if not user:
+            contact = await self.get_user_contact(notification.user_id)
+            if not contact:
                 return False
             
-            phone_number = user.get("profile", {}).get("phone_number")
+            phone_number = contact["phone_number"]
             if not phone_number:
                 return False
             
@@ -388,11 +565,11 @@ class NotificationService:
         """Send WhatsApp notification"""
         try:
             # Get user phone number
-            user = await self.db.users.find_one({"id": notification.user_id})
-            if not user:
+            contact = await self.get_user_contact(notification.user_id)
+            if not contact:
                 return False
             
-            phone_number = user.get("profile", {}).get("phone_number")
+            phone_number = contact["phone_number"]
             if not phone_number:
                 return False
             
@@ -429,18 +606,41 @@ class NotificationService:
             print(f"In-app notification error: {e}")
             return False
     
+    async def get_user_contact(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the contact details delivery needs, or None if the user is missing"""
+        cached = await user_contact_cache.get(user_id)
+        if cached:
+            return json.loads(cached)
+        
+        user = await self.db.users.find_one(
+            {"id": user_id},
+            {"_id": 0, "profile.phone_number": 1}
+        )
+        if not user:
+            return None
+        
+        contact = {"phone_number": user.get("profile", {}).get("phone_number")}
+        await user_contact_cache.set(user_id, json.dumps(contact))
+        return contact
+    
     async def _get_user_preferences(self, user_id: str) -> UserNotificationPreferences:
         """Get user's notification preferences"""
         try:
+            cached = await preferences_cache.get(user_id)
+            if cached:
+                return UserNotificationPreferences.model_validate_json(cached)
+            
             preferences = await self.db.notification_preferences.find_one({"user_id": user_id})
             
             if not preferences:
                 # Create default preferences
-                default_prefs = UserNotificationPreferences(user_id=user_id)
-                await self.db.notification_preferences.insert_one(default_prefs.dict())
-                return default_prefs
+                preferences = UserNotificationPreferences(user_id=user_id)
+                await self.db.notification_preferences.insert_one(preferences.dict())
+            else:
+                preferences = UserNotificationPreferences(**preferences)
             
-            return UserNotificationPreferences(**preferences)
+            await preferences_cache.set(user_id, preferences.model_dump_json())
+            return preferences
             
         except Exception as e:
             print(f"Preferences retrieval error: {e}")
@@ -497,26 +697,41 @@ class NotificationService:
         preferences: UserNotificationPreferences
     ) -> bool:
         """Check if sending notification would exceed rate limits"""
+        sent_counts = await self._count_recent_sends(user_id, channels)
+        return self._within_rate_limits(sent_counts, channels, preferences)
+    
+    async def _count_recent_sends(
+        self,
+        user_id: str,
+        channels: List[NotificationChannel]
+    ) -> Dict[NotificationChannel, int]:
+        """Notifications sent to the user in the last hour, per channel"""
         try:
             now = datetime.utcnow()
             hour_ago = now - timedelta(hours=1)
             
-            for channel in channels:
-                # Count notifications sent in last hour for this channel
-                sent_count = await self.db.notifications.count_documents({
+            counts = await asyncio.gather(*(
+                self.db.notifications.count_documents({
                     "user_id": user_id,
                     "preferred_channels": channel,
                     "sent_at": {"$gte": hour_ago, "$lte": now}
                 })
-                
-                # Check against user's limit
-                max_per_hour = preferences.max_notifications_per_hour.get(channel, 10)
-                
-                if sent_count >= max_per_hour:
-                    return False
-            
-            return True
+                for channel in channels
+            ))
+            return dict(zip(channels, counts))
             
         except Exception as e:
             print(f"Rate limit check error: {e}")
-            return True  # Allow if check fails
\ No newline at end of file
+            return {}  # Allow if check fails
+    
+    def _within_rate_limits(
+        self,
+        sent_counts: Dict[NotificationChannel, int],
+        channels: List[NotificationChannel],
+        preferences: UserNotificationPreferences
+    ) -> bool:
+        """Check sent counts against the user's per-channel hourly limits"""
+        return all(
+            sent_counts.get(channel, 0) < preferences.max_notifications_per_hour.get(channel, 10)
+            for channel in channels
+        )
\ No newline at end of file
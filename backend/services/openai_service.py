@@ -1,7 +1,16 @@
 import openai
+import re
 from typing import Dict, Any, List, Optional
 from decouple import config
 
+# Markdown code fence the model sometimes wraps JSON replies in
+_FENCE = re.compile(r'^\s*```(?:json)?\s*\n?(.*?)\n?```\s*$', re.S | re.I)
+
+def _strip_fence(text: str) -> str:
+    """Return the contents of a fenced code block, or the text unchanged"""
+    match = _FENCE.match(text)
+    return match.group(1) if match else text
+
 class OpenAIService:
     """Service for OpenAI API integration"""
     
@@ -101,10 +110,7 @@ class OpenAIService:
             # Try to parse as JSON
             try:
                 import json
-                if content.startswith("```json"):
-                    content = content[7:-3]
-                elif content.startswith("```"):
-                    content = content[3:-3]
+                content = _strip_fence(content)
                 
                 analysis_result = json.loads(content)
                 
@@ -257,10 +263,7 @@ class OpenAIService:
             
             try:
                 import json
-                if content.startswith("```json"):
-                    content = content[7:-3]
-                elif content.startswith("```"):
-                    content = content[3:-3]
+                content = _strip_fence(content)
                 
                 entities_result = json.loads(content)
                 
@@ -325,10 +328,7 @@ class OpenAIService:
             
             try:
                 import json
-                if content.startswith("```json"):
-                    content = content[7:-3]
-                elif content.startswith("```"):
-                    content = content[3:-3]
+                content = _strip_fence(content)
                 
                 classification_result = json.loads(content)
                 
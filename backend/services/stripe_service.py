@@ -3,6 +3,9 @@ from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from decouple import config
 
+# Route SDK calls through httpx so the *_async methods don't block the event loop
+stripe.default_http_client = stripe.HTTPXClient()
+
 class StripeService:
     """Service for Stripe payment processing"""
     
@@ -18,14 +21,14 @@ class StripeService:
             if user.get("stripe_customer_id"):
                 try:
                     # Verify customer exists
-                    customer = stripe.Customer.retrieve(user["stripe_customer_id"])
+                    customer = await stripe.Customer.retrieve_async(user["stripe_customer_id"])
                     return customer.id
                 except stripe.error.InvalidRequestError:
                     # Customer doesn't exist, create new one
                     pass
             
             # Create new customer
-            customer = stripe.Customer.create(
+            customer = await stripe.Customer.create_async(
                 email=user["email"],
                 name=user.get("profile", {}).get("full_name", ""),
                 metadata={
@@ -45,18 +48,20 @@ class StripeService:
         amount: int,  # Amount in cents
         customer_id: str,
         currency: str = "usd",
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        idempotency_key: Optional[str] = None
     ) -> stripe.PaymentIntent:
         """Create Stripe payment intent"""
         
         try:
-            payment_intent = stripe.PaymentIntent.create(
+            payment_intent = await stripe.PaymentIntent.create_async(
                 amount=amount,
                 currency=currency,
                 customer=customer_id,
                 metadata=metadata or {},
                 automatic_payment_methods={"enabled": True},
-                receipt_email=None  # Will use customer email
+                receipt_email=None,  # Will use customer email
+                idempotency_key=idempotency_key
             )
             
             return payment_intent
@@ -70,30 +75,32 @@ class StripeService:
         customer_id: str,
         price_id: str,
         payment_method_id: str,
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        idempotency_key: Optional[str] = None
     ) -> stripe.Subscription:
         """Create Stripe subscription"""
         
         try:
             # Attach payment method to customer
-            stripe.PaymentMethod.attach(
+            await stripe.PaymentMethod.attach_async(
                 payment_method_id,
                 customer=customer_id
             )
             
             # Set as default payment method
-            stripe.Customer.modify(
+            await stripe.Customer.modify_async(
                 customer_id,
                 invoice_settings={'default_payment_method': payment_method_id}
             )
             
             # Create subscription
-            subscription = stripe.Subscription.create(
+            subscription = await stripe.Subscription.create_async(
                 customer=customer_id,
                 items=[{"price": price_id}],
                 default_payment_method=payment_method_id,
                 metadata=metadata or {},
-                expand=['latest_invoice.payment_intent']
+                expand=['latest_invoice.payment_intent'],
+                idempotency_key=idempotency_key
             )
             
             return subscription
@@ -119,7 +126,7 @@ class StripeService:
             
             if new_price_id:
                 # Get current subscription
-                subscription = stripe.Subscription.retrieve(subscription_id)
+                subscription = await stripe.Subscription.retrieve_async(subscription_id)
                 
                 # Update subscription items
                 update_params["items"] = [{
@@ -131,14 +138,14 @@ class StripeService:
                 update_params["metadata"] = metadata
             
             if update_params:
-                subscription = stripe.Subscription.modify(
+                subscription = await stripe.Subscription.modify_async(
                     subscription_id,
                     **update_params
                 )
                 return subscription
             
             # If no updates, just return current subscription
-            return stripe.Subscription.retrieve(subscription_id)
+            return await stripe.Subscription.retrieve_async(subscription_id)
             
         except Exception as e:
             print(f"Subscription update error: {e}")
@@ -148,7 +155,7 @@ class StripeService:
         """Cancel Stripe subscription immediately"""
         
         try:
-            subscription = stripe.Subscription.delete(subscription_id)
+            subscription = await stripe.Subscription.delete_async(subscription_id)
             return subscription
             
         except Exception as e:
@@ -159,7 +166,7 @@ class StripeService:
         """Get customer's payment methods"""
         
         try:
-            payment_methods = stripe.PaymentMethod.list(
+            payment_methods = await stripe.PaymentMethod.list_async(
                 customer=customer_id,
                 type="card"
             )
@@ -188,7 +195,7 @@ class StripeService:
         """Create setup intent for saving payment method"""
         
         try:
-            setup_intent = stripe.SetupIntent.create(
+            setup_intent = await stripe.SetupIntent.create_async(
                 customer=customer_id,
                 payment_method_types=["card"],
                 usage="off_session"
@@ -204,7 +211,7 @@ class StripeService:
         """Get invoice details"""
         
         try:
-            invoice = stripe.Invoice.retrieve(invoice_id)
+            invoice = await stripe.Invoice.retrieve_async(invoice_id)
             
             return {
                 "id": invoice.id,
@@ -234,7 +241,7 @@ class StripeService:
         """Get customer's invoices"""
         
         try:
-            invoices = stripe.Invoice.list(
+            invoices = await stripe.Invoice.list_async(
                 customer=customer_id,
                 limit=limit
             )
@@ -268,7 +275,7 @@ class StripeService:
         """Create Stripe billing portal session"""
         
         try:
-            session = stripe.billing_portal.Session.create(
+            session = await stripe.billing_portal.Session.create_async(
                 customer=customer_id,
                 return_url=return_url
             )
@@ -309,7 +316,7 @@ class StripeService:
         """Get payment intent details"""
         
         try:
-            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            payment_intent = await stripe.PaymentIntent.retrieve_async(payment_intent_id)
             
             return {
                 "id": payment_intent.id,
@@ -334,7 +341,7 @@ class StripeService:
         """Get subscription details"""
         
         try:
-            subscription = stripe.Subscription.retrieve(subscription_id)
+            subscription = await stripe.Subscription.retrieve_async(subscription_id)
             
             return {
                 "id": subscription.id,
@@ -385,7 +392,7 @@ class StripeService:
             if reason:
                 refund_params["reason"] = reason
             
-            refund = stripe.Refund.create(**refund_params)
+            refund = await stripe.Refund.create_async(**refund_params)
             
             return {
                 "id": refund.id,
@@ -409,13 +416,13 @@ class StripeService:
             start_time = int((datetime.utcnow() - timedelta(days=days)).timestamp())
             
             # Get payment intents
-            payment_intents = stripe.PaymentIntent.list(
+            payment_intents = await stripe.PaymentIntent.list_async(
                 created={"gte": start_time, "lte": end_time},
                 limit=100
             )
             
             # Get subscriptions
-            subscriptions = stripe.Subscription.list(
+            subscriptions = await stripe.Subscription.list_async(
                 created={"gte": start_time, "lte": end_time},
                 limit=100
             )
@@ -447,7 +454,7 @@ class StripeService:
         
         try:
             # Try to retrieve account info
-            account = stripe.Account.retrieve()
+            account = await stripe.Account.retrieve_async()
             
             return {
                 "status": "healthy",
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -78,6 +78,25 @@ async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depend
     
     return user_id
 
+async def get_current_user(
+    request: Request,
+    current_user_id: str = Depends(get_current_user_id)
+) -> Dict[str, Any]:
+    """Load the authenticated user's document once per request"""
+    # Kept on request.state so middleware and helpers handed the request
+    # reuse the same read instead of fetching the user again
+    user = getattr(request.state, "user", None)
+    if user is None:
+        user = await request.app.database.users.find_one({"id": current_user_id})
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        request.state.user = user
+    
+    return user
+
 def create_reset_token_with_expiry(user_id: str, expires_in_hours: int = 1) -> tuple[str, datetime]:
     """Create a password reset token with expiry"""
     token = generate_reset_token()
@@ -0,0 +1,157 @@
+from typing import Optional, Dict, Any
+import asyncio
+import functools
+import hashlib
+import orjson
+from cachetools import TTLCache
+from decouple import config
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from motor.motor_asyncio import AsyncIOMotorDatabase
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+# Shared Redis connection, connects lazily on first use
+redis_client = redis.from_url(
+    config('REDIS_URL', default='redis://localhost:6379'),
+    decode_responses=True
+)
+
+class CacheLayer:
+    """Two-level cache: an in-process TTL cache in front of Redis
+    
+    Values are strings (usually JSON). Redis errors are treated as cache
+    misses so callers always fall back to the database. With ``shared=False``
+    values stay in the local cache only.
+    """
+    
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 10_000,
+        local_ttl: int = 60,
+        redis_ttl: int = 300,
+        shared: bool = True
+    ):
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self.shared = shared
+        self.local = TTLCache(maxsize=maxsize, ttl=local_ttl)
+    
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached value, checking the local cache before Redis"""
+        value = self.local.get(key)
+        if value is not None or not self.shared:
+            return value
+        
+        try:
+            value = await redis_client.get(self._key(key))
+        except (RedisError, OSError):
+            return None
+        
+        if value is not None:
+            self.local[key] = value
+        return value
+    
+    async def set(self, key: str, value: str):
+        """Store a value in both cache levels"""
+        self.local[key] = value
+        if not self.shared:
+            return
+        try:
+            await redis_client.set(self._key(key), value, ex=self.redis_ttl)
+        except (RedisError, OSError):
+            pass
+    
+    async def delete(self, key: str):
+        """Invalidate a value in both cache levels"""
+        self.local.pop(key, None)
+        if not self.shared:
+            return
+        try:
+            await redis_client.delete(self._key(key))
+        except (RedisError, OSError):
+            pass
+
+# Hot user lookups (credit balance polling, payments) tolerate a couple of
+# seconds of staleness, so keep this local and short-lived. Entries map each
+# projection used for a user to the document it returned.
+_user_cache = TTLCache(maxsize=10_000, ttl=2)
+
+async def get_user_cached(
+    database: AsyncIOMotorDatabase,
+    user_id: str,
+    projection: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """Get a user document, reusing a lookup from the last couple of seconds"""
+    projection_key = tuple(projection.items()) if projection else ()
+    entry = _user_cache.get(user_id)
+    if entry is not None and projection_key in entry:
+        return entry[projection_key]
+    
+    user = await database.users.find_one({"id": user_id}, projection)
+    if user is not None:
+        if entry is None:
+            entry = _user_cache[user_id] = {}
+        entry[projection_key] = user
+    return user
+
+def invalidate_user_cache(user_id: str):
+    """Drop a cached user document after it has been written"""
+    _user_cache.pop(user_id, None)
+
+# Per-user GET views (routes/users.py), dropped whenever the user is written.
+# Other workers only see an invalidation once their local copy expires, so the
+# local TTL is longer only for views that rarely change (activity, connections).
+USER_VIEW_LOCAL_TTLS = {
+    "profile": 5,
+    "activity": 15,
+    "credits": 5,
+    "connections": 15,
+    "dashboard": 5
+}
+# The profile body includes the OAuth tokens in connections, so it is never
+# written to Redis
+LOCAL_ONLY_USER_VIEWS = {"profile"}
+user_views = {
+    name: CacheLayer(
+        f"user_view:{name}",
+        local_ttl=local_ttl,
+        redis_ttl=30,
+        shared=name not in LOCAL_ONLY_USER_VIEWS
+    )
+    for name, local_ttl in USER_VIEW_LOCAL_TTLS.items()
+}
+
+def cached_user_view(name: str):
+    """Serve a per-user endpoint from the named view cache as ready-made JSON
+    
+    The endpoint must take ``request`` and ``current_user_id``. Its result is
+    encoded once and reused until the view expires or is invalidated; responses
+    carry an ETag so clients holding the same body get a 304.
+    """
+    cache = user_views[name]
+    
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            user_id = kwargs["current_user_id"]
+            body = await cache.get(user_id)
+            if body is None:
+                result = await func(*args, **kwargs)
+                body = orjson.dumps(jsonable_encoder(result)).decode()
+                await cache.set(user_id, body)
+            
+            etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+            if kwargs["request"].headers.get("if-none-match") == etag:
+                return Response(status_code=304, headers={"ETag": etag})
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
+        return wrapper
+    return decorator
+
+async def invalidate_user_views(user_id: str, *names: str):
+    """Drop cached views for a user, all of them when no names are given"""
+    await asyncio.gather(*(user_views[name].delete(user_id) for name in names or user_views))
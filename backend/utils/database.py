@@ -2,64 +2,128 @@ from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+import asyncio
+import base64
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
+# Indexes created at startup, by collection
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("id", unique=True),
+        IndexModel("email", unique=True),
+        IndexModel("verification_token"),
+        IndexModel("reset_password_token"),
+        IndexModel("stripe_customer_id"),
+        IndexModel("created_at")
+    ],
+    "emails": [
+        IndexModel([("user_id", 1), ("received_at", -1)]),
+        IndexModel([("user_id", 1), ("status", 1), ("priority", 1)]),
+        IndexModel([("user_id", 1), ("priority", 1)]),
+        IndexModel("metadata.provider_message_id", unique=True),
+        IndexModel([("sender.email", 1), ("received_at", -1)]),
+        # Stuck processing recovery (routes/ai_core.py)
+        IndexModel([("processing_status", 1), ("processing_deadline", 1)])
+    ],
+    "calendar_events": [
+        IndexModel("id", unique=True),
+        # Range queries match on both ends of the event and sort by start
+        IndexModel([("user_id", 1), ("start_datetime", 1), ("end_datetime", 1)]),
+        IndexModel([("user_id", 1), ("end_datetime", 1)]),
+        # Sync upserts match on this; the same provider event can belong
+        # to several users when they are all invited to it
+        IndexModel([("user_id", 1), ("provider", 1), ("provider_event_id", 1)], unique=True),
+        IndexModel([("attendees.email", 1)])
+    ],
+    "notifications": [
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel([("user_id", 1), ("created_at", -1), ("id", -1)]),
+        IndexModel([("user_id", 1), ("status", 1)]),
+        IndexModel([("user_id", 1), ("read_at", 1)], name="user_unread"),
+        IndexModel("scheduled_at"),
+        IndexModel("expires_at")
+    ],
+    "user_guidelines": [
+        IndexModel("user_id", unique=True),
+        IndexModel([("user_id", 1), ("updated_at", -1)])
+    ],
+    "email_drafts": [
+        IndexModel("user_id")
+    ],
+    "payments": [
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel([("user_id", 1), ("created_at", -1), ("id", -1)]),
+        IndexModel("stripe_payment_intent_id", unique=True),
+        IndexModel([("status", 1), ("created_at", -1)])
+    ],
+    "credit_transactions": [
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel([("user_id", 1), ("transaction_type", 1), ("created_at", -1)])
+    ],
+    "subscriptions": [
+        IndexModel([("user_id", 1), ("created_at", -1)]),
+        IndexModel("stripe_customer_id")
+    ],
+    # Webhook dedup
+    "stripe_events": [
+        IndexModel("event_id", unique=True)
+    ]
+}
+
+# Indexes replaced by ones in INDEXES, dropped at startup if still present.
+# provider_event_id alone rejected a second user's copy of a shared event.
+DROPPED_INDEXES: Dict[str, List[str]] = {
+    "calendar_events": ["provider_event_id_1"]
+}
+
+# Server error codes for a missing collection or index when dropping one
+NAMESPACE_NOT_FOUND = 26
+INDEX_NOT_FOUND = 27
+
 class DatabaseManager:
     """Database utility class for MongoDB operations"""
     
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
     
-    async def create_indexes(self):
-        """Create necessary database indexes for performance"""
-        
-        # Users collection indexes
-        users = self.db.users
-        await users.create_index("email", unique=True)
-        await users.create_index("verification_token")
-        await users.create_index("reset_password_token")
-        await users.create_index("stripe_customer_id")
-        await users.create_index("created_at")
-        
-        # Emails collection indexes
-        emails = self.db.emails
-        await emails.create_index([("user_id", 1), ("received_at", -1)])
-        await emails.create_index([("user_id", 1), ("status", 1)])
-        await emails.create_index([("user_id", 1), ("priority", 1)])
-        await emails.create_index("metadata.provider_message_id", unique=True)
-        await emails.create_index([("sender.email", 1), ("received_at", -1)])
-        
-        # Calendar events collection indexes
-        calendar_events = self.db.calendar_events
-        await calendar_events.create_index([("user_id", 1), ("start_datetime", 1)])
-        await calendar_events.create_index([("user_id", 1), ("end_datetime", 1)])
-        await calendar_events.create_index("provider_event_id", unique=True)
-        await calendar_events.create_index([("attendees.email", 1)])
+    async def create_indexes(self) -> List[str]:
+        """Create the indexes in INDEXES, returning the names of any that failed
         
-        # Notifications collection indexes
-        notifications = self.db.notifications
-        await notifications.create_index([("user_id", 1), ("created_at", -1)])
-        await notifications.create_index([("user_id", 1), ("status", 1)])
-        await notifications.create_index("scheduled_at")
-        await notifications.create_index("expires_at")
+        Indexes listed in DROPPED_INDEXES are removed first. Each index is
+        created on its own, so one that can't be built (e.g. a unique index
+        over existing duplicates) doesn't skip the rest.
+        """
+        failed = []
         
-        # Guidelines collection indexes
-        guidelines = self.db.user_guidelines
-        await guidelines.create_index("user_id", unique=True)
-        await guidelines.create_index([("user_id", 1), ("updated_at", -1)])
-        
-        # Payments collection indexes
-        payments = self.db.payments
-        await payments.create_index([("user_id", 1), ("created_at", -1)])
-        await payments.create_index("stripe_payment_intent_id", unique=True)
-        await payments.create_index([("status", 1), ("created_at", -1)])
+        async def create_collection_indexes(collection: str, indexes: List[IndexModel]):
+            for name in DROPPED_INDEXES.get(collection, []):
+                try:
+                    await self.db[collection].drop_index(name)
+                    logger.info("Dropped index %s.%s", collection, name)
+                except OperationFailure as e:
+                    if e.code not in (NAMESPACE_NOT_FOUND, INDEX_NOT_FOUND):
+                        logger.error("Failed to drop index %s.%s: %s", collection, name, e)
+            
+            for index in indexes:
+                try:
+                    await self.db[collection].create_indexes([index])
+                except PyMongoError as e:
+                    name = f"{collection}.{index.document['name']}"
+                    logger.error("Failed to create index %s: %s", name, e)
+                    failed.append(name)
         
-        # Credit transactions collection indexes
-        credit_transactions = self.db.credit_transactions
-        await credit_transactions.create_index([("user_id", 1), ("created_at", -1)])
-        await credit_transactions.create_index([("user_id", 1), ("transaction_type", 1)])
+        await asyncio.gather(*(
+            create_collection_indexes(collection, indexes) for collection, indexes in INDEXES.items()
+        ))
         
-        print("✅ Database indexes created successfully")
+        if not failed:
+            logger.info("Database indexes created")
+        return failed
     
     async def health_check(self) -> Dict[str, Any]:
         """Check database health and connectivity"""
@@ -191,6 +255,27 @@ class QueryBuilder:
         
         return base_query
 
+# Exact types the ObjectId walk has to descend into or convert; motor decodes
+# documents as plain dicts and lists, so a set lookup on type() is enough
+_OBJECTID_WALK_TYPES = {dict, list, ObjectId}
+
+def _stringify_objectids(value: Any) -> Any:
+    """Walk a decoded document, replacing ObjectIds with their hex strings"""
+    # Scalar leaves (nearly every field) cost one set lookup and no call
+    if isinstance(value, dict):
+        return {
+            key: _stringify_objectids(item) if type(item) in _OBJECTID_WALK_TYPES else item
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [
+            _stringify_objectids(item) if type(item) in _OBJECTID_WALK_TYPES else item
+            for item in value
+        ]
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
 class ValidationUtils:
     """Utility functions for data validation"""
     
@@ -221,22 +306,7 @@ class ValidationUtils:
     @staticmethod
     def convert_objectid_to_str(data: Union[Dict, List]) -> Union[Dict, List]:
         """Convert ObjectId fields to strings recursively"""
-        if isinstance(data, dict):
-            result = {}
-            for key, value in data.items():
-                if key == "_id" and isinstance(value, ObjectId):
-                    result[key] = str(value)
-                elif isinstance(value, ObjectId):
-                    result[key] = str(value)
-                elif isinstance(value, (dict, list)):
-                    result[key] = ValidationUtils.convert_objectid_to_str(value)
-                else:
-                    result[key] = value
-            return result
-        elif isinstance(data, list):
-            return [ValidationUtils.convert_objectid_to_str(item) for item in data]
-        else:
-            return data
+        return _stringify_objectids(data)
 
 # Pagination utility
 class PaginationHelper:
@@ -262,6 +332,36 @@ class PaginationHelper:
             "limit": limit
         }
     
+    @staticmethod
+    def encode_cursor(created_at: datetime, item_id: str) -> str:
+        """Encode the last-seen (created_at, id) pair as an opaque cursor"""
+        raw = f"{created_at.isoformat()}|{item_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, str]:
+        """Decode an opaque cursor back into its (created_at, id) pair"""
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, item_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), item_id
+    
+    @staticmethod
+    def build_keyset_query(
+        query: Dict[str, Any],
+        cursor: str,
+        sort_field: str = "created_at",
+        id_field: str = "id"
+    ) -> Dict[str, Any]:
+        """Restrict a descending-sorted query to items after the given cursor"""
+        last_value, last_id = PaginationHelper.decode_cursor(cursor)
+        return {
+            **query,
+            "$or": [
+                {sort_field: {"$lt": last_value}},
+                {sort_field: last_value, id_field: {"$lt": last_id}}
+            ]
+        }
+    
     @staticmethod
     def build_pagination_response(
         items: List[Any],
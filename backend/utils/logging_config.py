@@ -0,0 +1,25 @@
+import logging
+import logging.handlers
+import queue
+from decouple import config
+
+LOG_FORMAT = "%(asctime)s level=%(levelname)s logger=%(name)s %(message)s"
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so callers never block on stderr
+    
+    Handlers only enqueue records; a background thread writes them out.
+    Call ``stop()`` on the returned listener at shutdown to flush it.
+    """
+    log_queue = queue.SimpleQueue()
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    root_logger = logging.getLogger()
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(config('LOG_LEVEL', default='INFO'))
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,47 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from arq import cron
+from arq.connections import RedisSettings
+from arq.worker import func
+from decouple import config
+
+from utils.logging_config import setup_logging
+from routes.notifications import process_notifications_batch as run_notifications_batch
+from routes.ai_core import BATCH_PROCESSING_TIMEOUT, process_emails_batch, recover_stuck_emails as run_recover_stuck_emails
+
+# Run with: arq worker.WorkerSettings
+
+async def startup(ctx):
+    ctx["log_listener"] = setup_logging()
+    ctx["mongodb_client"] = AsyncIOMotorClient(config('MONGO_URL'))
+    ctx["database"] = ctx["mongodb_client"].jessica_ai
+
+async def shutdown(ctx):
+    ctx["mongodb_client"].close()
+    ctx["log_listener"].stop()
+
+async def process_notifications_batch(ctx, notification_ids):
+    """Deliver a batch of queued notifications"""
+    await run_notifications_batch(ctx["database"], notification_ids)
+
+async def reanalyze_emails(ctx, user_id, email_ids):
+    """Re-analyze a user's emails as one Batch API job"""
+    await process_emails_batch(ctx["database"], user_id, email_ids, use_batch_api=True)
+
+async def recover_stuck_emails(ctx):
+    """Reset emails left in processing by an interrupted analysis"""
+    await run_recover_stuck_emails(ctx["database"])
+
+class WorkerSettings:
+    """arq worker configuration for background notification delivery and email analysis"""
+    functions = [
+        process_notifications_batch,
+        # Waits for the batch, so gets the batch timeout; not retried, as a
+        # retry would submit and pay for a second batch
+        func(reanalyze_emails, timeout=BATCH_PROCESSING_TIMEOUT.total_seconds(), max_tries=1)
+    ]
+    cron_jobs = [cron(recover_stuck_emails, minute=set(range(0, 60, 10)))]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(config('REDIS_URL', default='redis://localhost:6379'))
+    # Keep below the Mongo connection pool size
+    max_jobs = int(config('WORKER_MAX_JOBS', default=10))
@@ -39,10 +39,10 @@ const purchaseCredits = async (packageData) => {
   return response.data;
 };
 
-const createPaymentIntent = async (amount, packageId) => {
+const createPaymentIntent = async (packageId, clientNonce) => {
   const response = await axios.post('/api/payments/create-payment-intent', {
-    amount,
-    package_id: packageId
+    package_type: packageId,
+    client_nonce: clientNonce
   });
   return response.data;
 };
@@ -125,6 +125,8 @@ const PaymentForm = ({ selectedPackage, onSuccess, onCancel }) => {
   const elements = useElements();
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  // One nonce per checkout, so resubmitting after a failure reuses the same payment intent
+  const [clientNonce] = useState(() => crypto.randomUUID());
 
   const handleSubmit = async (event) => {
     event.preventDefault();
@@ -140,10 +142,7 @@ const PaymentForm = ({ selectedPackage, onSuccess, onCancel }) => {
 
     try {
       // Create payment intent
-      const { client_secret } = await createPaymentIntent(
-        selectedPackage.price * 100, // Convert to cents
-        selectedPackage.id
-      );
+      const { client_secret } = await createPaymentIntent(selectedPackage.id, clientNonce);
 
       // Confirm payment
       const { error, paymentIntent } = await stripe.confirmCardPayment(client_secret, {